@@ -0,0 +1,40 @@
+"""
+Shows the per increment overhead of call_every_seconds, compared with the count based call_every and with reading
+the clock on every call.
+
+run from the repository root with:
+
+    python benchmarks/bench_call_timer.py
+"""
+import os
+import sys
+from timeit import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import AdvCounter
+
+LOOPS = 200000
+
+
+def noop(counter):
+    pass
+
+
+def run(label, counter):
+    best = min(repeat(counter.add, number=LOOPS, repeat=7)) / LOOPS * 1e9
+    print('%-36s %7.1f ns per add' % (label, best))
+    return best
+
+
+if __name__ == '__main__':
+    base = run('call_every=1000', AdvCounter(call_every=1000, call_every_func=noop))
+    timed = run('call_every_seconds=1', AdvCounter(call_every_seconds=1, call_every_func=noop))
+    run('call_every=1000 + call_every_seconds=1',
+        AdvCounter(call_every=1000, call_every_seconds=1, call_every_func=noop))
+    every_call = AdvCounter(call_every_seconds=1, call_every_func=noop)
+    every_call.call_timer.max_sample = 1
+    naive = run('clock read on every call', every_call)
+    print()
+    print('call_every_seconds overhead: %.1f ns per add  (reading the clock on every call: %.1f ns)' % (
+        timed - base, naive - base))
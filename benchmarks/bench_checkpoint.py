@@ -0,0 +1,52 @@
+"""
+Measures the time and size of NamedCounter checkpoints (full and delta) and restores, compared with pickle.
+
+run from the repository root with (the number of counters defaults to 100,000):
+
+    python benchmarks/bench_checkpoint.py [counters]
+"""
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import NamedCounter, SlottedCounter
+
+COUNTERS = 100000
+
+
+def make_counters(count):
+    nc = NamedCounter(counter_class=SlottedCounter)
+    for i in range(count):
+        nc.new('counter_%s' % i, value=i)
+    return nc
+
+
+def timed(label, func, size=None):
+    start = time.perf_counter()
+    tmp_ret = func()
+    elapsed = time.perf_counter() - start
+    if size is None:
+        size = len(tmp_ret) if isinstance(tmp_ret, bytes) else 0
+    print('%-32s %8.1f ms   %10.1f KB' % (label, elapsed * 1000, size / 1024.0))
+    return tmp_ret
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNTERS
+    nc = make_counters(count)
+    print('%s counters:' % count)
+    pickled = timed('pickle.dumps(nc.counters)', lambda: pickle.dumps(nc.counters, protocol=pickle.HIGHEST_PROTOCOL))
+    timed('pickle.loads(nc.counters)', lambda: pickle.loads(pickled), 0)
+    data = timed('checkpoint()', nc.checkpoint)
+    target = make_counters(count)
+    timed('restore() (existing counters)', lambda: target.restore(data), 0)
+    timed('restore() (new counters)', lambda: NamedCounter(counter_class=SlottedCounter).restore(data), 0)
+
+    checkpoints = nc.checkpointer()
+    checkpoints.full()
+    for i in range(0, count, 100):
+        nc.add('counter_%s' % i, 5)
+    timed('delta() (1% changed)', checkpoints.delta)
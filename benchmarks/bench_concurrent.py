@@ -0,0 +1,57 @@
+"""
+Compares a lock protected AdvCounter with ConcurrentCounter when incremented from 1 - 32 threads.
+
+run from the repository root with:
+
+    python benchmarks/bench_concurrent.py
+"""
+import os
+import sys
+import threading
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import AdvCounter, ConcurrentCounter
+
+ADDS_PER_THREAD = 50000
+
+
+def locked_counter():
+    counter = AdvCounter()
+    lock = threading.Lock()
+
+    def work():
+        for i in range(ADDS_PER_THREAD):
+            with lock:
+                counter.add()
+    return counter, work
+
+
+def concurrent_counter():
+    counter = ConcurrentCounter()
+
+    def work():
+        for i in range(ADDS_PER_THREAD):
+            counter.add()
+    return counter, work
+
+
+def run(factory, thread_count):
+    counter, work = factory()
+    threads = [threading.Thread(target=work) for i in range(thread_count)]
+    start = perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = perf_counter() - start
+    assert counter.value == thread_count * ADDS_PER_THREAD, counter.value
+    return thread_count * ADDS_PER_THREAD / elapsed
+
+
+if __name__ == '__main__':
+    print('%7s %18s %18s' % ('threads', 'locked adds/s', 'striped adds/s'))
+    for thread_count in (1, 2, 4, 8, 16, 32):
+        print('%7s %18.0f %18.0f' % (thread_count, run(locked_counter, thread_count),
+                                     run(concurrent_counter, thread_count)))
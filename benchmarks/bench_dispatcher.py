@@ -0,0 +1,40 @@
+"""
+Compares the time spent in the counting loop when a slow call_every_func is called inline against running it on a
+CallbackDispatcher thread.
+
+run from the repository root with:
+
+    python benchmarks/bench_dispatcher.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import AdvCounter, NamedCounter, CallbackDispatcher, DispatchedCounter
+
+LOOPS = 200000
+CALL_EVERY = 1000
+
+
+def slow_callback(counter):
+    # formatting a report and waiting on a slow log handler.
+    NamedCounter(records=counter.value).report()
+    time.sleep(0.002)
+
+
+def run(label, counter):
+    start = time.perf_counter()
+    for i in range(LOOPS):
+        counter.add()
+    elapsed = time.perf_counter() - start
+    print('%-12s %7.1f ms in the loop  (%.0f ns per add)' % (label, elapsed * 1e3, elapsed / LOOPS * 1e9))
+
+
+if __name__ == '__main__':
+    run('inline', AdvCounter(call_every=CALL_EVERY, call_every_func=slow_callback))
+    with CallbackDispatcher(overflow='coalesce') as dispatcher:
+        run('dispatched', DispatchedCounter(call_every=CALL_EVERY, call_every_func=slow_callback, dispatcher=dispatcher))
+        dispatcher.flush()
+        print('dispatched callbacks coalesced: %s' % dispatcher.dropped)
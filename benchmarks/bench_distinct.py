@@ -0,0 +1,54 @@
+"""
+Compares the memory used to count distinct items with a set and with a DistinctCounter (HyperLogLog).
+
+run from the repository root with (the number of items defaults to 10,000,000):
+
+    python benchmarks/bench_distinct.py [items]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import DistinctCounter
+
+ITEMS = 10000000
+
+
+def items(count):
+    for i in range(count):
+        yield 'user-%s' % (i * 7919 % count)
+
+
+def measure(label, count, make, add, result, memory_items):
+    # the memory is measured separately, since tracing slows down the adds.
+    tracemalloc.start()
+    obj = make()
+    for item in items(memory_items):
+        add(obj, item)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+
+    start = time.perf_counter()
+    obj = make()
+    for item in items(count):
+        add(obj, item)
+    elapsed = time.perf_counter() - start
+    value = result(obj)
+    print('%-22s %12s distinct   %10.1f KB   %6.1fs   (error %.2f%%)' % (
+        label, value, memory / 1024.0, elapsed, abs(value - count) * 100.0 / count))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ITEMS
+    print('%s distinct items:' % count)
+    measure('set', count, set, set.add, len, count)
+    for precision in (12, 14, 16):
+        # the memory used by a DistinctCounter does not change as items are added.
+        measure('DistinctCounter(p=%s)' % precision, count, lambda: DistinctCounter(precision=precision),
+                DistinctCounter.add, lambda counter: counter.value, 1000)
+    counter = DistinctCounter()
+    print('serialized (p=14): %s bytes' % len(counter.to_bytes()))
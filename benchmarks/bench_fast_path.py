@@ -0,0 +1,38 @@
+"""
+Compares the precompiled add routines against the generic _do_math path.
+
+run from the repository root with:
+
+    python benchmarks/bench_fast_path.py
+"""
+import os
+import sys
+from timeit import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import AdvCounter
+
+LOOPS = 200000
+
+
+def make_counter(fast_path, **kwargs):
+    tmp_ret = AdvCounter(**kwargs)
+    tmp_ret.fast_path = fast_path
+    tmp_ret.set_max()
+    return tmp_ret
+
+
+def run(label, **kwargs):
+    tmp_ret = []
+    for fast_path in (False, True):
+        counter = make_counter(fast_path, **kwargs)
+        best = min(repeat(counter.add, number=LOOPS, repeat=5))
+        tmp_ret.append(best / LOOPS * 1e9)
+    print('%-24s generic: %7.1f ns   fast: %7.1f ns   (%.2fx)' % (label, tmp_ret[0], tmp_ret[1], tmp_ret[0] / tmp_ret[1]))
+
+
+if __name__ == '__main__':
+    run('no min/max')
+    run('min/max clamp', min_counter=0, max_counter=10 ** 12)
+    run('call_every', call_every=1000, call_every_func=lambda c: None)
@@ -0,0 +1,47 @@
+"""
+Measures the time to record a value in a Histogram with each bucket layout, and to read the percentiles.
+
+run from the repository root with:
+
+    python benchmarks/bench_histogram.py
+"""
+import os
+import random
+import sys
+from timeit import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import AdvCounter, Histogram, LinearBuckets, ExponentialBuckets, HdrBuckets
+
+LOOPS = 200000
+
+
+def latencies(count):
+    rand = random.Random(42)
+    return [rand.lognormvariate(-4, 1) for i in range(count)]
+
+
+def run(label, counter):
+    values = latencies(LOOPS)
+
+    def record():
+        add = counter.add
+        for value in values:
+            add(value)
+
+    best = min(repeat(record, number=1, repeat=5))
+    percentiles = min(repeat(lambda: counter.percentiles(50, 99, 99.9), number=100, repeat=5)) / 100
+    print('%-28s record: %7.1f ns   p50/p99/p999: %7.1f us   (%s buckets)' % (
+        label, best / LOOPS * 1e9, percentiles * 1e6, len(counter.counts)))
+
+
+if __name__ == '__main__':
+    counter = AdvCounter()
+    values = latencies(LOOPS)
+    best = min(repeat(lambda: [counter.add(value) for value in values], number=1, repeat=5))
+    print('%-28s add:    %7.1f ns' % ('AdvCounter', best / LOOPS * 1e9))
+    run('LinearBuckets(0, 0.01, 100)', Histogram(LinearBuckets(0, 0.01, 100)))
+    run('ExponentialBuckets(1ms, 2)', Histogram(ExponentialBuckets(0.001, 2, 20)))
+    run('HdrBuckets(60s, 2 digits)', Histogram(HdrBuckets(highest=60, significant_figures=2, resolution=0.000001)))
+    run('HdrBuckets(60s, 3 digits)', Histogram(HdrBuckets(highest=60, significant_figures=3, resolution=0.000001)))
@@ -0,0 +1,52 @@
+"""
+Measures the time to update (and reopen) a MappedNamedCounter, compared with a NamedCounter and a
+SharedNamedCounter.
+
+run from the repository root with (the number of counters defaults to 10,000):
+
+    python benchmarks/bench_mapped.py [counters]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import NamedCounter, SharedNamedCounter
+from src.advanced_counter.mapped_counter import MappedNamedCounter
+
+COUNTERS = 10000
+UPDATES = 200000
+
+
+def time_adds(label, nc, keys):
+    add = nc.add
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        add(keys[i % len(keys)])
+    elapsed = time.perf_counter() - start
+    print('%-36s %6.2f us / add' % (label, elapsed / UPDATES * 1000000))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNTERS
+    keys = ['counter_%s' % i for i in range(count)]
+    print('%s counters, %s updates:' % (count, UPDATES))
+    time_adds('NamedCounter', NamedCounter(*keys), keys)
+    with SharedNamedCounter(*keys) as shared:
+        time_adds('SharedNamedCounter', shared, keys)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'counters.map')
+        for sync in (None, 1.0):
+            if os.path.exists(path):
+                os.remove(path)
+            with MappedNamedCounter(path, *keys, sync=sync) as mapped:
+                time_adds('MappedNamedCounter (sync=%s)' % sync, mapped, keys)
+
+        start = time.perf_counter()
+        with MappedNamedCounter(path) as mapped:
+            elapsed = time.perf_counter() - start
+            print('%-36s %6.1f ms (%s counters)' % ('reopen', elapsed * 1000, len(mapped.counters)))
+        print('%-36s %6.1f KB' % ('file size', os.path.getsize(path) / 1024.0))
@@ -0,0 +1,51 @@
+"""
+Reports the memory used per counter for AdvCounter and SlottedCounter, both on their own and inside a
+NamedCounter.
+
+run from the repository root with:
+
+    python benchmarks/bench_memory.py [number of counters]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import AdvCounter, SlottedCounter, NamedCounter
+
+
+def measure(func, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = func(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return (after - before) / count
+
+
+def plain(counter_class):
+    def make(count):
+        return [counter_class(i) for i in range(count)]
+    return make
+
+
+def named(counter_class):
+    def make(count):
+        tmp_ret = NamedCounter(counter_class=counter_class)
+        for i in range(count):
+            tmp_ret.new('counter_%s' % i, value=i, description='')
+        return tmp_ret
+    return make
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('%s counters' % count)
+    for label, factory in (('plain', plain), ('in NamedCounter', named)):
+        for counter_class in (AdvCounter, SlottedCounter):
+            print('%-16s %-15s %7.1f bytes/counter' % (label, counter_class.__name__,
+                                                      measure(factory(counter_class), count)))
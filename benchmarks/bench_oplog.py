@@ -0,0 +1,71 @@
+"""
+Measures the number of operations per second on a NamedCounter with an operation log (with different commit
+intervals), compared with no log, and the time to replay and compact the log.
+
+run from the repository root with (the number of operations defaults to 1,000,000):
+
+    python benchmarks/bench_oplog.py [operations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import NamedCounter, SlottedCounter
+
+OPERATIONS = 1000000
+COUNTERS = 1000
+
+
+def make_counters():
+    nc = NamedCounter(counter_class=SlottedCounter)
+    for i in range(COUNTERS):
+        nc.new('counter_%s' % i)
+    return nc
+
+
+def run(nc, count):
+    counters = list(nc.counters.values())
+    start = time.perf_counter()
+    for i in range(count):
+        counters[i % COUNTERS].add(i & 7)
+    return time.perf_counter() - start
+
+
+def report(label, elapsed, count, size=None):
+    line = '%-36s %8.2f us / op  %10.0f ops / s' % (label, elapsed / count * 1000000, count / elapsed)
+    if size is not None:
+        line += '  %8.1f MB' % (size / 1024.0 / 1024.0)
+    print(line)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else OPERATIONS
+    print('%s operations on %s counters:' % (count, COUNTERS))
+    report('no log', run(make_counters(), count), count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'counters.log')
+        for commit_interval in (None, 1.0, 0.01):
+            if os.path.exists(path):
+                os.remove(path)
+            nc = make_counters()
+            log = nc.oplog(path, commit_interval=commit_interval, compact_size=None)
+            elapsed = run(nc, count)
+            start = time.perf_counter()
+            log.close()
+            elapsed += time.perf_counter() - start
+            report('oplog (commit_interval=%s)' % commit_interval, elapsed, count, os.path.getsize(path))
+
+        target = make_counters()
+        start = time.perf_counter()
+        replayed = target.replay(path)
+        report('replay', time.perf_counter() - start, replayed)
+
+        start = time.perf_counter()
+        log = target.oplog(path)
+        elapsed = time.perf_counter() - start
+        print('%-36s %8.1f ms  (%.1f KB)' % ('reopen (replay and compact)', elapsed * 1000, log.size / 1024.0))
+        log.close()
@@ -0,0 +1,67 @@
+"""
+Compares the peak memory and time used to find the quantiles of a stream of values by keeping every value in a list, and
+with a QuantileCounter (t-digest).
+
+run from the repository root with (the number of values defaults to 2,000,000):
+
+    python benchmarks/bench_quantile.py [values]
+"""
+from bisect import bisect_left
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import QuantileCounter
+
+VALUES = 2000000
+QUANTILES = (0.5, 0.99, 0.999)
+
+
+def values(count):
+    rand = random.Random(42)
+    for i in range(count):
+        yield rand.lognormvariate(-4, 1)
+
+
+def with_list(count):
+    samples = []
+    for value in values(count):
+        samples.append(value)
+    samples.sort()
+    return [samples[int(q * (len(samples) - 1))] for q in QUANTILES], samples
+
+
+def with_counter(count, compression):
+    counter = QuantileCounter(compression=compression)
+    counter.add_many(values(count))
+    return counter.quantiles(*QUANTILES), counter
+
+
+def measure(label, run, exact=None):
+    # the memory is measured separately, since tracing slows down the adds.
+    tracemalloc.start()
+    run()
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    result, obj = run()
+    elapsed = time.perf_counter() - start
+    line = '%-28s %10.1f KB   %6.1fs' % (label, memory / 1024.0, elapsed)
+    if exact is not None:
+        line += '   rank error: ' + ', '.join(
+            'p%s %.4f%%' % (q * 100, abs(bisect_left(exact, value) / float(len(exact)) - q) * 100)
+            for q, value in zip(QUANTILES, result))
+    print(line)
+    return obj
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else VALUES
+    print('%s values:' % count)
+    exact = measure('list', lambda: with_list(count))
+    for compression in (100, 200, 500):
+        measure('QuantileCounter(%s)' % compression, lambda: with_counter(count, compression), exact)
@@ -0,0 +1,42 @@
+"""
+Compares NamedCounter.report() with rendering a report compiled once with compile_report().
+
+run from the repository root with:
+
+    python benchmarks/bench_report.py
+"""
+import os
+import sys
+from timeit import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import NamedCounter
+
+COUNTERS = 300
+LOOPS = 200
+
+
+def make_named_counter():
+    tmp_ret = NamedCounter(name='Job Counters')
+    for i in range(COUNTERS):
+        if i % 2:
+            tmp_ret.new('counter_%s' % i, value=i, min_counter=0, max_counter=1000)
+        else:
+            tmp_ret.new('counter_%s' % i, value=i)
+    return tmp_ret
+
+
+def run(label, **kwargs):
+    nc = make_named_counter()
+    compiled = nc.compile_report(**kwargs)
+    assert compiled() == nc.report(**kwargs)
+    report = min(repeat(lambda: nc.report(**kwargs), number=LOOPS, repeat=5)) / LOOPS * 1e6
+    render = min(repeat(compiled, number=LOOPS, repeat=5)) / LOOPS * 1e6
+    print('%-28s report(): %7.1f us   compiled: %7.1f us   (%.2fx)' % (label, report, render, report / render))
+
+
+if __name__ == '__main__':
+    run('default')
+    run('value only', line_format='{value}', justify_name=None)
+    run('header/footer totals', header='{name}: {num_counters}', footer='total: {sum}')
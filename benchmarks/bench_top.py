@@ -0,0 +1,61 @@
+"""
+Compares NamedCounter.top() (with aggregates=True) with sorting all of the counters for each query, with a number
+of counters changing between the queries.
+
+run from the repository root with:
+
+    python benchmarks/bench_top.py
+"""
+import os
+import random
+import sys
+from timeit import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advanced_counter import NamedCounter
+
+COUNTERS = (1000, 10000, 50000)
+K = 20
+CHANGES = 100
+LOOPS = 50
+
+
+def make_named_counter(size, aggregates):
+    rnd = random.Random(1)
+    tmp_ret = NamedCounter(aggregates=aggregates)
+    for i in range(size):
+        tmp_ret.new('counter_%s' % i, value=rnd.randint(0, 1000000))
+    return tmp_ret
+
+
+def sort_top(nc, k):
+    return sorted(nc.counters, key=lambda key: nc.counters[key].value, reverse=True)[:k]
+
+
+def run(size):
+    keys = ['counter_%s' % i for i in range(size)]
+    rnd = random.Random(2)
+    changes = [(rnd.choice(keys), rnd.randint(0, 1000)) for i in range(CHANGES)]
+
+    def query(nc, func):
+        def _query():
+            for key, value in changes:
+                nc[key].add(value)
+            return func(nc, K)
+        return _query
+
+    plain = make_named_counter(size, False)
+    tracked = make_named_counter(size, True)
+    baseline = min(repeat(query(plain, sort_top), number=LOOPS, repeat=3)) / LOOPS * 1e6
+    nlargest = min(repeat(query(plain, NamedCounter.top), number=LOOPS, repeat=3)) / LOOPS * 1e6
+    indexed = min(repeat(query(tracked, NamedCounter.top), number=LOOPS, repeat=3)) / LOOPS * 1e6
+    assert [tracked[k].value for k in sort_top(tracked, K)] == [tracked[k].value for k in tracked.top(K)]
+    print('%6s counters  sort: %9.1f us   top(): %9.1f us   top(aggregates): %7.1f us   (%.0fx)' % (
+        size, baseline, nlargest, indexed, baseline / indexed))
+
+
+if __name__ == '__main__':
+    print('top(%s) after %s changes:' % (K, CHANGES))
+    for size in COUNTERS:
+        run(size)
@@ -1,2 +1,20 @@
 from .adv_counter import *
-from .indent_helper import IndentHelper
\ No newline at end of file
+from .indent_helper import IndentHelper
+from .helpers import tree_reduce
+from .counter_array import CounterArray, CounterView
+from .concurrent_counter import ConcurrentCounter
+from .shared_counter import BufferCounter, SharedNamedCounter
+from .async_counter import AsyncCounter
+from .dispatcher import CallbackDispatcher, DispatchedCounter
+from .rates import RateTracker, Progress, format_duration
+from .report import CompiledReport
+from .aggregates import CounterAggregates
+from .sketch import CountMinSketch, ApproxNamedCounter
+from .distinct import DistinctCounter
+from .window import WindowCounter
+from .limiter import TokenBucket, LeakyBucket, KeyedRateLimiter
+from .histogram import Histogram, LinearBuckets, ExponentialBuckets, HdrBuckets
+from .quantile import QuantileCounter
+from .checkpoint import Checkpointer, CheckpointRecord, CHECKPOINT_VERSION
+from .mapped_counter import MappedNamedCounter
+from .oplog import OperationLog, OPLOG_VERSION
@@ -8,13 +8,22 @@ __version__ = '0.9'
 __status__ = 'Testing'
 
 import decimal
-from collections import OrderedDict
-from .helpers import make_list, minmax, slugify, _UNSET
+import sys
+from collections import OrderedDict, namedtuple
+from functools import reduce
+import heapq
+from operator import add as _add
+from .helpers import make_list, minmax, slugify, CallTimer, _UNSET
+from .rates import RateTracker
+from .report import CompiledReport
+from .aggregates import CounterAggregates
+from .checkpoint import Checkpointer, pack_checkpoint, unpack_checkpoint, new_stream, FULL
+from .oplog import OperationLog, replay_log
 import logging
 
 log = logging.getLogger(__name__)
 
-__all__ = ['NamedCounter', 'AdvCounter', 'IncrementByDict', 'IncrementByList', 'IncrementByValue',
+__all__ = ['NamedCounter', 'AdvCounter', 'SlottedCounter', 'BaseCounter', 'CounterSnapshot', 'IncrementByDict', 'IncrementByList', 'IncrementByValue',
            'INCREMENT_LIST_ON_INDEX_INCREMENT', 'INCREMENT_LIST_ON_INDEX_RESET', 'INCREMENT_LIST_ON_INDEX_NOTHING']
 
 
@@ -23,6 +32,8 @@ class IncrementByValue(object):
     this is a helper class that can be used for more advanced increment by operations.
     See IncrementByDict and IncrementByList for examples.
     """
+    # __dict__ is kept so attributes can still be set on the helpers, it is only created when one is set.
+    __slots__ = ('increment_by', '__dict__')
     counter = None
     name = 'base_increment_by'
 
@@ -217,18 +228,182 @@ class IncrementByList(IncrementByValue):
             raise IndexError('Invalid increment by value of %s passed' % increment_by)
 
 
-class AdvCounter(object):
+_FAST_TYPES = frozenset((int, float, decimal.Decimal))
+
+
+def _fast_add_unbounded(counter, other):
+    """
+    precompiled add routine for counters with a plain IncrementByValue helper and no min/max counters.
+
+    anything that is not a plain number (percentages, other counters, etc) is passed back to the generic path.
+    """
+    increment_by = counter.increment_by
+    if other is None:
+        other = increment_by.increment_by
+    if other.__class__ not in _FAST_TYPES or increment_by.__class__ is not IncrementByValue:
+        return counter._do_math(other, 'add', ret='value')
+
+    counter.value = other + counter.value
+
+    counter.call_count += 1
+    counter.call_countdown -= 1
+    if counter.call_countdown <= 0:
+        counter.call_countdown = counter._call_every
+        if counter.call_every_func is not None:
+            counter._fire_call_every()
+    return counter.value
+
+
+def _fast_add_clamped(counter, other):
+    """
+    precompiled add routine for counters with a plain IncrementByValue helper and a min and/or max counter
+    (without rollover).  This clamps the same way that helpers.minmax does.
+    """
+    increment_by = counter.increment_by
+    if other is None:
+        other = increment_by.increment_by
+    if other.__class__ not in _FAST_TYPES or increment_by.__class__ is not IncrementByValue:
+        return counter._do_math(other, 'add', ret='value')
+
+    value = other + counter.value
+    min_val = counter.min_counter
+    max_val = counter.max_counter
+    if min_val is not None and value < min_val:
+        value = min_val
+    if max_val is not None:
+        if min_val is None:
+            if max_val < value:
+                value = max_val
+        elif not value < max_val:
+            value = max_val
+    counter.value = value
+
+    counter.call_count += 1
+    counter.call_countdown -= 1
+    if counter.call_countdown <= 0:
+        counter.call_countdown = counter._call_every
+        if counter.call_every_func is not None:
+            counter._fire_call_every()
+    return value
+
+
+def _fast_add_hooked(counter, other):
+    """
+    precompiled add routine for counters using call_every_seconds and/or with observers, with a plain
+    IncrementByValue helper (and without rollover).
+    """
+    increment_by = counter.increment_by
+    if other is None:
+        other = increment_by.increment_by
+    if other.__class__ not in _FAST_TYPES or increment_by.__class__ is not IncrementByValue:
+        return counter._do_math(other, 'add', ret='value')
+
+    value = other + counter.value
+    min_val = counter.min_counter
+    max_val = counter.max_counter
+    if min_val is not None and value < min_val:
+        value = min_val
+    if max_val is not None:
+        if min_val is None:
+            if max_val < value:
+                value = max_val
+        elif not value < max_val:
+            value = max_val
+    counter.value = value
+    if counter._observer is not None:
+        counter._observer(counter)
+
+    timer = counter.call_timer
+    counter.call_count += 1
+    counter.call_countdown -= 1
+    if counter.call_countdown <= 0:
+        counter.call_countdown = counter._call_every
+        if counter.call_every_func is not None:
+            counter._fire_call_every()
+            if timer is not None:
+                timer.restart()
+    elif timer is not None:
+        timer.countdown -= 1
+        if timer.countdown <= 0 and timer.sample() and counter.call_every_func is not None:
+            counter._fire_call_every()
+    return value
+
+
+class _Observers(object):
+    """
+    calls each of the observers of a counter (used when there is more than one)
+    """
+    __slots__ = ('funcs',)
+
+    def __init__(self, funcs):
+        self.funcs = funcs
+
+    def __call__(self, counter):
+        for func in self.funcs:
+            func(counter)
+
+
+_PERC_FORMATS = {}
+
+# used for the call_every count when the call_every_func is only called based on the time.
+_NO_CALL_COUNT = sys.maxsize
+
+CounterSnapshot = namedtuple('CounterSnapshot', ('key', 'name', 'value', 'call_count', 'min_counter', 'max_counter',
+                                                 'perc', 'perc_str'))
+CounterSnapshot.__doc__ = """
+An immutable copy of the state of a counter at a point in time (see BaseCounter.snapshot).  perc and perc_str are None
+if the counter does not have both a min and max counter.
+"""
+
+
+def _sum_bound(current, other):
+    if current is None or other is None:
+        return None
+    return current + other
+
+
+def _low_bound(current, other):
+    if current is None or other is None:
+        return None
+    return min(current, other)
+
+
+def _high_bound(current, other):
+    if current is None or other is None:
+        return None
+    return max(current, other)
+
+
+def _first_bound(current, other):
+    return current
+
+
+# (min_counter, max_counter) functions used by BaseCounter.combine for each "bounds" option.
+_COMBINE_BOUNDS = {
+    'sum': (_sum_bound, _sum_bound),
+    'widest': (_low_bound, _high_bound),
+    'first': (_first_bound, _first_bound),
+}
+
+
+class BaseCounter(object):
+    """
+    This holds all of the counter logic, see AdvCounter for the details.
+
+    The attributes are stored in __slots__, sub-classes that do not define __slots__ themselves (like AdvCounter)
+    will also have a __dict__, sub-classes that do (like SlottedCounter) will not.
+    """
+    __slots__ = ('value', 'min_counter', 'max_counter', 'rollover', 'increment_by', 'call_every',
+                 '_init_call_every', 'call_every_func', 'perc_decimal', 'perc_format', 'call_count',
+                 'call_countdown', '_call_every', 'call_timer', '_has_min_max', '_fast_add', '_fast_batch',
+                 '_rate_tracker', '_observer', '_oplog', 'name', 'key', 'description')
 
-    value = 0
     increment_type = 'dict'
     increment_length = None
     increment_index = None
-    call_count = 0
-    call_countdown = 0
-    _call_every = 0
-    _init_call_every = 0
     field_names = None
     math_return = 'value'
+    fast_path = True
 
     def __init__(self,
                  value=None,
@@ -240,6 +415,7 @@ class AdvCounter(object):
                  call_every_func=None,
                  perc_decimal=0,
                  no_scan=False,
+                 call_every_seconds=None,
                  ):
         """
 
@@ -264,6 +440,12 @@ class AdvCounter(object):
             * 5001+ records, every 1000 records%
             * if no max_counter setting, will call every 100 records
 
+            If call_every_seconds is set (and call_every is not), the call_every_func will only be called based on
+            the time.
+
+        :param call_every_seconds: if set, the call_every_func will also be called when this many seconds have passed
+            since it was last called (the time is checked as the counter is called, see the advanced usage docs).
+
         :param rollover: If true, will start over at the min_counter once the max_counter is reached, and vice versa (for reverse)
 
             .. note::
@@ -282,13 +464,25 @@ class AdvCounter(object):
             helper will not run the scan again.
 
         """
+        self.value = 0
+        self.call_count = 0
+        self.call_countdown = 0
+        self._call_every = 0
+        self._fast_add = None
+        self._fast_batch = False
+        self._rate_tracker = None
+        self._observer = None
+        self._oplog = None
+        self.call_timer = None
+        if call_every_seconds is not None:
+            self.call_timer = CallTimer(call_every_seconds)
 
         self.rollover = rollover
         self.call_every = call_every
         self._init_call_every = call_every
         self.call_every_func = call_every_func
         self.perc_decimal = perc_decimal
-        self.perc_format = "{:." + str(perc_decimal) + "%}"
+        self.perc_format = _PERC_FORMATS.setdefault(perc_decimal, "{:." + str(perc_decimal) + "%}")
 
         if isinstance(increment_by, (list, tuple)):
             self.increment_by = IncrementByList(increment_by, no_scan=no_scan)
@@ -321,6 +515,7 @@ class AdvCounter(object):
             call_every_func=self.call_every_func,
             perc_decimal=self.perc_decimal,
             no_scan=True,
+            call_every_seconds=self.call_every_seconds,
         )
         tmp_ret.call_countdown = self.call_countdown
         tmp_ret.call_count = self.call_count
@@ -329,6 +524,89 @@ class AdvCounter(object):
 
     copy = __copy__
 
+    @classmethod
+    def combine(cls, *counters, bounds=None, on_conflict='raise'):
+        """
+        Combines a number of counters (for example, partial counts from different workers or shards) into a new
+        counter.  The values and call counts are summed, and the min/max counters are combined based on "bounds".
+
+        The other settings (increment_by, call_every, call_every_func and perc_decimal) are taken from the first
+        counter.  The call_every_func is not called while combining.
+
+        >>> AdvCounter.combine(AdvCounter(2), AdvCounter(3)).value
+        5
+
+        :param counters: the counters to combine, either as separate arguments or as a single iterable.
+        :param bounds: how the min/max counters are combined:
+
+            * 'sum': the min counters are added together, as are the max counters.
+            * 'widest': the lowest min counter and highest max counter are used.
+            * 'first': the min/max counters of the first counter are used.
+
+            The default is 'widest' if any of the counters rollover (so the point where the new counter wraps around
+            does not change), and 'sum' if not.
+
+            For 'sum' and 'widest', if any of the counters does not have a min (or max) counter, the new counter
+            will not have one either.
+
+        :param on_conflict: what to do if some of the counters rollover and some do not:
+
+            * 'raise': (the default) raise an AttributeError.
+            * 'clamp': the new counter will not rollover.
+
+        :return: a new counter of this class.
+        """
+        if len(counters) == 1 and not issubclass(counters[0].__class__, BaseCounter):
+            counters = counters[0]
+        if bounds is None:
+            counters = list(counters)
+            bounds = 'widest' if any(counter.rollover for counter in counters) else 'sum'
+        try:
+            min_func, max_func = _COMBINE_BOUNDS[bounds]
+        except KeyError:
+            raise AttributeError('Invalid bounds option: %r' % bounds)
+        if on_conflict not in ('raise', 'clamp'):
+            raise AttributeError('Invalid on_conflict option: %r' % on_conflict)
+
+        first = None
+        for counter in counters:
+            if first is None:
+                first = counter
+                value = counter.value
+                call_count = counter.call_count
+                min_counter = counter.min_counter
+                max_counter = counter.max_counter
+                rollover = counter.rollover
+                continue
+            value = counter.value + value
+            call_count += counter.call_count
+            min_counter = min_func(min_counter, counter.min_counter)
+            max_counter = max_func(max_counter, counter.max_counter)
+            if rollover != counter.rollover:
+                if on_conflict == 'raise':
+                    raise AttributeError('Unable to combine counters with different rollover settings.')
+                rollover = False
+        if first is None:
+            raise AttributeError('At least one counter must be passed to combine.')
+        if min_counter is None or max_counter is None:
+            rollover = False
+
+        tmp_ret = cls(
+            value=value,
+            min_counter=min_counter,
+            max_counter=max_counter,
+            rollover=rollover,
+            increment_by=first.increment_by,
+            call_every=first._init_call_every,
+            call_every_func=first.call_every_func,
+            perc_decimal=first.perc_decimal,
+            no_scan=True,
+            call_every_seconds=first.call_every_seconds,
+        )
+        tmp_ret.call_count = call_count
+        tmp_ret._advance_countdown(call_count)
+        return tmp_ret
+
     def set_max(self, max_counter=_UNSET, min_counter=_UNSET):
         """
         This will set the min and max counters, and reset the call_every values if needed.
@@ -338,13 +616,16 @@ class AdvCounter(object):
         :param min_counter: The desired minimum value for the counter
         """
         if max_counter is not _UNSET:
-            self.min_counter = min_counter
-        if min_counter is not _UNSET:
             self.max_counter = max_counter
+        if min_counter is not _UNSET:
+            self.min_counter = min_counter
         self._has_min_max = self.min_counter is not None and self.max_counter is not None
 
         if self.call_every_func is not None:
-            if self._init_call_every is None:
+            if self._init_call_every is None and self.call_timer is not None:
+                # only called based on the time.
+                self._call_every = _NO_CALL_COUNT
+            elif self._init_call_every is None:
                 """
                 0-10 records, every record
                 11-100 records, every 10 records%
@@ -382,6 +663,44 @@ class AdvCounter(object):
             # log.debug('Setting the call every function to call every %s' % self.call_counter)
         self.call_countdown = self._call_every
         self._set(self.value, skip_count=True)
+        self._pick_fast_path()
+
+    def _pick_fast_path(self):
+        """
+        Selects a precompiled add routine if this counter is simple enough to skip the _do_math dispatch.
+
+        This is used when the counter uses a plain IncrementByValue helper, does not rollover, and the math
+        methods have not been overridden in a sub-class.  Set "fast_path" to False (and call set_max()) to
+        always use the generic path.
+
+        Rollover counters cannot use the single add routine, but can still use the batched one (see add_many), and
+        counters using call_every_seconds can use the single add routine, but not the batched one.  Counters with
+        observers use the single add routine that notifies them, and counters with an operation log (see
+        NamedCounter.oplog) always use the generic path.
+        """
+        self._fast_add = None
+        self._fast_batch = False
+        if not self.fast_path or self.math_return != 'value' or self._oplog is not None:
+            return
+        if self.increment_by.__class__ is not IncrementByValue:
+            return
+        for meth in ('add', '_do_math', '_get_increment', '_get_other', '_set'):
+            if getattr(self.__class__, meth) is not getattr(BaseCounter, meth):
+                return
+        if self.call_timer is not None:
+            if not self.rollover:
+                self._fast_add = _fast_add_hooked
+            return
+        self._fast_batch = True
+        if self.rollover:
+            return
+        if self._observer is not None:
+            self._fast_add = _fast_add_hooked
+            return
+        if self.min_counter is None and self.max_counter is None:
+            self._fast_add = _fast_add_unbounded
+        else:
+            self._fast_add = _fast_add_clamped
 
     def _get_increment(self, value=None, force=False, operation='add'):
         if not force:
@@ -422,16 +741,115 @@ class AdvCounter(object):
         """
         return self.perc_format.format(self.perc)
 
+    def track_rates(self, **kwargs):
+        """
+        Starts (or restarts) tracking the rate that the counter is changing, see RateTracker for the options.
+
+        This is not required, rate tracking is started the first time that .rate or .rates() is read.
+
+        :return: the RateTracker
+        """
+        self._rate_tracker = RateTracker(self, **kwargs)
+        return self._rate_tracker
+
+    @property
+    def rate_tracker(self):
+        """
+        the RateTracker for this counter (created the first time that it is used).
+        """
+        if self._rate_tracker is None:
+            self._rate_tracker = RateTracker(self)
+        return self._rate_tracker
+
+    @property
+    def rate(self):
+        """
+        The rate (per second) that the value is changing, by default this is the 1 minute exponentially weighted
+        moving average (see RateTracker).
+
+        .. note::
+            the rates are computed from the changes in the value since the rate tracking was started, which is the
+            first time that the rates are read (unless track_rates() is called).
+        """
+        return self.rate_tracker.rate
+
+    def rates(self):
+        """
+        :return: an OrderedDict of the rates (per second) that the value is changing, keyed by the window ('1s',
+            '5s', '15s', '1m') and 'mean' for the average since the rate tracking was started.
+        """
+        return self.rate_tracker.rates()
+
+    def progress(self):
+        """
+        Estimates the time remaining until the value reaches the max_counter, using the smoothed rate (see .rate).
+        This can be called from a call_every_func to report progress::
+
+            >>> ac = AdvCounter(min_counter=0, max_counter=len(records), call_every_seconds=60,
+            ...                 call_every_func=lambda c: log.info('%s', c.progress()))
+            >>> ac.track_rates()
+
+        .. note::
+            the elapsed time is measured from when the rate tracking started, so call track_rates() when the
+            work starts.
+
+        :return: a Progress namedtuple with the value, perc, rate, elapsed and remaining seconds, and the estimated
+            completion time (.eta)
+        :raises AttributeError: If the min/max counters are not both set to a value.
+        """
+        return self.rate_tracker.progress()
+
     def _set(self, value=None, skip_call_every=False, skip_count=False):
         value = minmax(value, min_val=self.min_counter, max_val=self.max_counter, rollover=self.rollover)
         self.value = value
+        if self._observer is not None:
+            self._observer(self)
         if not skip_count:
             self.call_count += 1
             self.call_countdown -= 1
             if self.call_countdown <= 0:
                 self.call_countdown = self._call_every
                 if self.call_every_func is not None and not skip_call_every:
-                    self.call_every_func(self)
+                    self._fire_call_every()
+                    if self.call_timer is not None:
+                        self.call_timer.restart()
+            elif self.call_timer is not None and self.call_timer.check():
+                if self.call_every_func is not None and not skip_call_every:
+                    self._fire_call_every()
+
+    @property
+    def call_every_seconds(self):
+        """
+        the call_every_seconds setting (None if not set)
+        """
+        if self.call_timer is None:
+            return None
+        return self.call_timer.interval
+
+    def snapshot(self):
+        """
+        :return: a CounterSnapshot (an immutable namedtuple) with the current value, call_count, min/max counters
+            and percentage of the counter.
+        """
+        if self._has_min_max:
+            perc = self.perc
+            perc_str = self.perc_format.format(perc)
+        else:
+            perc = None
+            perc_str = None
+        return CounterSnapshot(
+            getattr(self, 'key', None),
+            getattr(self, 'name', None),
+            self.value,
+            self.call_count,
+            self.min_counter,
+            self.max_counter,
+            perc,
+            perc_str,
+        )
+
+    def _fire_call_every(self):
+        self.call_every_func(self)
 
     def clear(self):
         """
@@ -440,8 +858,50 @@ class AdvCounter(object):
         self.value = self.min_counter or 0
         self.call_count = 0
         self.call_countdown = self._call_every
+        if self._observer is not None:
+            self._observer(self)
+        if self._oplog is not None:
+            self._oplog(self, 'clear', None, False)
+
+    def add_observer(self, func):
+        """
+        Registers a function that is called (as func(counter)) each time the value is changed through the counter
+        methods (add, sub, set, clear, add_many, etc), before the call_every_func is called.  Setting counter.value
+        directly does not call it.
+
+        This is used by NamedCounter to keep its aggregates up to date, the function should be quick as it is
+        called on every change.
+        """
+        observer = self._observer
+        if observer is None:
+            self._observer = func
+        elif observer.__class__ is _Observers:
+            observer.funcs.append(func)
+        else:
+            self._observer = _Observers([observer, func])
+        self._pick_fast_path()
+
+    def remove_observer(self, func):
+        """
+        Removes a function registered with add_observer.
+
+        :raises ValueError: if the function is not registered.
+        """
+        observer = self._observer
+        if observer.__class__ is _Observers:
+            observer.funcs.remove(func)
+            if len(observer.funcs) == 1:
+                self._observer = observer.funcs[0]
+        elif observer is not None and observer == func:
+            self._observer = None
+        else:
+            raise ValueError('%r is not an observer of this counter.' % func)
+        self._pick_fast_path()
 
     def __iadd__(self, other):
+        if self._fast_add is not None:
+            self._fast_add(self, other)
+            return self
         return self._do_math(other, 'add', ret='self')
 
     def __isub__(self, other):
@@ -474,6 +934,8 @@ class AdvCounter(object):
 
         :return: This returns the current counter after the operation
         """
+        if self._fast_add is not None:
+            return self._fast_add(self, other)
         return self._do_math(other, 'add', ret=self.math_return)
 
     def sub(self, other=None):
@@ -525,6 +987,145 @@ class AdvCounter(object):
         """
         return self._do_math(other, 'set', ret=ret, force=force)
 
+    def add_many(self, values):
+        """
+        Adds each of the values to the counter, the same as calling add() once per value (None will use the
+        increment by helper).  The final value, call_count and call_countdown are the same as with the individual
+        calls, and the call_every_func is called at the same points, with the counter set to the value it would
+        have had at that point.
+
+        For counters that can use the fast path (see the advanced usage), runs of plain numbers are added in
+        blocks between the call_every points instead of one at a time.
+
+        :param values: an iterable of values to add.
+        :return: This returns the current counter after the operations
+        """
+        if not self._fast_batch or self.increment_by.__class__ is not IncrementByValue:
+            for value in values:
+                self._do_math(value, 'add', ret='value')
+            return self.value
+
+        default = self.increment_by.increment_by
+        pending = []
+        for value in values:
+            if value is None:
+                value = default
+            if value.__class__ in _FAST_TYPES:
+                pending.append(value)
+            else:
+                if pending:
+                    self._add_numbers(pending)
+                    pending = []
+                self._do_math(value, 'add', ret='value')
+        if pending:
+            self._add_numbers(pending)
+        return self.value
+
+    def apply_batch(self, operations):
+        """
+        Runs a series of operations against the counter, the same as calling each operation in turn.
+
+        :param operations: an iterable of (operation, value) pairs, where the operation is one of
+            ['add', 'sub', 'mult', 'div', 'set'] and the value is passed the same as it would be to that method.
+        :return: This returns the current counter after the operations
+        """
+        fast = self._fast_batch and self.increment_by.__class__ is IncrementByValue
+        run = []
+        for operation, value in operations:
+            if fast and operation in ('add', 'sub'):
+                if value is None:
+                    value = self.increment_by.increment_by
+                if value.__class__ in _FAST_TYPES:
+                    run.append(value if operation == 'add' else -value)
+                    continue
+            if run:
+                self.add_many(run)
+                run = []
+            self._do_math(value, operation, ret='value')
+        if run:
+            self.add_many(run)
+        return self.value
+
+    def _add_numbers(self, numbers):
+        """
+        adds a list of plain numbers, splitting the list at the call_every points.
+        """
+        total = len(numbers)
+        if self.call_every_func is None:
+            self._add_block(numbers)
+            self.call_count += total
+            self._advance_countdown(total)
+            return
+
+        start = 0
+        while start < total:
+            end = start + max(self.call_countdown, 1)
+            if end > total:
+                block = numbers[start:]
+                self._add_block(block)
+                self.call_count += len(block)
+                self.call_countdown -= len(block)
+                return
+            self._add_block(numbers[start:end])
+            self.call_count += end - start
+            self.call_countdown = self._call_every
+            self._fire_call_every()
+            start = end
+
+    def _advance_countdown(self, calls):
+        """
+        updates the call_countdown as if the counter had been called "calls" times.
+
+        :return: the number of times the countdown was reset (the number of times the call_every_func would have
+            been called)
+        """
+        if not calls:
+            return 0
+        tmp_ret = 0
+        countdown = self.call_countdown
+        if countdown <= 0:
+            calls -= 1
+            tmp_ret += 1
+            countdown = self._call_every
+        if calls < countdown:
+            self.call_countdown = countdown - calls
+        elif self._call_every <= 0:
+            tmp_ret += calls
+            self.call_countdown = self._call_every
+        else:
+            tmp_ret += 1 + (calls - countdown) // self._call_every
+            self.call_countdown = self._call_every - (calls - countdown) % self._call_every
+        return tmp_ret
+
+    def _add_block(self, numbers):
+        value = self.value
+        min_val = self.min_counter
+        max_val = self.max_counter
+        if min_val is None and max_val is None:
+            self.value = reduce(_add, numbers, value)
+        elif self.rollover:
+            if value.__class__ is int and min_val.__class__ is int and max_val.__class__ is int \
+                    and all(n.__class__ is int for n in numbers):
+                self.value = minmax(reduce(_add, numbers, value), min_val, max_val, rollover=True)
+            else:
+                for n in numbers:
+                    value = minmax(n + value, min_val, max_val, rollover=True)
+                self.value = value
+        else:
+            for n in numbers:
+                value = n + value
+                if min_val is not None and value < min_val:
+                    value = min_val
+                if max_val is not None:
+                    if min_val is None:
+                        if max_val < value:
+                            value = max_val
+                    elif not value < max_val:
+                        value = max_val
+            self.value = value
+        if self._observer is not None:
+            self._observer(self)
+
     def _do_math(self, value=None, operation='add', ret=math_return, force=False):
         """
         :param value: the value to work on
@@ -533,7 +1134,7 @@ class AdvCounter(object):
         :param force: Will skip doing a lookup via the incrementBy helper and use the value directly.
         :return:
         """
-        value = self._get_other(value)
+        value = other = self._get_other(value)
         if ret == 'copy':
             tmp_ret = self.copy()
         else:
@@ -557,6 +1158,8 @@ class AdvCounter(object):
             raise AttributeError('Invalid Operation: %r' % operation)
 
         tmp_ret._set(value)
+        if tmp_ret._oplog is not None:
+            tmp_ret._oplog(tmp_ret, operation, other, force)
 
         if ret == 'value':
             return tmp_ret.value
@@ -569,6 +1172,11 @@ class AdvCounter(object):
         :param ret:  can be ['self', 'copy', 'value']
         :return:
         """
+        if not kwargs and ret == 'value' and self._fast_add is not None:
+            if add is _UNSET:
+                add = None
+            return self._fast_add(self, add)
+
         if ret == 'copy':
             tmp_ret = self.copy()
         else:
@@ -629,7 +1237,7 @@ class AdvCounter(object):
             yield self.value
 
     def _get_other(self, other):
-        if issubclass(other.__class__, AdvCounter):
+        if issubclass(other.__class__, BaseCounter):
             return other.value
         else:
             return other
@@ -663,6 +1271,28 @@ class AdvCounter(object):
         return self.call_count
 
 
+class AdvCounter(BaseCounter):
+    """
+    The standard counter, see the usage docs for details.
+
+    Instances have a __dict__, so sub-classes and other code can add attributes to them.
+    """
+
+
+class SlottedCounter(BaseCounter):
+    """
+    A compact version of AdvCounter with the same api, but without a per instance __dict__.
+
+    This is intended for cases where large numbers of counters are kept, it uses noticeably less memory per
+    counter, but no attributes other than the standard ones can be set on the instances.
+    """
+    __slots__ = ()
+
+
+def _counter_value(counter):
+    return counter.value
+
+
 class NamedCounter(object):
     counters = None
     counter_lookup = None
@@ -670,6 +1300,11 @@ class NamedCounter(object):
     locked = False
     counter_count = 0
     name = None
+    counter_class = AdvCounter
+    _aggregates = None
+    # the Checkpointers and OperationLogs that are notified as counters are added and removed.
+    _trackers = None
+    _restored = None
 
     def __init__(self,
                  *args,
@@ -679,6 +1314,8 @@ class NamedCounter(object):
                  increment_by=1,
                  locked=None,
                  name=None,
+                 counter_class=None,
+                 aggregates=False,
                  **kwargs):
         """
         :param args:
@@ -688,8 +1325,17 @@ class NamedCounter(object):
         :param increment_by:
         :param locked:
         :param as_perc:
+        :param counter_class: the class used for new counters (defaults to AdvCounter), SlottedCounter can be used
+            to save memory when there are a large number of counters.
+        :param aggregates: if True, the sum, min and max of the counter values (and the name padding for reports) are
+            kept up to date as the counters change, instead of being computed from all of the counters when they
+            are read (see the total, min_value and max_value properties).
         :param kwargs:
         """
+        if counter_class is not None:
+            self.counter_class = counter_class
+        if aggregates:
+            self._aggregates = CounterAggregates()
 
         self.def_counter_kwargs = dict(
             value=min_counter,
@@ -735,7 +1381,7 @@ class NamedCounter(object):
         @return: Returns the created counter.
         """
 
-        if issubclass(value.__class__, AdvCounter):
+        if issubclass(value.__class__, BaseCounter):
             counter = value
         else:
             tmp_kwargs = self.def_counter_kwargs.copy()
@@ -743,7 +1389,7 @@ class NamedCounter(object):
             if value is not None:
                 tmp_kwargs['value'] = value
 
-            counter = AdvCounter(**tmp_kwargs)
+            counter = self.counter_class(**tmp_kwargs)
 
         if name is None:
             name = key
@@ -756,6 +1402,15 @@ class NamedCounter(object):
             raise AttributeError('Key %r already exists in NamedCounter' % counter.key)
         self.counter_count += 1
 
+        old_counter = self.counters.get(counter.key)
+        if self._aggregates is not None:
+            if old_counter is not None and old_counter is not counter:
+                self._aggregates.remove(old_counter)
+            self._aggregates.add(counter)
+        if self._trackers:
+            for tracker in self._trackers:
+                tracker._added(counter, old_counter)
+
         self.counters[counter.key] = counter
         self.counter_lookup[counter.key] = counter
         self.counter_lookup[counter.name] = counter
@@ -828,6 +1483,11 @@ class NamedCounter(object):
             * {perc_complete}  :Note that {perc_complete} is only available if the max_counter is passed. otherwise it will ignored.
               The percentage returned already includes the '%' character.
             * {indent} :note that {indent} will indent the line based on the number passed in the "line_indent" parameter
+            * {rate} :the rate (per second) that the value is changing (see AdvCounter.rate), and {rate_1s}, {rate_5s},
+              {rate_15s}, {rate_1m} and {rate_mean} for each of the rate windows. (for example "{rate:.1f}/s")
+            * {elapsed}, {eta} :the time since the rate tracking started, and the estimated time remaining (as
+              "h:mm:ss", see AdvCounter.progress), {eta_time} is the estimated completion time.  {eta} and {eta_time}
+              are blank for counters without min/max counters.
 
         @param desc_line_format: if included, and if a counter has a description, this will be used on the line right after
         the counter line.  If the counter does not have a description, no line will be printed.
@@ -854,101 +1514,227 @@ class NamedCounter(object):
         @param kwargs: These are passed to the formatting for the lines as well as the header/footer.
         @return: a string report formatted as specified.
         """
-        if counters is None:
-            counters = self.counters.keys()
-        else:
-            counters = make_list(counters)
-
-        tmp_pad_size = 0
-        all_value_min = 0
-        all_value_max = 0
-        all_value_sum = 0
-
-        if not header and self.name:
-            header = '{name}'
-
-        if justify_name is not None or header or footer:
-            for c in counters:
-                c_rec = self.counters[c]
-                val = c_rec.value
-                tmp_pad_size = max(tmp_pad_size, len(c_rec.name))
-                all_value_max = max(val, all_value_max)
-                all_value_min = min(val, all_value_min)
-                all_value_sum += c_rec.value
-
-        if line_indent is None:
-            if header or footer:
-                line_indent = 4
-            else:
-                line_indent = 0
-
-        indent = ''
-        if line_indent:
-            indent = ' ' * line_indent
-
-        tmp_hf_dict = dict(
-            num_counters=len(counters),
-            name=self.name,
-            sum=all_value_sum,
-            min=all_value_min,
-            max=all_value_max,
-            indent=indent,
-            **kwargs,
-        )
-        tmp_hf_dict.update(self.counters)
+        return self.compile_report(
+            header=header,
+            footer=footer,
+            justify_name=justify_name,
+            line_indent=line_indent,
+            counters=counters,
+            line_format=line_format,
+            desc_line_format=desc_line_format,
+            sep=sep,
+            **kwargs).render()
+
+    def compile_report(self,
+                       header='',
+                       footer='',
+                       justify_name='>',
+                       line_indent=None,
+                       counters=None,
+                       line_format=None,
+                       desc_line_format='    {indent}{description}',
+                       sep='\n',
+                       **kwargs):
+        """
+        Parses the report templates once and returns a CompiledReport that can be rendered as many times as
+        needed (by calling it, or its render() method), with the same output as report() using the same arguments.
 
-        tmp_ret = []
+        This is faster when a report is generated repeatedly (such as from a call_every_func), since only the fields
+        used by the templates are looked up for each counter.  Line formats can also use any other counter attribute
+        (such as {call_count}).
 
-        if header:
-            if '{' in header:
-                tmp_ret.append(header.format(**tmp_hf_dict))
-            else:
-                tmp_ret.append(header)
+        >>> progress = nc.compile_report(header='Progress:', line_format='{indent}{name} : {value} ({rate:.0f}/s)')
+        >>> print(progress())
 
-        for c in counters:
-            c_rec = self.counters[c]
+        See report() for the parameters.
+        """
+        return CompiledReport(
+            self,
+            header=header,
+            footer=footer,
+            justify_name=justify_name,
+            line_indent=line_indent,
+            counters=counters,
+            line_format=line_format,
+            desc_line_format=desc_line_format,
+            sep=sep,
+            **kwargs)
 
-            lf = line_format
-            if c_rec._has_min_max:
-                perc = c_rec.perc_str
-                if lf is None:
-                    lf = '{indent}{name} : {value} ({perc_complete})'
-            else:
-                perc = ''
-                if lf is None:
-                    lf = '{indent}{name} : {value}'
-
-            name = c_rec.name
-            if '{name}' in lf:
-                if justify_name == '<':
-                    name = name.ljust(tmp_pad_size)
-                elif justify_name == '>':
-                    name = name.rjust(tmp_pad_size)
-
-            tmp_line_formatting_dict = dict(
-                indent=indent,
-                description=c_rec.description,
-                name=name,
-                key=c_rec.key,
-                value=c_rec.value,
-                min_counter=c_rec.min_counter,
-                max_counter=c_rec.max_counter,
-                perc_complete=perc,
-                **kwargs,
-            )
-
-            tmp_ret.append(lf.format(**tmp_line_formatting_dict))
-            if c_rec.description and desc_line_format:
-                tmp_ret.append(desc_line_format.format(**tmp_line_formatting_dict))
-
-        if footer:
-            if '{' in footer:
-                tmp_ret.append(footer.format(**tmp_hf_dict))
-            else:
-                tmp_ret.append(footer)
+    # *****************************************************************************
+    # checkpoints and operation logs (saving and restoring the counter state)
+    # *****************************************************************************
 
-        if sep is not None:
-            return sep.join(tmp_ret)
+    def checkpoint(self):
+        """
+        Returns the state of all of the counters (the values, min/max counters, rollover, call counts, names,
+        descriptions and the IncrementByList positions) as bytes, in a compact versioned binary format that can be
+        restored with restore(), for example to resume a long running job after a crash.
+
+        Only the counter state is saved, the call_every_func, increment_by values and other settings are not, so
+        restore into a NamedCounter set up the same way.  Counters with their own state (such as Histograms,
+        DistinctCounters and WindowCounters) cannot be checkpointed.
+
+        For regular checkpoints of a large number of counters, see checkpointer(), which can also save only the
+        counters that have changed.
+        """
+        return pack_checkpoint(FULL, new_stream(), 0, list(self.counters.values()))
+
+    def checkpointer(self):
+        """
+        Returns a Checkpointer, which tracks the counters that change and creates full checkpoints (with .full())
+        and incremental ones with only the counters that changed since the last checkpoint (with .delta()).
+
+        >>> checkpoints = nc.checkpointer()
+        >>> write(checkpoints.full())
+        >>> for rec in records:
+        ...     process(rec)
+        ...     if time_to_save():
+        ...         write(checkpoints.delta())
+
+        This adds an observer to each counter (see AdvCounter.add_observer), call close() on it to stop tracking.
+        """
+        tmp_ret = Checkpointer(self)
+        self._add_tracker(tmp_ret)
+        return tmp_ret
+
+    def _add_tracker(self, tracker):
+        if self._trackers is None:
+            self._trackers = []
+        self._trackers.append(tracker)
+
+    def _remove_tracker(self, tracker):
+        self._trackers.remove(tracker)
+
+    def restore(self, *checkpoints):
+        """
+        Restores the counters from checkpoints (see checkpoint and checkpointer), either a full checkpoint, or a
+        full checkpoint followed by its deltas, in order.  Deltas can also be restored on their own after the full
+        checkpoint (or the deltas before them) have been restored.
+
+        Counters in the checkpoint that do not exist are created (with counter_class and the default settings),
+        and counters that are not in a full checkpoint are left as they are.
+
+        :raises ValueError: if the data is not a valid checkpoint, or a delta does not follow the last checkpoint
+            restored.
+        """
+        for data in checkpoints:
+            kind, stream, sequence, records = unpack_checkpoint(data)
+            if kind != FULL and self._restored != (stream, sequence - 1):
+                raise ValueError('Checkpoint delta %s does not follow the last checkpoint restored.' % sequence)
+            for record in records:
+                if record.__class__ is str:
+                    if record in self.counters:
+                        self.remove(record)
+                    continue
+                self._restore_counter(record)
+            self._restored = (stream, sequence)
+
+    def oplog(self, path, **kwargs):
+        """
+        Returns an OperationLog, which logs each operation on the counters (add, sub, set, clear, etc, with the
+        counter key and the value passed) to a binary write-ahead log file, so the counters can be rebuilt after a
+        crash by replaying it::
+
+            >>> nc = NamedCounter(...)      # set up the same way each time (call_every_func, increment_by, etc)
+            >>> with nc.oplog('counters.log'):
+            ...     for rec in records:
+            ...         process(rec)
+
+        If the file exists, it is replayed into the counters first (see replay()), so opening the log again after a
+        crash carries on from the last operation written.  The log starts with a snapshot of the counters, and is
+        compacted into a new snapshot when it grows past compact_size.
+
+        Logging a counter turns off its fast path (see the advanced usage).  Call close() on the log (or use it as a
+        context manager) to commit it and stop logging.
+
+        :param path: the log file.
+        :param kwargs: see OperationLog (buffer_size, commit_interval and compact_size).
+        :raises AttributeError: if any of the counters cannot be checkpointed (see checkpoint()) or are already
+            logged.
+        """
+        return OperationLog(self, path, **kwargs)
+
+    def replay(self, path):
+        """
+        Replays an operation log (see oplog()) into the counters, the operations are run through the normal counter
+        methods, so the IncrementByList positions, rollovers and call_every_funcs are the same as when they were
+        logged.  Restore into a NamedCounter set up the same way (as with restore()), counters that are not in the
+        log (because they were removed before it was compacted) are removed.
+
+        A partial write at the end of the log (if the process stopped while it was being written) is ignored.
+
+        :return: the number of operations replayed.
+        :raises ValueError: if the file is not a valid operation log.
+        """
+        return replay_log(self, path)
+
+    def _restore_counter(self, record):
+        key = record.key
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.new(key, name=record.name, description=record.description)
+        elif counter.name != record.name or counter.description != record.description:
+            counter.description = record.description
+            if counter.name != record.name:
+                old_name = counter.name
+                if old_name != key and self.counter_lookup.get(old_name) is counter:
+                    del self.counter_lookup[old_name]
+                counter.name = record.name
+                self.counter_lookup[counter.name] = counter
+                if self._aggregates is not None:
+                    # (re-added for the new name width)
+                    self._aggregates.remove(counter)
+                    self._aggregates.add(counter)
+        if counter.rollover != record.rollover or counter.min_counter != record.min_counter \
+                or counter.max_counter != record.max_counter:
+            counter.rollover = record.rollover
+            counter.set_max(record.max_counter, record.min_counter)
+        if record.index is not None and hasattr(counter.increment_by, 'current_index'):
+            counter.increment_by.current_index = record.index
+        counter.value = record.value
+        counter.call_count = record.call_count
+        counter.call_countdown = record.call_countdown
+        if counter._observer is not None:
+            counter._observer(counter)
+
+    def merge(self, *others, bounds=None, on_conflict='raise'):
+        """
+        Merges this NamedCounter with one or more others (for example, the partial counts from different workers)
+        and returns a new NamedCounter.
+
+        The new NamedCounter has all of the keys from any of the NamedCounters (in the order they are first seen),
+        counters that exist in more than one are combined using counter_class.combine (the values and call counts are
+        summed, see AdvCounter.combine for the bounds and on_conflict options).  None of the merged counters are
+        changed.
+
+        The name, description, and default settings are taken from the first NamedCounter that has each one.
+
+        >>> nc = NamedCounter('a', 'b').merge(NamedCounter(a=2, c=1))
+        >>> dict(nc.items())
+        {'a': 2, 'b': 0, 'c': 1}
+
+        To merge a large number of NamedCounters, see helpers.tree_reduce.
+        """
+        groups = OrderedDict()
+        for named_counter in (self,) + others:
+            for key, counter in named_counter.counters.items():
+                try:
+                    groups[key].append(counter)
+                except KeyError:
+                    groups[key] = [counter]
+
+        tmp_ret = NamedCounter(name=self.name, counter_class=self.counter_class, locked=self.locked,
+                               aggregates=self._aggregates is not None)
+        tmp_ret.def_counter_kwargs = self.def_counter_kwargs.copy()
+        for key, group in groups.items():
+            first = group[0]
+            if first.combine.__func__ is BaseCounter.combine.__func__:
+                combine = self.counter_class.combine
+            else:
+                # counters with their own combine (such as DistinctCounters) are combined with it.
+                combine = first.combine
+            counter = combine(*group, bounds=bounds, on_conflict=on_conflict)
+            tmp_ret.new(key, counter, name=first.name, description=first.description)
         return tmp_ret
 
     def keys(self):
@@ -967,15 +1753,78 @@ class NamedCounter(object):
         if not keys:
             keys = list(self.counters.keys())
         for key in keys:
-            item = self.get(key)
+            if key in self.counters:
+                item = self.counters[key]
+            else:
+                item = self.get(key)
             del self.counters[item.key]
-            self.counter_lookup.pop(item.key, None)
-            self.counter_lookup.pop(item.name, None)
+            if self._aggregates is not None:
+                self._aggregates.remove(item)
+            if self._trackers:
+                for tracker in self._trackers:
+                    tracker._removed_counter(item)
+            for lookup_key in (item.key, item.name):
+                if self.counter_lookup.get(lookup_key) is item:
+                    del self.counter_lookup[lookup_key]
             self.counter_count -= 1
 
     def __contains__(self, item):
         return item in self.counter_lookup
 
+    @property
+    def total(self):
+        """
+        the sum of the counter values (0 if there are no counters).  This is O(1) if the NamedCounter was created
+        with aggregates=True, otherwise it is computed from all of the counters.
+        """
+        if self._aggregates is not None:
+            return self._aggregates.total
+        tmp_ret = 0
+        for counter in self.counters.values():
+            tmp_ret += counter.value
+        return tmp_ret
+
+    @property
+    def min_value(self):
+        """
+        the lowest counter value (None if there are no counters), see total.
+        """
+        if self._aggregates is not None:
+            return self._aggregates.min_value
+        return min((counter.value for counter in self.counters.values()), default=None)
+
+    @property
+    def max_value(self):
+        """
+        the highest counter value (None if there are no counters), see total.
+        """
+        if self._aggregates is not None:
+            return self._aggregates.max_value
+        return max((counter.value for counter in self.counters.values()), default=None)
+
+    def top(self, k=10):
+        """
+        Returns the keys of the k counters with the highest values (highest first), this can be passed as the
+        counters for report():
+
+        >>> nc.report(counters=nc.top(20))
+
+        If the NamedCounter was created with aggregates=True, this takes O(k log k) steps (plus O(log n) for each
+        counter that changed since the last read) otherwise it checks all of the counters.  The order of counters
+        with the same value is not defined.
+        """
+        if self._aggregates is not None:
+            return [counter.key for counter in self._aggregates.top(k)]
+        return [counter.key for counter in heapq.nlargest(k, self.counters.values(), key=_counter_value)]
+
+    def bottom(self, k=10):
+        """
+        Returns the keys of the k counters with the lowest values (lowest first), see top.
+        """
+        if self._aggregates is not None:
+            return [counter.key for counter in self._aggregates.bottom(k)]
+        return [counter.key for counter in heapq.nsmallest(k, self.counters.values(), key=_counter_value)]
+
     # *****************************************************************************
     # pass through methods (will pass the args through to the underlying counter)
     # *****************************************************************************
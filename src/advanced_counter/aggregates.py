@@ -0,0 +1,267 @@
+"""
+Aggregate values (sum / min / max) for a set of counters, kept up to date as the counters change.
+
+"""
+from collections import Counter
+import heapq
+
+__all__ = ['CounterAggregates']
+
+
+class _Entry(object):
+    __slots__ = ('counter', 'value', 'seq', 'dirty', 'name_len', 'observer')
+
+    def __init__(self, counter, value, name_len):
+        self.counter = counter
+        self.value = value
+        self.seq = 0
+        self.dirty = True
+        self.name_len = name_len
+        self.observer = None
+
+
+class CounterAggregates(object):
+    """
+    Keeps the sum, min and max of the values of a set of counters (and the length of the longest counter name).
+
+    The counters notify this when their values change (see AdvCounter.add_observer).  The sum is updated on each
+    change, the min and max are kept in heaps that are only updated when they are read (with the counters that
+    changed since the last read), so a change costs O(1), reading the sum is O(1) and reading the min or max is
+    O(log n) for each counter that changed since the last read.  The heaps are also used to find the highest or
+    lowest k counters (see top and bottom) in O(k log k) steps.
+
+    The sums are kept separately for each type of value (int, float, Decimal), so the int and Decimal sums are exact.
+    Float sums are updated with the difference of each change, so they can differ in the last digits from adding
+    the values up.
+
+    .. note::
+        only changes made through the counter methods are seen, setting counter.value directly is not.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._dirty = []
+        self._sums = {}
+        self._type_counts = {}
+        self._min_heap = []
+        self._max_heap = []
+        self._seq = 0
+        self._name_lengths = Counter()
+        self._name_width = 0
+
+    def add(self, counter):
+        """
+        starts tracking a counter.
+        """
+        counter_id = id(counter)
+        if counter_id in self._entries:
+            return
+        value = counter.value
+        entry = _Entry(counter, value, len(counter.name))
+        self._entries[counter_id] = entry
+        self._add_value(value)
+        self._dirty.append(entry)
+        self._name_lengths[entry.name_len] += 1
+        self._name_width = max(self._name_width, entry.name_len)
+        entry.observer = self._observer(entry)
+        counter.add_observer(entry.observer)
+
+    def remove(self, counter):
+        """
+        stops tracking a counter.
+        """
+        entry = self._entries.pop(id(counter), None)
+        if entry is None:
+            return
+        counter.remove_observer(entry.observer)
+        self._remove_value(entry.value)
+        # any heap entries for this counter are skipped (and dropped) when they are reached.
+        entry.seq = None
+        self._name_lengths[entry.name_len] -= 1
+        if not self._name_lengths[entry.name_len]:
+            del self._name_lengths[entry.name_len]
+            if entry.name_len == self._name_width:
+                self._name_width = max(self._name_lengths, default=0)
+
+    def _add_value(self, value):
+        cls = value.__class__
+        try:
+            self._sums[cls] = self._sums[cls] + value
+            self._type_counts[cls] += 1
+        except KeyError:
+            self._sums[cls] = value
+            self._type_counts[cls] = 1
+
+    def _remove_value(self, value):
+        cls = value.__class__
+        self._type_counts[cls] -= 1
+        if self._type_counts[cls]:
+            self._sums[cls] = self._sums[cls] - value
+        else:
+            del self._type_counts[cls]
+            del self._sums[cls]
+
+    def _observer(self, entry):
+        """
+        returns the function that the counter calls when its value changes (this is called on every change, so
+        it works from local variables instead of looking up the entry)
+        """
+        sums = self._sums
+        dirty = self._dirty
+
+        def _changed(counter):
+            value = counter.value
+            old = entry.value
+            cls = value.__class__
+            if cls is old.__class__:
+                sums[cls] = sums[cls] + (value - old)
+            else:
+                self._remove_value(old)
+                self._add_value(value)
+            entry.value = value
+            if not entry.dirty:
+                entry.dirty = True
+                dirty.append(entry)
+        return _changed
+
+    def update(self, counter):
+        """
+        updates the values for a counter (this is only needed if the counter value was set directly)
+        """
+        self._entries[id(counter)].observer(counter)
+
+    def _refresh(self):
+        """
+        pushes the counters that changed since the last read to the heaps.
+        """
+        if max(len(self._min_heap), len(self._max_heap)) > 2 * len(self._entries) + 32:
+            self._rebuild()
+            return
+        seq = self._seq
+        for entry in self._dirty:
+            entry.dirty = False
+            if entry.seq is None:
+                continue
+            seq += 1
+            entry.seq = seq
+            heapq.heappush(self._min_heap, (entry.value, seq, entry))
+            heapq.heappush(self._max_heap, (-entry.value, seq, entry))
+        self._seq = seq
+        del self._dirty[:]
+
+    def _rebuild(self):
+        seq = self._seq
+        self._min_heap = []
+        self._max_heap = []
+        for entry in self._dirty:
+            entry.dirty = False
+        del self._dirty[:]
+        for entry in self._entries.values():
+            seq += 1
+            entry.seq = seq
+            self._min_heap.append((entry.value, seq, entry))
+            self._max_heap.append((-entry.value, seq, entry))
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+        self._seq = seq
+
+    @staticmethod
+    def _top(heap):
+        while heap:
+            value, seq, entry = heap[0]
+            if entry.seq == seq:
+                return value
+            heapq.heappop(heap)
+        return None
+
+    def _first(self, heap, k):
+        """
+        returns the counters for the first k (current) entries of a heap, in order, without changing the heap.
+
+        This walks the heap as a tree, keeping the candidates (the children of the entries already returned) in a
+        second heap, so it takes O(k log k) steps (plus any old entries that are passed over).
+        """
+        tmp_ret = []
+        if not heap or k <= 0:
+            return tmp_ret
+        size = len(heap)
+        candidates = [(heap[0], 0)]
+        while candidates and len(tmp_ret) < k:
+            item, index = heapq.heappop(candidates)
+            entry = item[2]
+            if entry.seq == item[1]:
+                tmp_ret.append(entry.counter)
+            child = index * 2 + 1
+            if child < size:
+                heapq.heappush(candidates, (heap[child], child))
+                child += 1
+                if child < size:
+                    heapq.heappush(candidates, (heap[child], child))
+        return tmp_ret
+
+    def top(self, k):
+        """
+        :return: a list of the k counters with the highest values (highest first)
+        """
+        if self._dirty:
+            self._refresh()
+        return self._first(self._max_heap, k)
+
+    def bottom(self, k):
+        """
+        :return: a list of the k counters with the lowest values (lowest first)
+        """
+        if self._dirty:
+            self._refresh()
+        return self._first(self._min_heap, k)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total(self):
+        """
+        the sum of the counter values (0 if there are no counters)
+        """
+        tmp_ret = 0
+        for cls in self._type_counts:
+            tmp_ret = tmp_ret + self._sums[cls]
+        return tmp_ret
+
+    @property
+    def min_value(self):
+        """
+        the lowest counter value (None if there are no counters)
+        """
+        if self._dirty:
+            self._refresh()
+        return self._top(self._min_heap)
+
+    @property
+    def max_value(self):
+        """
+        the highest counter value (None if there are no counters)
+        """
+        if self._dirty:
+            self._refresh()
+        tmp_ret = self._top(self._max_heap)
+        if tmp_ret is None:
+            return None
+        return -tmp_ret
+
+    @property
+    def name_width(self):
+        """
+        the length of the longest counter name.
+        """
+        return self._name_width
+
+    @property
+    def int_only(self):
+        """
+        True if all of the counter values are ints.
+        """
+        return all(cls is int for cls in self._type_counts)
+
+    def __repr__(self):
+        return 'CounterAggregates: %s counters' % len(self)
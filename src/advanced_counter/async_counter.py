@@ -0,0 +1,122 @@
+"""
+Counters for use with asyncio.
+
+"""
+import asyncio
+import inspect
+import logging
+from .adv_counter import AdvCounter
+
+log = logging.getLogger(__name__)
+
+__all__ = ['AsyncCounter']
+
+ASYNC_OVERFLOW_COALESCE = 'coalesce'
+ASYNC_OVERFLOW_DROP = 'drop'
+
+
+class AsyncCounter(AdvCounter):
+    """
+    An AdvCounter that accepts a coroutine function as the call_every_func.
+
+    When the call_every point is reached, the coroutine is scheduled as a task on the running event loop instead of
+    being called inline, so the counter is not blocked by a slow callback.  Only one callback task runs at a time,
+    if the call_every point is reached again while it is still running:
+
+        * overflow='coalesce': (the default) the callback is run once more after the current one finishes, no matter
+          how many call_every points were passed in the meantime.
+        * overflow='drop': the callback is skipped.
+
+    The number of callbacks that were merged or skipped is kept in "skipped".
+
+    The callback is passed the counter, and since it runs after the increment that triggered it, it will see the
+    counter as it is when the callback runs.
+
+    Normal (non-coroutine) call_every_funcs are called inline the same as AdvCounter.
+
+    >>> async def report(counter):
+    ...     await send_progress(counter.value)
+    >>> ac = AsyncCounter(call_every=1000, call_every_func=report)
+    >>> async for rec in records:
+    ...     ac += 1
+    >>> await ac.drain()
+
+    .. note::
+        a coroutine call_every_func can only be scheduled while the event loop is running, a RuntimeError is raised
+        if the call_every point is reached outside of the loop.
+    """
+
+    def __init__(self, *args, overflow=ASYNC_OVERFLOW_COALESCE, **kwargs):
+        """
+        :param overflow: what to do when the call_every point is reached while the last callback is still running,
+            'coalesce' or 'drop' (see above).
+        :param args: see AdvCounter
+        :param kwargs: see AdvCounter
+        """
+        if overflow not in (ASYNC_OVERFLOW_COALESCE, ASYNC_OVERFLOW_DROP):
+            raise AttributeError('Invalid overflow option: %r' % overflow)
+        self.overflow = overflow
+        self.skipped = 0
+        self._task = None
+        self._pending = False
+        self._error = None
+        super(AsyncCounter, self).__init__(*args, **kwargs)
+
+    def _fire_call_every(self):
+        if not inspect.iscoroutinefunction(self.call_every_func):
+            self.call_every_func(self)
+            return
+        if self._task is not None:
+            if self.overflow == ASYNC_OVERFLOW_COALESCE and not self._pending:
+                self._pending = True
+            else:
+                self.skipped += 1
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_callbacks())
+
+    async def _run_callbacks(self):
+        try:
+            if self._pending:
+                # call_every points passed before the task started are covered by the first call.
+                self.skipped += 1
+                self._pending = False
+            while True:
+                try:
+                    await self.call_every_func(self)
+                except Exception as err:
+                    log.exception('call_every_func failed')
+                    if self._error is None:
+                        self._error = err
+                if not self._pending:
+                    break
+                self._pending = False
+        finally:
+            self._task = None
+
+    @property
+    def running(self):
+        """
+        True if a callback task is running.
+        """
+        return self._task is not None
+
+    async def drain(self):
+        """
+        Waits for any running (and pending) callback to finish, this should be awaited before shutting down.
+
+        :raises: the first exception raised by a callback since the last drain (exceptions are also logged when
+            they happen)
+        """
+        while self._task is not None:
+            await self._task
+        if self._error is not None:
+            err = self._error
+            self._error = None
+            raise err
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.drain()
+        return False
@@ -0,0 +1,318 @@
+"""
+Checkpoints of the NamedCounter state in a compact binary format (see NamedCounter.checkpoint).
+
+"""
+from collections import namedtuple
+import decimal
+import random
+from struct import Struct, error as struct_error
+
+__all__ = ['Checkpointer', 'CheckpointRecord', 'CHECKPOINT_VERSION']
+
+CHECKPOINT_VERSION = 1
+
+_MAGIC = b'ACCK'
+FULL = 0
+DELTA = 1
+
+# magic, version, kind (FULL or DELTA), stream id, sequence, number of records
+_HEADER = Struct('<4sBBQII')
+# flags, key length
+_RECORD = Struct('<BH')
+# value type, int value, call_count, call_countdown (the common case)
+_INT_STATE = Struct('<cqqq')
+# call_count, call_countdown (after a value that is not an int)
+_STATE = Struct('<qq')
+_INT = Struct('<cq')
+_FLOAT = Struct('<cd')
+_TEXT = Struct('<cH')
+_INDEX = Struct('<q')
+_LENGTH = Struct('<H')
+_LONG_LENGTH = Struct('<I')
+
+_ROLLOVER = 1
+_MIN = 2
+_MAX = 4
+_INDEX_FLAG = 8
+_NAME = 16
+_DESCRIPTION = 32
+_REMOVED = 64
+
+_INT_TYPE = b'i'
+_INT_CODE = _INT_TYPE[0]
+_FLOAT_TYPE = b'f'
+_DECIMAL_TYPE = b'd'
+_BIG_INT_TYPE = b'b'
+
+CheckpointRecord = namedtuple('CheckpointRecord', ('key', 'name', 'description', 'value', 'min_counter', 'max_counter',
+                                                   'rollover', 'index', 'call_count', 'call_countdown'))
+
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+
+def _pack_value(value):
+    if value.__class__ is int or value.__class__ is bool:
+        if _INT_MIN <= value <= _INT_MAX:
+            return _INT.pack(_INT_TYPE, value)
+        text = str(value).encode('ascii')
+        return _TEXT.pack(_BIG_INT_TYPE, len(text)) + text
+    if value.__class__ is float:
+        return _FLOAT.pack(_FLOAT_TYPE, value)
+    if isinstance(value, decimal.Decimal):
+        text = str(value).encode('ascii')
+        return _TEXT.pack(_DECIMAL_TYPE, len(text)) + text
+    raise TypeError('Unable to checkpoint a counter value of %r' % value)
+
+
+def _unpack_value(data, offset):
+    value_type = data[offset:offset + 1]
+    if not value_type:
+        raise ValueError('Truncated checkpoint.')
+    if value_type == _INT_TYPE:
+        return _INT.unpack_from(data, offset)[1], offset + _INT.size
+    if value_type == _FLOAT_TYPE:
+        return _FLOAT.unpack_from(data, offset)[1], offset + _FLOAT.size
+    if value_type == _DECIMAL_TYPE or value_type == _BIG_INT_TYPE:
+        length = _TEXT.unpack_from(data, offset)[1]
+        start = offset + _TEXT.size
+        text = data[start:start + length].decode('ascii')
+        if value_type == _DECIMAL_TYPE:
+            return decimal.Decimal(text), start + length
+        return int(text), start + length
+    raise ValueError('Invalid value type %r in checkpoint.' % value_type)
+
+
+def _check_counter(counter):
+    if counter.__class__.value.__class__ is property:
+        raise AttributeError('%s counters cannot be checkpointed (%r)' % (counter.__class__.__name__, counter.key))
+
+
+def _pack_counter(parts, counter):
+    """
+    appends the record for a counter to parts.
+    """
+    key = counter.key.encode('utf-8')
+    value = counter.value
+    min_counter = counter.min_counter
+    max_counter = counter.max_counter
+    name = counter.name
+    description = counter.description
+    index = getattr(counter.increment_by, 'current_index', None)
+    _check_counter(counter)
+
+    flags = 0
+    if counter.rollover:
+        flags |= _ROLLOVER
+    if min_counter is not None:
+        flags |= _MIN
+    if max_counter is not None:
+        flags |= _MAX
+    if index is not None:
+        flags |= _INDEX_FLAG
+    if name != counter.key:
+        flags |= _NAME
+    if description:
+        flags |= _DESCRIPTION
+
+    parts.append(_RECORD.pack(flags, len(key)))
+    parts.append(key)
+    if value.__class__ is int and _INT_MIN <= value <= _INT_MAX:
+        parts.append(_INT_STATE.pack(_INT_TYPE, value, counter.call_count, counter.call_countdown))
+    else:
+        parts.append(_pack_value(value))
+        parts.append(_STATE.pack(counter.call_count, counter.call_countdown))
+    if not flags:
+        return
+    if min_counter is not None:
+        parts.append(_pack_value(min_counter))
+    if max_counter is not None:
+        parts.append(_pack_value(max_counter))
+    if index is not None:
+        parts.append(_INDEX.pack(index))
+    if flags & _NAME:
+        text = str(name).encode('utf-8')
+        parts.append(_LENGTH.pack(len(text)))
+        parts.append(text)
+    if description:
+        text = description.encode('utf-8')
+        parts.append(_LONG_LENGTH.pack(len(text)))
+        parts.append(text)
+
+
+def pack_checkpoint(kind, stream, sequence, counters, removed=()):
+    """
+    :param counters: the counters to include.
+    :param removed: the keys of counters that were removed (for deltas)
+    :return: the checkpoint as bytes.
+    """
+    parts = [_HEADER.pack(_MAGIC, CHECKPOINT_VERSION, kind, stream, sequence, len(counters) + len(removed))]
+    for counter in counters:
+        _pack_counter(parts, counter)
+    for key in removed:
+        key = key.encode('utf-8')
+        parts.append(_RECORD.pack(_REMOVED, len(key)))
+        parts.append(key)
+    return b''.join(parts)
+
+
+def unpack_checkpoint(data):
+    """
+    :return: (kind, stream, sequence, records), where the records are CheckpointRecords (or the keys of removed
+        counters)
+    """
+    data = bytes(data)
+    if len(data) < _HEADER.size:
+        raise ValueError('Not a NamedCounter checkpoint.')
+    magic, version, kind, stream, sequence, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError('Not a NamedCounter checkpoint.')
+    if version != CHECKPOINT_VERSION:
+        raise ValueError('Unsupported checkpoint version %s (expected %s)' % (version, CHECKPOINT_VERSION))
+    offset = _HEADER.size
+    records = []
+    append = records.append
+    record_unpack = _RECORD.unpack_from
+    record_size = _RECORD.size
+    int_state_unpack = _INT_STATE.unpack_from
+    int_state_size = _INT_STATE.size
+    try:
+        for i in range(count):
+            flags, length = record_unpack(data, offset)
+            offset += record_size
+            key = data[offset:offset + length].decode('utf-8')
+            offset += length
+            if flags & _REMOVED:
+                append(key)
+                continue
+            if data[offset] == _INT_CODE:
+                value_type, value, call_count, call_countdown = int_state_unpack(data, offset)
+                offset += int_state_size
+            else:
+                value, offset = _unpack_value(data, offset)
+                call_count, call_countdown = _STATE.unpack_from(data, offset)
+                offset += _STATE.size
+            if not flags:
+                append(CheckpointRecord(key, key, '', value, None, None, False, None, call_count, call_countdown))
+                continue
+            min_counter = max_counter = index = None
+            name = key
+            description = ''
+            if flags & _MIN:
+                min_counter, offset = _unpack_value(data, offset)
+            if flags & _MAX:
+                max_counter, offset = _unpack_value(data, offset)
+            if flags & _INDEX_FLAG:
+                index = _INDEX.unpack_from(data, offset)[0]
+                offset += _INDEX.size
+            if flags & _NAME:
+                length = _LENGTH.unpack_from(data, offset)[0]
+                offset += _LENGTH.size
+                name = data[offset:offset + length].decode('utf-8')
+                offset += length
+            if flags & _DESCRIPTION:
+                length = _LONG_LENGTH.unpack_from(data, offset)[0]
+                offset += _LONG_LENGTH.size
+                description = data[offset:offset + length].decode('utf-8')
+                offset += length
+            append(CheckpointRecord(key, name, description, value, min_counter, max_counter, bool(flags & _ROLLOVER),
+                                    index, call_count, call_countdown))
+    except (struct_error, IndexError, UnicodeDecodeError, decimal.InvalidOperation) as err:
+        raise ValueError('Invalid or truncated checkpoint: %s' % err)
+    if offset != len(data):
+        raise ValueError('Invalid checkpoint, %s extra bytes.' % (len(data) - offset))
+    return kind, stream, sequence, records
+
+
+def new_stream():
+    return random.getrandbits(64)
+
+
+class Checkpointer(object):
+    """
+    Creates full and incremental (delta) checkpoints of a NamedCounter (see NamedCounter.checkpointer).
+
+    The checkpointer registers an observer (see AdvCounter.add_observer) on each counter, and keeps the set of
+    counters that have changed (and been added or removed) since the last checkpoint, so the cost of a delta
+    depends on the number of counters that changed, not on the total number of counters.
+
+    >>> checkpoints = nc.checkpointer()
+    >>> save(checkpoints.full())
+    >>> ...
+    >>> save(checkpoints.delta())       # only the counters that changed since the last checkpoint
+
+    The full checkpoint and the deltas after it are restored in order with NamedCounter.restore.  Each delta has a
+    sequence number, and restore raises a ValueError if one is missing or out of order.
+
+    .. note::
+        like the aggregates, changes made by setting counter.value directly are not seen.
+    """
+
+    def __init__(self, named_counter):
+        self.named_counter = named_counter
+        self.stream = new_stream()
+        self.sequence = None
+        self._dirty = {}
+        self._removed = set()
+        for counter in named_counter.counters.values():
+            _check_counter(counter)
+            counter.add_observer(self._changed)
+
+    def _changed(self, counter):
+        self._dirty[counter.key] = counter
+
+    def _added(self, counter, old_counter):
+        _check_counter(counter)
+        if old_counter is not None and old_counter is not counter:
+            old_counter.remove_observer(self._changed)
+        if old_counter is not counter:
+            counter.add_observer(self._changed)
+        self._removed.discard(counter.key)
+        self._dirty[counter.key] = counter
+
+    def _removed_counter(self, counter):
+        counter.remove_observer(self._changed)
+        self._dirty.pop(counter.key, None)
+        self._removed.add(counter.key)
+
+    @property
+    def pending(self):
+        """
+        the number of counters that have changed (or been added or removed) since the last checkpoint.
+        """
+        return len(self._dirty) + len(self._removed)
+
+    def full(self):
+        """
+        :return: a checkpoint of all of the counters (as bytes), the following deltas are relative to this one.
+        """
+        self.stream = new_stream()
+        self.sequence = 0
+        self._dirty.clear()
+        self._removed.clear()
+        return pack_checkpoint(FULL, self.stream, 0, list(self.named_counter.counters.values()))
+
+    def delta(self):
+        """
+        :return: a checkpoint (as bytes) of the counters that have changed, been added, or been removed since the
+            last checkpoint.
+        :raises AttributeError: if full() has not been called.
+        """
+        if self.sequence is None:
+            raise AttributeError('A full checkpoint must be taken before a delta.')
+        self.sequence += 1
+        tmp_ret = pack_checkpoint(DELTA, self.stream, self.sequence, list(self._dirty.values()), list(self._removed))
+        self._dirty.clear()
+        self._removed.clear()
+        return tmp_ret
+
+    def close(self):
+        """
+        Stops tracking the changes (removes the observers from the counters).
+        """
+        self.named_counter._remove_tracker(self)
+        for counter in self.named_counter.counters.values():
+            counter.remove_observer(self._changed)
+
+    def __repr__(self):
+        return 'Checkpointer(%r): sequence %s, %s pending' % (self.named_counter, self.sequence, self.pending)
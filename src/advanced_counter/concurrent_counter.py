@@ -0,0 +1,242 @@
+"""
+Thread safe counters.
+
+"""
+import threading
+import weakref
+from .adv_counter import AdvCounter, IncrementByValue, _FAST_TYPES
+from .helpers import minmax, _UNSET
+
+__all__ = ['ConcurrentCounter']
+
+
+class _CellOwner(object):
+    """
+    kept in the thread local storage of each thread that uses a ConcurrentCounter, when the thread ends it is
+    released, and its cell is folded into the counter's base value (see _fold_cell).
+    """
+    __slots__ = ('cell', '__weakref__')
+
+    def __init__(self, cell):
+        self.cell = cell
+
+
+def _fold_cell(counter_ref, cell):
+    counter = counter_ref()
+    if counter is None:
+        return
+    with counter._lock:
+        counter._base += cell[0]
+        counter._base_calls += cell[1]
+        counter._cells.remove(cell)
+
+
+class ConcurrentCounter(AdvCounter):
+    """
+    A thread safe version of AdvCounter.
+
+    Additions and subtractions are not applied to a shared value, instead each thread adds to its own cell, and the
+    cells are merged when the value is read (similar to java's LongAdder).  This means that threads incrementing the
+    counter never wait on each other.  The other operations (mult, div, set, clear, etc) lock the counter.
+
+    Because of this, some of the AdvCounter behaviour is applied when the counter is read or flushed instead of at
+    each call:
+
+        * the min/max counters (and rollover) are applied to the merged value each time it is read.  flush() (and
+          any of the locking operations) will save the adjusted value.
+        * the call_every_func is only called from flush() (and the locking operations), it is called once for each
+          call_every boundary passed since the last flush, with the counter as it is at the flush.  call_every_seconds
+          is also only checked at each flush.
+        * observers (see AdvCounter.add_observer) are only notified at each flush (and by the locking operations).
+
+    The cell of a thread is folded back into the counter when the thread ends, so thread pools that replace their
+    threads do not make the counter grow.
+
+    .. note::
+        add() and sub() return None instead of the current value, since getting the value requires merging the
+        cells.  use .value (or flush()) to read it.
+    """
+    fast_path = False
+
+    def __init__(self, *args, **kwargs):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._cells = []
+        self._base = 0
+        self._base_calls = 0
+        self._flushed_calls = 0
+        super(ConcurrentCounter, self).__init__(*args, **kwargs)
+
+    def _get_cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0, 0]
+            owner = _CellOwner(cell)
+            with self._lock:
+                self._cells.append(cell)
+            weakref.finalize(owner, _fold_cell, weakref.ref(self), cell)
+            self._local.cell = cell
+            self._local.owner = owner
+            return cell
+
+    def _totals(self):
+        # (locked so a cell that is being folded into the base is not counted twice, or missed)
+        with self._lock:
+            value = self._base
+            calls = self._base_calls
+            for cell in self._cells:
+                value += cell[0]
+                calls += cell[1]
+        return value, calls
+
+    @property
+    def value(self):
+        return minmax(self._totals()[0], self.min_counter, self.max_counter, rollover=self.rollover)
+
+    @value.setter
+    def value(self, value):
+        with self._lock:
+            self._base = value - (self._totals()[0] - self._base)
+
+    @property
+    def call_count(self):
+        return self._totals()[1]
+
+    @call_count.setter
+    def call_count(self, value):
+        with self._lock:
+            self._base_calls = value - (self._totals()[1] - self._base_calls)
+            self._flushed_calls = value
+
+    def _stripe(self, value, calls=1):
+        cell = self._get_cell()
+        cell[0] += value
+        cell[1] += calls
+
+    def _plain_increment(self, other):
+        """
+        returns the amount to add if this can be striped without a lock (or None if not)
+        """
+        increment_by = self.increment_by
+        if increment_by.__class__ is not IncrementByValue:
+            return None
+        if other is None:
+            other = increment_by.increment_by
+        if other.__class__ in _FAST_TYPES:
+            return other
+        return None
+
+    def add(self, other=None):
+        amount = self._plain_increment(other)
+        if amount is None:
+            self._do_math(other, 'add')
+        else:
+            self._stripe(amount)
+
+    def sub(self, other=None):
+        amount = self._plain_increment(other)
+        if amount is None:
+            self._do_math(other, 'sub')
+        else:
+            self._stripe(-amount)
+
+    def __call__(self, add=_UNSET, ret='value', **kwargs):
+        if not kwargs and ret == 'value':
+            if add is _UNSET:
+                add = None
+            self.add(add)
+            return None
+        return super(ConcurrentCounter, self).__call__(add=add, ret=ret, **kwargs)
+
+    def add_many(self, values):
+        """
+        Adds each of the values to the counter (see AdvCounter.add_many), plain numbers are summed and added to the
+        thread's cell in one step.
+        """
+        total = 0
+        calls = 0
+        for value in values:
+            amount = self._plain_increment(value)
+            if amount is None:
+                self.add(value)
+            else:
+                total = amount + total
+                calls += 1
+        if calls:
+            self._stripe(total, calls)
+
+    def __iadd__(self, other):
+        self.add(other)
+        return self
+
+    def __isub__(self, other):
+        self.sub(other)
+        return self
+
+    def _do_math(self, value=None, operation='add', ret='value', force=False):
+        with self._lock:
+            if operation in ('add', 'sub') and ret != 'copy':
+                value = self._get_other(value)
+                value = self._get_increment(value, force, operation=operation)
+                if operation == 'sub':
+                    value = -value
+                self._stripe(value)
+                self.flush()
+                if ret == 'value':
+                    return self.value
+                return self
+            self.flush()
+            return super(ConcurrentCounter, self)._do_math(value, operation, ret=ret, force=force)
+
+    def _set(self, value=None, skip_call_every=False, skip_count=False):
+        with self._lock:
+            self.value = minmax(value, min_val=self.min_counter, max_val=self.max_counter, rollover=self.rollover)
+            if self._observer is not None:
+                self._observer(self)
+            if not skip_count:
+                self._base_calls += 1
+                self._check_call_every(skip_call_every)
+
+    def _check_call_every(self, skip_call_every=False):
+        calls = self._totals()[1]
+        fire_count = self._advance_countdown(calls - self._flushed_calls)
+        self._flushed_calls = calls
+        if self.call_every_func is not None and not skip_call_every:
+            if self.call_timer is not None:
+                if fire_count:
+                    self.call_timer.restart()
+                elif self.call_timer.due():
+                    fire_count = 1
+            for i in range(fire_count):
+                self._fire_call_every()
+
+    def flush(self):
+        """
+        Merges the thread cells, applies the min/max counters to the saved value, and calls the call_every_func
+        for any call_every boundaries passed since the last flush.
+
+        :return: the current value
+        """
+        with self._lock:
+            total = self._totals()[0]
+            value = minmax(total, self.min_counter, self.max_counter, rollover=self.rollover)
+            self._base += value - total
+            if self._observer is not None:
+                self._observer(self)
+            self._check_call_every()
+            return value
+
+    def clear(self):
+        with self._lock:
+            self.value = self.min_counter or 0
+            self.call_count = 0
+            self.call_countdown = self._call_every
+            if self._observer is not None:
+                self._observer(self)
+
+    def __copy__(self):
+        with self._lock:
+            return super(ConcurrentCounter, self).__copy__()
+
+    copy = __copy__
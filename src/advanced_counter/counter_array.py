@@ -0,0 +1,418 @@
+"""
+Array backed storage for large numbers of simple counters.
+
+"""
+from array import array
+from itertools import repeat
+import operator
+from .helpers import minmax
+
+__all__ = ['CounterArray', 'CounterView']
+
+_HAS_MIN = 1
+_HAS_MAX = 2
+_ROLLOVER = 4
+
+_OPERATIONS = {
+    'add': operator.add,
+    'sub': operator.sub,
+    'mult': operator.mul,
+    'div': operator.truediv,
+    'set': lambda value, amount: amount,
+}
+
+# integer arrays use floor division, so 7 / 2 is 3 instead of 3.5
+_INT_OPERATIONS = dict(_OPERATIONS, div=operator.floordiv)
+
+_FLOAT_TYPECODES = ('f', 'd')
+
+
+class CounterArray(object):
+    """
+    This stores the value, min/max counters, rollover flag and call count for a number of counters in typed arrays
+    (one array per field) instead of one AdvCounter object per counter.
+
+    The math follows the same rules as AdvCounter (values are kept within the min/max counters, and wrap around if
+    rollover is set), but only plain numbers are supported (no IncrementBy helpers, percentages or call_every
+    functions).
+
+    Counters are addressed by their index, the math methods take either a single index or an iterable of indexes,
+    and either a single amount (used for all of the indexes) or an iterable of amounts (one per index).  The
+    counters are still updated one at a time in a Python loop (the arrays save memory, not time).
+
+    With an integer typecode (the default 'q'), div rounds down, so ca.div(i, 2) on a value of 7 gives 3 where
+    AdvCounter.div gives 3.5, and any other result that is not a whole number (such as ca.add(i, 0.5)) raises a
+    TypeError instead of losing the fraction.  Use typecode='d' to keep the fractions.
+
+    >>> ca = CounterArray(3, max_counter=10)
+    >>> ca.add([0, 1, 1], [5, 4, 4])
+    >>> list(ca.values)
+    [5, 8, 0]
+    >>> ca[1] += 5
+    >>> ca[1].value
+    10
+    """
+
+    def __init__(self,
+                 size=0,
+                 value=None,
+                 min_counter=None,
+                 max_counter=None,
+                 rollover=False,
+                 increment_by=1,
+                 typecode='q'):
+        """
+        :param size: the initial number of counters.
+        :param value: the initial value for the counters (defaults to the min_counter or 0)
+        :param min_counter: the default min_counter for the counters.
+        :param max_counter: the default max_counter for the counters.
+        :param rollover: the default rollover setting for the counters.
+        :param increment_by: the value used when no amount is passed to add/sub.
+        :param typecode: the array typecode used for the values, min and max counters.  This defaults to 'q'
+            (signed 64 bit integers, div rounds down), use 'd' if the counters need to hold floats.
+        """
+        self.typecode = typecode
+        self._integer = typecode not in _FLOAT_TYPECODES
+        self.increment_by = increment_by
+        self.values = array(typecode)
+        self.min_values = array(typecode)
+        self.max_values = array(typecode)
+        self.call_counts = array('q')
+        self.flags = bytearray()
+        self.extend(size, value=value, min_counter=min_counter, max_counter=max_counter, rollover=rollover)
+
+    @staticmethod
+    def _make_flags(min_counter, max_counter, rollover):
+        if min_counter is not None and max_counter is not None:
+            if min_counter > max_counter:
+                raise AttributeError('Min counter is larger than max counter.')
+        if rollover and (min_counter is None or max_counter is None):
+            raise AttributeError('Rollover only works of both min and max counters are set.')
+        flags = 0
+        if min_counter is not None:
+            flags |= _HAS_MIN
+        if max_counter is not None:
+            flags |= _HAS_MAX
+        if rollover:
+            flags |= _ROLLOVER
+        return flags
+
+    def extend(self, count, value=None, min_counter=None, max_counter=None, rollover=False):
+        """
+        Adds "count" new counters with the same settings.
+
+        :return: the index of the first new counter.
+        """
+        flags = self._make_flags(min_counter, max_counter, rollover)
+        if value is None:
+            value = min_counter or 0
+        value = minmax(value, min_counter, max_counter, rollover=rollover)
+        tmp_ret = len(self.flags)
+        self.values.extend(array(self.typecode, [value]) * count)
+        self.min_values.extend(array(self.typecode, [min_counter or 0]) * count)
+        self.max_values.extend(array(self.typecode, [max_counter or 0]) * count)
+        self.call_counts.extend(array('q', [0]) * count)
+        self.flags.extend(bytes([flags]) * count)
+        return tmp_ret
+
+    def append(self, value=None, min_counter=None, max_counter=None, rollover=False):
+        """
+        Adds a new counter.
+
+        :return: the index of the new counter.
+        """
+        return self.extend(1, value=value, min_counter=min_counter, max_counter=max_counter, rollover=rollover)
+
+    def set_max(self, indexes, max_counter=None, min_counter=None, rollover=None):
+        """
+        Changes the min/max counters (and optionally the rollover setting) for one or more counters and updates
+        their values to be within the new range.
+        """
+        for i in self._indexes(indexes):
+            if rollover is None:
+                tmp_rollover = bool(self.flags[i] & _ROLLOVER)
+            else:
+                tmp_rollover = rollover
+            self.flags[i] = self._make_flags(min_counter, max_counter, tmp_rollover)
+            self.min_values[i] = min_counter or 0
+            self.max_values[i] = max_counter or 0
+            self.values[i] = self._minmax(i, self.values[i])
+
+    @staticmethod
+    def _indexes(indexes):
+        if isinstance(indexes, int):
+            return (indexes,)
+        return indexes
+
+    def _pairs(self, indexes, amounts):
+        if isinstance(indexes, int):
+            indexes = (indexes,)
+        if amounts is None:
+            amounts = self.increment_by
+        if isinstance(amounts, (int, float)):
+            return zip(indexes, repeat(amounts))
+        indexes = list(indexes)
+        amounts = list(amounts)
+        if len(indexes) != len(amounts):
+            raise ValueError('%s indexes passed with %s amounts' % (len(indexes), len(amounts)))
+        return zip(indexes, amounts)
+
+    def _minmax(self, index, value):
+        flags = self.flags[index]
+        if not flags:
+            return value
+        return minmax(value,
+                      self.min_values[index] if flags & _HAS_MIN else None,
+                      self.max_values[index] if flags & _HAS_MAX else None,
+                      rollover=bool(flags & _ROLLOVER))
+
+    def _do_math(self, indexes, amounts, operation):
+        try:
+            op = (_INT_OPERATIONS if self._integer else _OPERATIONS)[operation]
+        except KeyError:
+            raise AttributeError('Invalid Operation: %r' % operation)
+        integer = self._integer
+        values = self.values
+        flags = self.flags
+        call_counts = self.call_counts
+        for i, amount in self._pairs(indexes, amounts):
+            value = op(values[i], amount)
+            if integer and value.__class__ is not int:
+                if value != int(value):
+                    raise TypeError('A CounterArray with typecode %r can only hold whole numbers (not %r), use '
+                                    'typecode=\'d\' for fractions' % (self.typecode, value))
+                value = int(value)
+            if flags[i]:
+                value = self._minmax(i, value)
+            values[i] = value
+            call_counts[i] += 1
+
+    def add(self, indexes, amounts=None):
+        """
+        Adds the amount(s) to the counter(s) at the index(es).  If no amount is passed, increment_by is used.
+        """
+        self._do_math(indexes, amounts, 'add')
+
+    def sub(self, indexes, amounts=None):
+        """
+        Subtracts the amount(s) from the counter(s) at the index(es).  If no amount is passed, increment_by is used.
+        """
+        self._do_math(indexes, amounts, 'sub')
+
+    def mult(self, indexes, amounts):
+        """
+        Multiplies the counter(s) at the index(es) by the amount(s).
+        """
+        self._do_math(indexes, amounts, 'mult')
+
+    def div(self, indexes, amounts):
+        """
+        Divides the counter(s) at the index(es) by the amount(s).
+        """
+        self._do_math(indexes, amounts, 'div')
+
+    def set(self, indexes, amounts):
+        """
+        Sets the counter(s) at the index(es) to the amount(s).
+        """
+        self._do_math(indexes, amounts, 'set')
+
+    def clear(self, indexes=None):
+        """
+        Resets the counter(s) to their minimum counter (or 0 if no minimum is set) and the call count to 0.
+
+        :param indexes: if None, all counters are cleared.
+        """
+        if indexes is None:
+            indexes = range(len(self.flags))
+        for i in self._indexes(indexes):
+            if self.flags[i] & _HAS_MIN:
+                self.values[i] = self.min_values[i]
+            else:
+                self.values[i] = 0
+            self.call_counts[i] = 0
+
+    def view(self, index):
+        """
+        Returns a CounterView for the counter at the index.
+        """
+        if index < 0:
+            index += len(self.flags)
+        if not 0 <= index < len(self.flags):
+            raise IndexError('CounterArray index out of range: %r' % index)
+        return CounterView(self, index)
+
+    __getitem__ = view
+
+    def __setitem__(self, index, value):
+        if isinstance(value, CounterView):
+            if value.array is self and value.index == index:
+                # this is the result of an in-place operation on a view (ca[1] += 5) that has already been applied.
+                return
+            value = value.value
+        self.set(index, value)
+
+    def __iter__(self):
+        for i in range(len(self.flags)):
+            yield CounterView(self, i)
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __repr__(self):
+        return 'CounterArray: %s counters' % len(self)
+
+
+class CounterView(object):
+    """
+    A lightweight AdvCounter like object for a single counter in a CounterArray.  The view holds no data itself,
+    all changes are made directly in the array.
+    """
+    __slots__ = ('array', 'index')
+
+    def __init__(self, counter_array, index):
+        self.array = counter_array
+        self.index = index
+
+    @property
+    def value(self):
+        return self.array.values[self.index]
+
+    @property
+    def min_counter(self):
+        if self.array.flags[self.index] & _HAS_MIN:
+            return self.array.min_values[self.index]
+        return None
+
+    @property
+    def max_counter(self):
+        if self.array.flags[self.index] & _HAS_MAX:
+            return self.array.max_values[self.index]
+        return None
+
+    @property
+    def rollover(self):
+        return bool(self.array.flags[self.index] & _ROLLOVER)
+
+    @property
+    def call_count(self):
+        return self.array.call_counts[self.index]
+
+    @property
+    def perc(self):
+        """
+        This returns the percent that the current value is between the min and max counter settings.
+
+        :raises AttributeError: If the min/max counters are not both set to a value.
+        """
+        min_counter = self.min_counter
+        max_counter = self.max_counter
+        if max_counter is None or min_counter is None:
+            raise AttributeError('perc is only valid for counters with min and max_counter set.')
+        return (self.value - min_counter) / (max_counter - min_counter)
+
+    @property
+    def perc_str(self):
+        return '{:.0%}'.format(self.perc)
+
+    def add(self, other=None):
+        self.array.add(self.index, other)
+        return self.value
+
+    def sub(self, other=None):
+        self.array.sub(self.index, other)
+        return self.value
+
+    def mult(self, other):
+        self.array.mult(self.index, other)
+        return self.value
+
+    def div(self, other):
+        self.array.div(self.index, other)
+        return self.value
+
+    def set(self, other):
+        self.array.set(self.index, other)
+        return self.value
+
+    def set_max(self, max_counter=None, min_counter=None):
+        self.array.set_max(self.index, max_counter, min_counter)
+
+    def clear(self):
+        self.array.clear(self.index)
+
+    def __call__(self, add=None):
+        return self.add(add)
+
+    def __iadd__(self, other):
+        self.add(other)
+        return self
+
+    def __isub__(self, other):
+        self.sub(other)
+        return self
+
+    def __imul__(self, other):
+        self.mult(other)
+        return self
+
+    def __itruediv__(self, other):
+        self.div(other)
+        return self
+
+    def _get_other(self, other):
+        if isinstance(other, CounterView):
+            return other.value
+        return getattr(other, 'value', other)
+
+    def __add__(self, other):
+        return self.value + self._get_other(other)
+
+    def __sub__(self, other):
+        return self.value - self._get_other(other)
+
+    def __mul__(self, other):
+        return self.value * self._get_other(other)
+
+    def __truediv__(self, other):
+        return self.value / self._get_other(other)
+
+    def __eq__(self, other):
+        return self.value == self._get_other(other)
+
+    def __lt__(self, other):
+        return self.value < self._get_other(other)
+
+    def __le__(self, other):
+        return self.value <= self._get_other(other)
+
+    def __gt__(self, other):
+        return self.value > self._get_other(other)
+
+    def __ge__(self, other):
+        return self.value >= self._get_other(other)
+
+    __hash__ = None
+
+    def __int__(self):
+        return int(self.value)
+
+    def __float__(self):
+        return float(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __len__(self):
+        return self.call_count
+
+    def __str__(self):
+        return str(self.value)
+
+    def __repr__(self):
+        tmp_ret = str(self)
+        if self.min_counter is not None or self.max_counter is not None:
+            tmp_ret += ' (%s <-> %s)' % (self.min_counter, self.max_counter)
+        if self.rollover:
+            tmp_ret += ' [rollover]'
+        return tmp_ret
@@ -0,0 +1,208 @@
+"""
+Runs call_every functions on a background thread.
+
+"""
+from collections import deque
+import logging
+import threading
+from .adv_counter import AdvCounter
+
+log = logging.getLogger(__name__)
+
+__all__ = ['CallbackDispatcher', 'DispatchedCounter', 'get_default_dispatcher']
+
+DISPATCH_OVERFLOW_DROP_OLDEST = 'drop_oldest'
+DISPATCH_OVERFLOW_COALESCE = 'coalesce'
+DISPATCH_OVERFLOW_BLOCK = 'block'
+
+_OVERFLOW_OPTIONS = (DISPATCH_OVERFLOW_DROP_OLDEST, DISPATCH_OVERFLOW_COALESCE, DISPATCH_OVERFLOW_BLOCK)
+
+
+class CallbackDispatcher(object):
+    """
+    Runs callbacks on a single background (daemon) thread, in the order they are submitted.
+
+    The queue is bounded by "maxsize", when it is full the "overflow" option decides what happens:
+
+        * 'drop_oldest': (the default) the oldest queued callback is dropped.
+        * 'coalesce': if a callback with the same key is already queued, its argument is replaced with the new one
+          (so a counter never has more than one queued callback), otherwise the oldest queued callback is dropped.
+        * 'block': the submitting thread waits until there is room in the queue.
+
+    The number of dropped (or replaced) callbacks is kept in "dropped".  Exceptions raised by the callbacks are
+    logged and counted in "errors".
+
+    The thread is started when the first callback is submitted.
+    """
+
+    def __init__(self, maxsize=1000, overflow=DISPATCH_OVERFLOW_DROP_OLDEST, name='counter-callbacks'):
+        """
+        :param maxsize: the maximum number of queued callbacks.
+        :param overflow: 'drop_oldest', 'coalesce' or 'block' (see above)
+        :param name: the name of the background thread.
+        """
+        if overflow not in _OVERFLOW_OPTIONS:
+            raise AttributeError('Invalid overflow option: %r' % overflow)
+        if maxsize < 1:
+            raise AttributeError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.name = name
+        self.dropped = 0
+        self.errors = 0
+        self._queue = deque()
+        self._queued = {}
+        self._active = 0
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def submit(self, func, arg, key=None):
+        """
+        Queues func(arg) to be run on the background thread.
+
+        :param key: used to find an existing queued callback to replace when overflow is 'coalesce'.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('CallbackDispatcher is closed')
+            if self.overflow == DISPATCH_OVERFLOW_COALESCE and key is not None:
+                entry = self._queued.get(key)
+                if entry is not None and entry[1] == func:
+                    entry[2] = arg
+                    self.dropped += 1
+                    return
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == DISPATCH_OVERFLOW_BLOCK and threading.current_thread() is not self._thread:
+                    while len(self._queue) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        raise RuntimeError('CallbackDispatcher is closed')
+                else:
+                    self._pop()
+                    self.dropped += 1
+            entry = [key, func, arg]
+            self._queue.append(entry)
+            if key is not None:
+                self._queued[key] = entry
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _pop(self):
+        entry = self._queue.popleft()
+        if entry[0] is not None and self._queued.get(entry[0]) is entry:
+            del self._queued[entry[0]]
+        return entry
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                key, func, arg = self._pop()
+                self._active += 1
+                self._cond.notify_all()
+            try:
+                func(arg)
+            except Exception:
+                log.exception('call_every_func failed')
+                self.errors += 1
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def flush(self, timeout=None):
+        """
+        Waits until all of the queued callbacks have been run.
+
+        :param timeout: the maximum number of seconds to wait (None waits forever)
+        :return: True if the queue was emptied, False if the timeout was reached.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._active, timeout)
+
+    def close(self, wait=True, timeout=None):
+        """
+        Stops the background thread after the queued callbacks have been run.  No more callbacks can be submitted
+        after this.
+
+        :param wait: if True, waits for the thread to finish.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        return 'CallbackDispatcher: %s queued' % len(self)
+
+
+_DEFAULT_DISPATCHER = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_dispatcher():
+    """
+    returns the CallbackDispatcher used by DispatchedCounters that are not passed one (it is created when first
+    needed).
+    """
+    global _DEFAULT_DISPATCHER
+    with _DEFAULT_LOCK:
+        if _DEFAULT_DISPATCHER is None:
+            _DEFAULT_DISPATCHER = CallbackDispatcher(overflow=DISPATCH_OVERFLOW_COALESCE)
+        return _DEFAULT_DISPATCHER
+
+
+class DispatchedCounter(AdvCounter):
+    """
+    An AdvCounter that runs its call_every_func on a CallbackDispatcher's background thread instead of inline, so
+    slow callbacks (such as formatting and logging reports) are not run by the code doing the counting.
+
+    The call_every_func is passed a CounterSnapshot (see AdvCounter.snapshot) of the counter as it was when the
+    call_every point was reached, instead of the counter itself.
+
+    >>> def log_progress(snap):
+    ...     log.info('%s: %s (%s)', snap.name, snap.value, snap.perc_str)
+    >>> dc = DispatchedCounter(min_counter=0, max_counter=len(records), call_every='10%', call_every_func=log_progress)
+    """
+
+    def __init__(self, *args, dispatcher=None, **kwargs):
+        """
+        :param dispatcher: the CallbackDispatcher to use (defaults to the shared one from get_default_dispatcher,
+            which coalesces callbacks for the same counter)
+        :param args: see AdvCounter
+        :param kwargs: see AdvCounter
+        """
+        if dispatcher is None:
+            dispatcher = get_default_dispatcher()
+        self.dispatcher = dispatcher
+        # the coalescing key (not id(self), which can be reused by another object once this one is collected,
+        # while a queued callback still holds this key)
+        self._dispatch_key = object()
+        super(DispatchedCounter, self).__init__(*args, **kwargs)
+
+    def _fire_call_every(self):
+        self.dispatcher.submit(self.call_every_func, self.snapshot(), key=self._dispatch_key)
+
+    def __copy__(self):
+        tmp_ret = super(DispatchedCounter, self).__copy__()
+        tmp_ret.dispatcher = self.dispatcher
+        return tmp_ret
+
+    copy = __copy__
@@ -0,0 +1,222 @@
+"""
+Counting distinct items (approximately) with HyperLogLog.
+
+"""
+import math
+from .adv_counter import AdvCounter
+from .sketch import _key_hash
+
+__all__ = ['DistinctCounter']
+
+_MAGIC = b'HLL1'
+_HASH_BITS = 64
+
+
+def _alpha(registers):
+    if registers == 16:
+        return 0.673
+    if registers == 32:
+        return 0.697
+    if registers == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / registers)
+
+
+class DistinctCounter(AdvCounter):
+    """
+    A counter of the number of distinct items added, using HyperLogLog.
+
+    Instead of numbers, add() takes the items to count (anything that can be converted to a string, or bytes), and the
+    value is the estimated number of different items added.  This uses 2 ** precision bytes (16KB for the default
+    precision of 14) no matter how many items are added, and the estimate has a standard error of about
+    1.04 / sqrt(2 ** precision) (0.8% for the default).
+
+    It can be used in a NamedCounter (including as the counter_class) and in reports like an AdvCounter, and the
+    call_every_func, call_count, observers, etc work the same way (each add is a call).  sub, mult, div and set are
+    not supported.
+
+    DistinctCounters with the same precision can be merged (see merge and combine), which gives the same result as
+    if all of the items had been added to one counter, and to_bytes / from_bytes give a compact (6 bits per register)
+    form that can be sent between processes.
+    """
+    fast_path = False
+
+    def __init__(self, precision=14, **kwargs):
+        """
+        :param precision: the number of bits used to pick the register (4 - 18), the counter uses 2 ** precision
+            registers.
+        :param kwargs: see AdvCounter (value is ignored)
+        """
+        if not 4 <= precision <= 18:
+            raise AttributeError('precision must be between 4 and 18 (not %r)' % precision)
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self._clear_registers()
+        kwargs.pop('value', None)
+        super(DistinctCounter, self).__init__(**kwargs)
+
+    def _clear_registers(self):
+        count = len(self.registers)
+        self.registers[:] = bytes(count)
+        # the sum of 2 ** -register (scaled by 2 ** 64 so it is an exact int) and the number of empty registers,
+        # these are kept up to date as the registers change, so reading the value is O(1).
+        self._inv_sum = count << _HASH_BITS
+        self._zeros = count
+
+    @property
+    def value(self):
+        """
+        the estimated number of distinct items.
+        """
+        count = len(self.registers)
+        estimate = _alpha(count) * count * count * (1 << _HASH_BITS) / self._inv_sum
+        if estimate <= 2.5 * count and self._zeros:
+            estimate = count * math.log(count / self._zeros)
+        return int(round(estimate))
+
+    @value.setter
+    def value(self, value):
+        # the value is always computed from the registers.
+        pass
+
+    def _add_item(self, item):
+        """
+        :return: True if a register changed.
+        """
+        if item is None:
+            raise AttributeError('An item must be passed to DistinctCounter.add()')
+        tmp_hash = _key_hash(item)[0]
+        bits = _HASH_BITS - self.precision
+        index = tmp_hash >> bits
+        rank = bits - (tmp_hash & ((1 << bits) - 1)).bit_length() + 1
+        current = self.registers[index]
+        if rank <= current:
+            return False
+        self.registers[index] = rank
+        self._inv_sum += (1 << (_HASH_BITS - rank)) - (1 << (_HASH_BITS - current))
+        if not current:
+            self._zeros -= 1
+        return True
+
+    def _do_math(self, value=None, operation='add', ret='value', force=False):
+        if operation != 'add':
+            raise AttributeError('DistinctCounter only supports add (not %s)' % operation)
+        if ret == 'copy':
+            return self.copy()._do_math(value, operation, ret='self', force=force)
+        self._add_item(value)
+        # the value is computed from the registers, this only updates the call count (and calls the observers and
+        # call_every_func)
+        self._set(0)
+        if ret == 'value':
+            return self.value
+        return self
+
+    def clear(self):
+        """
+        Removes all of the items.
+        """
+        self._clear_registers()
+        super(DistinctCounter, self).clear()
+
+    def merge(self, *others):
+        """
+        Adds the items from other DistinctCounters (with the same precision) to this one.
+        """
+        registers = self.registers
+        for other in others:
+            if other.precision != self.precision:
+                raise AttributeError('Only DistinctCounters with the same precision can be merged.')
+            for index, rank in enumerate(other.registers):
+                current = registers[index]
+                if rank > current:
+                    registers[index] = rank
+                    self._inv_sum += (1 << (_HASH_BITS - rank)) - (1 << (_HASH_BITS - current))
+                    if not current:
+                        self._zeros -= 1
+            self.call_count += other.call_count
+        if self._observer is not None:
+            self._observer(self)
+        return self
+
+    @classmethod
+    def combine(cls, *counters, **kwargs):
+        """
+        Returns a new DistinctCounter with the items from all of the counters (see AdvCounter.combine, the bounds
+        and on_conflict options are ignored).  The other settings are taken from the first counter.
+        """
+        if len(counters) == 1 and not isinstance(counters[0], DistinctCounter):
+            counters = tuple(counters[0])
+        if not counters:
+            raise AttributeError('At least one counter must be passed to combine.')
+        tmp_ret = counters[0].copy()
+        tmp_ret.merge(*counters[1:])
+        return tmp_ret
+
+    def __copy__(self):
+        tmp_ret = self.__class__(
+            precision=self.precision,
+            min_counter=self.min_counter,
+            max_counter=self.max_counter,
+            call_every=self.call_every,
+            call_every_func=self.call_every_func,
+            perc_decimal=self.perc_decimal,
+            call_every_seconds=self.call_every_seconds,
+        )
+        tmp_ret.registers[:] = self.registers
+        tmp_ret._inv_sum = self._inv_sum
+        tmp_ret._zeros = self._zeros
+        tmp_ret.call_countdown = self.call_countdown
+        tmp_ret.call_count = self.call_count
+        return tmp_ret
+
+    copy = __copy__
+
+    def to_bytes(self):
+        """
+        :return: the registers as bytes (a 5 byte header, and 6 bits per register)
+        """
+        registers = self.registers
+        tmp_ret = bytearray(_MAGIC)
+        tmp_ret.append(self.precision)
+        for i in range(0, len(registers), 4):
+            packed = registers[i] | registers[i + 1] << 6 | registers[i + 2] << 12 | registers[i + 3] << 18
+            tmp_ret += packed.to_bytes(3, 'little')
+        return bytes(tmp_ret)
+
+    @classmethod
+    def from_bytes(cls, data, **kwargs):
+        """
+        Creates a DistinctCounter from the output of to_bytes.
+
+        :param kwargs: the other counter settings (see AdvCounter)
+        """
+        if data[:4] != _MAGIC:
+            raise ValueError('Not a serialized DistinctCounter.')
+        tmp_ret = cls(precision=data[4], **kwargs)
+        count = len(tmp_ret.registers)
+        if len(data) != 5 + count * 3 // 4:
+            raise ValueError('Serialized DistinctCounter has the wrong length.')
+        registers = bytearray(count)
+        for i in range(0, count, 4):
+            offset = 5 + i * 3 // 4
+            packed = int.from_bytes(data[offset:offset + 3], 'little')
+            registers[i] = packed & 63
+            registers[i + 1] = packed >> 6 & 63
+            registers[i + 2] = packed >> 12 & 63
+            registers[i + 3] = packed >> 18
+        tmp_ret.merge(_Registers(tmp_ret.precision, registers))
+        return tmp_ret
+
+    def __repr__(self):
+        return 'DistinctCounter(precision=%s): ~%s' % (self.precision, self.value)
+
+
+class _Registers(object):
+    """
+    used to merge a set of registers into a counter.
+    """
+
+    def __init__(self, precision, registers):
+        self.precision = precision
+        self.registers = registers
+        self.call_count = 0
@@ -1,4 +1,5 @@
 import sys
+import time
 from unicodedata import normalize
 
 
@@ -161,6 +162,9 @@ def minmax(value, min_val=None, max_val=None, rollover=False):
     :param value:
     :param min_val: if None, will return only the max of the value and the max setting
     :param max_val: if None, will return only the min of the value and min setting.
+    :param rollover: if True (and both min_val and max_val are set), values outside of the range will wrap around
+        (the min and max are both inclusive, so a range of 0 - 59 wraps every 60).  This is computed in constant time
+        no matter how far outside of the range the value is.
     :return:
     """
     if min_val is None and max_val is None:
@@ -170,15 +174,172 @@ def minmax(value, min_val=None, max_val=None, rollover=False):
     if max_val is None:
         return max(value, min_val)
     if rollover:
-        diff = max_val - min_val + 1
-        while value > max_val:
-            value -= diff
-        while value < min_val:
-            value += diff
-        return value
+        if min_val <= value <= max_val:
+            return value
+        return _wrap(value, min_val, max_val - min_val + 1)
     else:
         return min(max_val, max(value, min_val))
 
+
+def _wrap(value, min_val, diff):
+    offset = (value - min_val) % diff
+    # Decimal's % keeps the sign of the dividend, and float rounding can return the divisor itself.
+    if offset < 0:
+        offset += diff
+    elif offset >= diff:
+        offset -= diff
+    return min_val + offset
+
+
+def minmax_many(values, min_val=None, max_val=None, rollover=False):
+    """
+    the same as minmax, but takes an iterable of values and returns a list of the adjusted values.
+
+    :param values: an iterable of values
+    :param min_val: see minmax
+    :param max_val: see minmax
+    :param rollover: see minmax
+    :return: a list of values
+    """
+    if min_val is None and max_val is None:
+        return list(values)
+    if min_val is None:
+        return [max_val if max_val < v else v for v in values]
+    if max_val is None:
+        return [min_val if min_val > v else v for v in values]
+    if rollover:
+        diff = max_val - min_val + 1
+        return [v if min_val <= v <= max_val else _wrap(v, min_val, diff) for v in values]
+    return [min(max_val, max(v, min_val)) for v in values]
+
+
+def tree_reduce(items, func, fan_in=16, executor=None):
+    """
+    Reduces a list of items to a single item by calling func(*group) on groups of up to "fan_in" items, then on
+    groups of those results, and so on until one is left.
+
+    This is intended for merging a large number of partial results (for example, per worker NamedCounters using
+    NamedCounter.merge, or counters using AdvCounter.combine), each level can be run in parallel and no single call
+    has to handle all of the items.
+
+    >>> tree_reduce([AdvCounter(1), AdvCounter(2), AdvCounter(3)], AdvCounter.combine, fan_in=2).value
+    6
+
+    :param items: an iterable of the items to reduce.
+    :param func: a function that takes any number of items (from 2 to fan_in) and returns a single item.
+    :param fan_in: the maximum number of items passed to each call of func.
+    :param executor: if passed, a concurrent.futures executor that is used to run the calls for each level.
+        (when using a ProcessPoolExecutor, the func and the items must be able to be pickled)
+    :return: the reduced item.
+    """
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2')
+    items = list(items)
+    if not items:
+        raise ValueError('tree_reduce requires at least one item')
+
+    while len(items) > 1:
+        groups = [items[i:i + fan_in] for i in range(0, len(items), fan_in)]
+        if executor is None:
+            items = [func(*group) if len(group) > 1 else group[0] for group in groups]
+        else:
+            futures = [executor.submit(func, *group) if len(group) > 1 else group for group in groups]
+            items = [f[0] if isinstance(f, list) else f.result() for f in futures]
+    return items[0]
+
+
+class CallTimer(object):
+    """
+    Keeps track of a wall clock interval for a counter without reading the clock on every call.
+
+    check() is called once per counter call, and only reads the clock every "sample_every" calls.  sample_every is
+    adjusted at each read based on the rate of calls, aiming for about "samples" clock reads per interval (and is
+    at most doubled at each read, so a change in the rate is picked up quickly), so at a steady rate the interval is
+    detected within about interval / samples seconds.
+
+    .. note::
+        since the clock is only checked when the counter is called, nothing happens while the counter is idle.
+    """
+    __slots__ = ('interval', 'samples', 'max_sample', 'clock', 'sample_every', 'countdown', 'next_time', 'last_sample')
+
+    def __init__(self, interval, samples=16, max_sample=64, clock=time.monotonic):
+        """
+        :param interval: the interval in seconds.
+        :param samples: the target number of clock reads per interval.
+        :param max_sample: the maximum number of calls between clock reads, this limits how late the interval can be
+            detected if the rate of calls suddenly drops.
+        :param clock: the function used to read the clock.
+        """
+        if interval <= 0:
+            raise ValueError('The interval must be more than 0 seconds')
+        self.interval = interval
+        self.samples = samples
+        self.max_sample = max_sample
+        self.clock = clock
+        self.sample_every = 1
+        self.countdown = 1
+        self.restart()
+
+    def restart(self):
+        """
+        starts a new interval from now.
+        """
+        now = self.clock()
+        self.last_sample = now
+        self.next_time = now + self.interval
+
+    def due(self):
+        """
+        reads the clock and returns True (and starts a new interval) if the interval has passed.
+        """
+        now = self.clock()
+        if now >= self.next_time:
+            self.last_sample = now
+            self._next_interval(now)
+            return True
+        return False
+
+    def _next_interval(self, now):
+        # keep to the original schedule unless a whole interval was missed, so the late detection does not drift.
+        if now - self.next_time < self.interval:
+            self.next_time += self.interval
+        else:
+            self.next_time = now + self.interval
+
+    def check(self):
+        """
+        counts a call, and returns True (and starts a new interval) if the interval has passed.
+        """
+        self.countdown -= 1
+        if self.countdown > 0:
+            return False
+        return self.sample()
+
+    def sample(self):
+        """
+        reads the clock and adjusts sample_every, this is called by check() when the countdown reaches 0.
+
+        :return: True (and starts a new interval) if the interval has passed.
+        """
+        now = self.clock()
+        calls = self.sample_every
+        elapsed = now - self.last_sample
+        self.last_sample = now
+        if elapsed > 0:
+            sample_every = int(calls * self.interval / (elapsed * self.samples))
+            sample_every = min(sample_every, calls * 2, self.max_sample)
+        else:
+            sample_every = min(calls * 2, self.max_sample)
+        self.sample_every = self.countdown = max(sample_every, 1)
+
+        if now >= self.next_time:
+            self._next_interval(now)
+            return True
+        return False
+
+    def __repr__(self):
+        return 'CallTimer: every %ss' % self.interval
+
 '''
 class MinMaxObj(object):
     """
@@ -0,0 +1,501 @@
+"""
+Histograms (distributions of values such as latencies or sizes) with fixed and HDR style bucket layouts.
+
+"""
+from abc import ABC, abstractmethod
+import math
+from .adv_counter import AdvCounter
+
+__all__ = ['Histogram', 'LinearBuckets', 'ExponentialBuckets', 'HdrBuckets']
+
+_INF = float('inf')
+# the counts are also summed in blocks of 2 ** _BLOCK_BITS buckets, so finding a percentile only scans the buckets
+# in one block.
+_BLOCK_BITS = 6
+_FAST_TYPES = frozenset((int, float))
+
+
+def _floor(scaled):
+    """
+    rounds a (non negative) value divided by a bucket width down to an int.  A multiple of a float width (such as a
+    bucket's lower bound) can come out just below the int after the division, so values within the float error of
+    the next int are rounded up to it.
+    """
+    tmp_ret = int(scaled)
+    if tmp_ret + 1 - scaled <= scaled * 1e-12:
+        tmp_ret += 1
+    return tmp_ret
+
+
+class _Layout(ABC):
+    """
+    The base for the bucket layouts.
+
+    A layout has "buckets" buckets, and maps a value to its position in the histogram counts, where position 0 is
+    for values below the first bucket (the underflow), positions 1 - buckets are the buckets, and position
+    buckets + 1 is for values above the last bucket (the overflow).
+    """
+    buckets = 0
+
+    @abstractmethod
+    def position(self, value):
+        """
+        :return: the position of the value in the counts (0 for the underflow, buckets + 1 for the overflow)
+        """
+
+    def bounds(self, position):
+        """
+        :return: the (lower, upper) bounds of the values in a position (the underflow and overflow are unbounded)
+        """
+        if position <= 0:
+            return -_INF, self._lower(0)
+        if position > self.buckets:
+            return self._lower(self.buckets), _INF
+        return self._lower(position - 1), self._lower(position)
+
+    @abstractmethod
+    def _lower(self, index):
+        """
+        the lower bound of bucket "index" (0 based, index == buckets is the upper bound of the last bucket)
+        """
+
+    @abstractmethod
+    def _key(self):
+        """
+        the settings of the layout, used to compare and hash layouts.
+        """
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return '%s%r' % (self.__class__.__name__, self._key())
+
+
+class LinearBuckets(_Layout):
+    """
+    "count" buckets of the same width, the first starting at "start".
+
+    >>> LinearBuckets(0, 10, 100)       # 0-10, 10-20, ... 990-1000
+    """
+
+    def __init__(self, start, width, count):
+        if width <= 0 or count < 1:
+            raise AttributeError('width and count must be greater than 0.')
+        self.start = start
+        self.width = width
+        self.buckets = count
+
+    def position(self, value):
+        if value < self.start:
+            return 0
+        offset = value - self.start
+        if offset.__class__ is int and self.width.__class__ is int:
+            index = offset // self.width
+        else:
+            # see _floor (inlined here since this is called for every value recorded)
+            scaled = offset / self.width
+            index = int(scaled)
+            if index + 1 - scaled <= scaled * 1e-12:
+                index += 1
+        if index >= self.buckets:
+            return self.buckets + 1
+        return index + 1
+
+    def _lower(self, index):
+        return self.start + index * self.width
+
+    def _key(self):
+        return self.start, self.width, self.buckets
+
+
+class ExponentialBuckets(_Layout):
+    """
+    "count" buckets, each "factor" times wider than the one before it, the first starting at "start".
+
+    >>> ExponentialBuckets(0.001, 2, 20)       # 1ms-2ms, 2ms-4ms, ... 262s-524s
+    """
+
+    def __init__(self, start, factor, count):
+        if start <= 0 or factor <= 1 or count < 1:
+            raise AttributeError('start must be greater than 0, factor greater than 1, and count at least 1.')
+        self.start = start
+        self.factor = factor
+        self.buckets = count
+        self._log_factor = math.log(factor)
+        self._limits = [start * factor ** i for i in range(count + 1)]
+
+    def position(self, value):
+        limits = self._limits
+        if value < self.start:
+            return 0
+        if value >= limits[-1]:
+            return self.buckets + 1
+        index = int(math.log(value / self.start) / self._log_factor)
+        # the log can be off by one at the bucket limits.
+        if index >= self.buckets or value < limits[index]:
+            index -= 1
+        elif value >= limits[index + 1]:
+            index += 1
+        return index + 1
+
+    def _lower(self, index):
+        return self._limits[index]
+
+    def _key(self):
+        return self.start, self.factor, self.buckets
+
+
+class HdrBuckets(_Layout):
+    """
+    An HDR (high dynamic range) style log-linear layout, which keeps "significant_figures" digits of precision for
+    every value from 0 to "highest".
+
+    Values are divided by the resolution and truncated to ints, the ints below 2 * 10 ** significant_figures (rounded
+    up to a power of 2) each have a bucket, and above that each power of 2 range is split into the same number of
+    linear buckets, so each bucket is at most 1 / 10 ** significant_figures of its value wide.
+
+    >>> HdrBuckets(highest=60, significant_figures=2, resolution=0.000001)       # 1us to 1 minute, in seconds
+    """
+
+    def __init__(self, highest=2 ** 32, significant_figures=2, resolution=1):
+        if not 1 <= significant_figures <= 5:
+            raise AttributeError('significant_figures must be between 1 and 5 (not %r)' % significant_figures)
+        if resolution <= 0 or highest < resolution:
+            raise AttributeError('resolution must be greater than 0, and highest at least the resolution.')
+        self.highest = highest
+        self.significant_figures = significant_figures
+        self.resolution = resolution
+        self._sub_bits = int(math.ceil(math.log2(2 * 10 ** significant_figures)))
+        self._sub_count = 1 << self._sub_bits
+        self._half = self._sub_count >> 1
+        self.buckets = self._index(_floor(highest / resolution)) + 1
+
+    def _index(self, scaled):
+        shift = scaled.bit_length() - self._sub_bits
+        if shift <= 0:
+            return scaled
+        return self._sub_count + (shift - 1) * self._half + (scaled >> shift) - self._half
+
+    def position(self, value):
+        if value < 0:
+            return 0
+        # see _floor (inlined here since this is called for every value recorded)
+        scaled = value / self.resolution
+        index = int(scaled)
+        if index + 1 - scaled <= scaled * 1e-12:
+            index += 1
+        index = self._index(index)
+        if index >= self.buckets:
+            return self.buckets + 1
+        return index + 1
+
+    def _lower(self, index):
+        if index < self._sub_count:
+            return index * self.resolution
+        shift, sub = divmod(index - self._sub_count, self._half)
+        return ((sub + self._half) << (shift + 1)) * self.resolution
+
+    def _key(self):
+        return self.highest, self.significant_figures, self.resolution
+
+
+class Histogram(AdvCounter):
+    """
+    A counter of the distribution of the values added, such as latencies or payload sizes.
+
+    add() (or record()) puts the value in a bucket, and the value of the counter is the number of values recorded,
+    so it can be used in a NamedCounter (including as the counter_class) and in reports like an AdvCounter.  The
+    percentiles are estimated from the buckets::
+
+        >>> latency = Histogram(ExponentialBuckets(0.001, 2, 20))
+        >>> latency.add(0.0153)
+        >>> latency.p99
+
+    The buckets are set by the layout, LinearBuckets, ExponentialBuckets or HdrBuckets (the default is
+    HdrBuckets(), 2 significant figures for ints up to 2 ** 32).  Values outside of the layout are counted in an
+    underflow or overflow bucket.  Recording a value is O(1), and a percentile is estimated by interpolating within
+    the bucket it falls in (limited to the lowest and highest values recorded), so it is within the width of that
+    bucket.
+
+    The count, total, mean, min_value, max_value and percentiles (p50, p90, p95, p99 and p999) can be used as
+    report fields, such as line_format='{indent}{name} : {count} p50={p50:.3f} p99={p99:.3f}'.
+
+    Histograms with the same layout can be merged (see merge and combine).  sub, mult, div and set are not supported,
+    and the call_every_func, call_count and observers work as they do for AdvCounter (each add is a call).
+    """
+
+    def __init__(self, layout=None, **kwargs):
+        """
+        :param layout: the bucket layout, a LinearBuckets, ExponentialBuckets or HdrBuckets (defaults to
+            HdrBuckets())
+        :param kwargs: see AdvCounter (value is ignored)
+        """
+        if layout is None:
+            layout = HdrBuckets()
+        elif not isinstance(layout, _Layout):
+            raise AttributeError('layout must be a LinearBuckets, ExponentialBuckets or HdrBuckets (not %r)' % layout)
+        self.layout = layout
+        self._clear_counts()
+        kwargs.pop('value', None)
+        super(Histogram, self).__init__(**kwargs)
+
+    def _clear_counts(self):
+        positions = self.layout.buckets + 2
+        self.counts = [0] * positions
+        self._blocks = [0] * ((positions >> _BLOCK_BITS) + 1)
+        self.count = 0
+        self.total = 0
+        self.min_value = None
+        self.max_value = None
+
+    @property
+    def value(self):
+        """
+        the number of values recorded.
+        """
+        return self.count
+
+    @value.setter
+    def value(self, value):
+        # the value is always the count.
+        pass
+
+    def _record(self, value, count=1):
+        position = self.layout.position(value)
+        self.counts[position] += count
+        self._blocks[position >> _BLOCK_BITS] += count
+        self.count += count
+        self.total += value * count
+        if self.min_value is None:
+            self.min_value = self.max_value = value
+        elif value < self.min_value:
+            self.min_value = value
+        elif value > self.max_value:
+            self.max_value = value
+
+    def _do_math(self, value=None, operation='add', ret='value', force=False):
+        if operation != 'add':
+            raise AttributeError('Histogram only supports add (not %s)' % operation)
+        if value is None:
+            raise AttributeError('A value must be passed to Histogram.add()')
+        if ret == 'copy':
+            return self.copy()._do_math(value, operation, ret='self', force=force)
+        self._record(value)
+        # the value is the count, this only updates the call count (and calls the observers and call_every_func)
+        self._set(0)
+        if ret == 'value':
+            return self.count
+        return self
+
+    def _pick_fast_path(self):
+        """
+        uses _fast_record for add() when there are no observers or call_every_seconds timer.
+        """
+        self._fast_add = None
+        self._fast_batch = False
+        if self.fast_path and self.math_return == 'value' and self.call_timer is None and self._observer is None:
+            self._fast_add = _fast_record
+
+    def record(self, value, count=1):
+        """
+        Records a value "count" times (as one call).
+
+        :return: the number of values recorded.
+        """
+        if count < 1:
+            raise AttributeError('count must be at least 1.')
+        self._record(value, count)
+        self._set(0)
+        return self.count
+
+    @property
+    def mean(self):
+        """
+        the average of the values recorded (None if no values are recorded)
+        """
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def _estimate(self, position, rank):
+        """
+        estimates the value with "rank" values below it, in a bucket.
+        """
+        lower, upper = self.layout.bounds(position)
+        lower = max(lower, self.min_value)
+        upper = min(upper, self.max_value)
+        if upper <= lower:
+            return lower
+        return lower + (upper - lower) * rank / self.counts[position]
+
+    def percentiles(self, *percents):
+        """
+        :param percents: the percentiles to estimate (0 - 100)
+        :return: a list of the estimated values (None if no values are recorded)
+        """
+        for percent in percents:
+            if not 0 <= percent <= 100:
+                raise AttributeError('percentiles must be between 0 and 100 (not %r)' % percent)
+        if not self.count:
+            return [None] * len(percents)
+        counts = self.counts
+        blocks = self._blocks
+        tmp_ret = [None] * len(percents)
+        block = block_seen = 0
+        position = seen = 0
+        for rank, i in sorted((percent * self.count / 100.0, i) for i, percent in enumerate(percents)):
+            # find the first bucket with values where the number of values up to the end of it reaches the rank,
+            # skipping whole blocks first.
+            if not blocks[block] or block_seen + blocks[block] < rank:
+                while not blocks[block] or block_seen + blocks[block] < rank:
+                    block_seen += blocks[block]
+                    block += 1
+                position = block << _BLOCK_BITS
+                seen = block_seen
+            while not counts[position] or seen + counts[position] < rank:
+                seen += counts[position]
+                position += 1
+            tmp_ret[i] = self._estimate(position, rank - seen)
+        return tmp_ret
+
+    def percentile(self, percent):
+        """
+        :param percent: the percentile to estimate (0 - 100)
+        :return: the estimated value (None if no values are recorded)
+        """
+        return self.percentiles(percent)[0]
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p90(self):
+        return self.percentile(90)
+
+    @property
+    def p95(self):
+        return self.percentile(95)
+
+    @property
+    def p99(self):
+        return self.percentile(99)
+
+    @property
+    def p999(self):
+        return self.percentile(99.9)
+
+    def buckets(self):
+        """
+        :return: a list of (lower, upper, count) for the buckets with values (including the underflow and overflow)
+        """
+        bounds = self.layout.bounds
+        return [bounds(position) + (count,) for position, count in enumerate(self.counts) if count]
+
+    def clear(self):
+        """
+        Removes all of the values.
+        """
+        self._clear_counts()
+        super(Histogram, self).clear()
+
+    def merge(self, *others):
+        """
+        Adds the values from other Histograms (with the same layout) to this one.
+        """
+        counts = self.counts
+        blocks = self._blocks
+        for other in others:
+            if other.layout != self.layout:
+                raise AttributeError('Only Histograms with the same layout can be merged.')
+            if not other.count:
+                continue
+            for position, count in enumerate(other.counts):
+                if count:
+                    counts[position] += count
+                    blocks[position >> _BLOCK_BITS] += count
+            self.count += other.count
+            self.total += other.total
+            if self.min_value is None or other.min_value < self.min_value:
+                self.min_value = other.min_value
+            if self.max_value is None or other.max_value > self.max_value:
+                self.max_value = other.max_value
+            self.call_count += other.call_count
+        if self._observer is not None:
+            self._observer(self)
+        return self
+
+    @classmethod
+    def combine(cls, *counters, **kwargs):
+        """
+        Returns a new Histogram with the values from all of the counters (see AdvCounter.combine, the bounds and
+        on_conflict options are ignored).  The other settings are taken from the first counter.
+        """
+        if len(counters) == 1 and not isinstance(counters[0], Histogram):
+            counters = tuple(counters[0])
+        if not counters:
+            raise AttributeError('At least one counter must be passed to combine.')
+        tmp_ret = counters[0].copy()
+        tmp_ret.merge(*counters[1:])
+        return tmp_ret
+
+    def __copy__(self):
+        tmp_ret = self.__class__(
+            layout=self.layout,
+            min_counter=self.min_counter,
+            max_counter=self.max_counter,
+            call_every=self.call_every,
+            call_every_func=self.call_every_func,
+            perc_decimal=self.perc_decimal,
+            call_every_seconds=self.call_every_seconds,
+        )
+        tmp_ret.counts[:] = self.counts
+        tmp_ret._blocks[:] = self._blocks
+        tmp_ret.count = self.count
+        tmp_ret.total = self.total
+        tmp_ret.min_value = self.min_value
+        tmp_ret.max_value = self.max_value
+        tmp_ret.call_countdown = self.call_countdown
+        tmp_ret.call_count = self.call_count
+        return tmp_ret
+
+    copy = __copy__
+
+    def __repr__(self):
+        return 'Histogram(%r): %s values' % (self.layout, self.count)
+
+
+def _fast_record(counter, value):
+    """
+    the add routine for Histograms without observers or a call_every_seconds timer (see _pick_fast_path), this is
+    the same as _do_math for int and float values, and passes anything else to it.
+    """
+    if value.__class__ not in _FAST_TYPES:
+        return counter._do_math(value, 'add', ret='value')
+    position = counter.layout.position(value)
+    counter.counts[position] += 1
+    counter._blocks[position >> _BLOCK_BITS] += 1
+    counter.count += 1
+    counter.total += value
+    min_value = counter.min_value
+    if min_value is None:
+        counter.min_value = counter.max_value = value
+    elif value < min_value:
+        counter.min_value = value
+    elif value > counter.max_value:
+        counter.max_value = value
+
+    counter.call_count += 1
+    counter.call_countdown -= 1
+    if counter.call_countdown <= 0:
+        counter.call_countdown = counter._call_every
+        if counter.call_every_func is not None:
+            counter._fire_call_every()
+    return counter.count
@@ -0,0 +1,362 @@
+"""
+Rate limiters (token and leaky buckets) built on AdvCounter.
+
+"""
+from abc import ABCMeta, abstractmethod
+import asyncio
+import threading
+import time
+from .adv_counter import AdvCounter, NamedCounter
+from .helpers import minmax
+
+__all__ = ['TokenBucket', 'LeakyBucket', 'KeyedRateLimiter']
+
+
+class _Bucket(AdvCounter, metaclass=ABCMeta):
+    """
+    The shared logic for TokenBucket and LeakyBucket.
+
+    The value is clamped between 0 and the capacity (the min and max counters), and moves towards one of them at
+    "rate" per second.  The change is computed from the time since the bucket was last read, so no timer thread is
+    needed.
+    """
+    fast_path = False
+    _direction = 1
+
+    def __init__(self, rate, capacity=None, value=None, clock=time.monotonic, sleep=time.sleep, **kwargs):
+        """
+        :param rate: the number of tokens added (or leaked) per second.
+        :param capacity: the size of the bucket (defaults to the rate, allowing a burst of one second)
+        :param value: the starting value (see the sub-classes for the default)
+        :param clock: the function used to read the time.
+        :param sleep: the function used to wait in acquire().
+        :param kwargs: see AdvCounter (min_counter, max_counter and rollover cannot be set)
+        """
+        if rate <= 0:
+            raise AttributeError('rate must be greater than 0.')
+        if capacity is None:
+            capacity = rate
+        if capacity <= 0:
+            raise AttributeError('capacity must be greater than 0.')
+        for arg in ('min_counter', 'max_counter', 'rollover'):
+            if kwargs.pop(arg, None):
+                raise AttributeError('%s cannot be set for a %s' % (arg, self.__class__.__name__))
+        # (the "rate" attribute is the measured rate of the counter, see AdvCounter.rate)
+        self.per_second = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.RLock()
+        self._level = 0
+        self._last = clock()
+        if value is None:
+            value = self._full_value()
+        super(_Bucket, self).__init__(value=value, min_counter=0, max_counter=capacity, **kwargs)
+
+    @abstractmethod
+    def _full_value(self):
+        """
+        the default starting value.
+        """
+
+    def _refill(self):
+        """
+        updates the level for the time since it was last read, this must be called with the lock held.
+        """
+        now = self.clock()
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._last = now
+            self._level = minmax(self._level + self._direction * elapsed * self.per_second, 0, self.capacity)
+        return self._level
+
+    @property
+    def value(self):
+        with self._lock:
+            return self._refill()
+
+    @value.setter
+    def value(self, value):
+        self._level = value
+
+    @abstractmethod
+    def _can_take(self, value, tokens):
+        """
+        :return: True if the tokens can be taken with the bucket at "value".
+        """
+
+    @abstractmethod
+    def _take(self, tokens):
+        """
+        takes the tokens (after _can_take returned True).
+        """
+
+    @abstractmethod
+    def _wait_time(self, value, tokens):
+        """
+        :return: the number of seconds until the tokens can be taken with the bucket at "value" (<= 0 if now)
+        """
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes the tokens if they are available.
+
+        :return: True if the tokens were taken, False if not (nothing is taken).
+        """
+        with self._lock:
+            if self._can_take(self._refill(), tokens):
+                self._take(tokens)
+                return True
+            return False
+
+    def wait_time(self, tokens=1):
+        """
+        :return: the number of seconds until the tokens will be available (0 if they are available now)
+        """
+        with self._lock:
+            return max(self._wait_time(self._refill(), tokens), 0.0)
+
+    def _check_tokens(self, tokens):
+        if tokens > self.capacity:
+            raise ValueError('Cannot acquire %s tokens from a bucket with a capacity of %s' % (tokens, self.capacity))
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Waits until the tokens are available and takes them.
+
+        :param tokens: the number of tokens to take.
+        :param timeout: the most seconds to wait (None waits as long as needed)
+        :return: True if the tokens were taken, False if the timeout passed first.
+        :raises ValueError: if more tokens than the capacity are requested.
+        """
+        self._check_tokens(tokens)
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                if self.try_acquire(tokens):
+                    return True
+                wait = self.wait_time(tokens)
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining < wait:
+                    if remaining > 0:
+                        self.sleep(remaining)
+                    return self.try_acquire(tokens)
+            self.sleep(wait)
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """
+        The same as acquire(), but waits with asyncio.sleep.
+        """
+        self._check_tokens(tokens)
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                if self.try_acquire(tokens):
+                    return True
+                wait = self.wait_time(tokens)
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining < wait:
+                    if remaining > 0:
+                        await asyncio.sleep(remaining)
+                    return self.try_acquire(tokens)
+            await asyncio.sleep(wait)
+
+    def __copy__(self):
+        tmp_ret = self.__class__(
+            self.per_second,
+            capacity=self.capacity,
+            value=self.value,
+            clock=self.clock,
+            sleep=self.sleep,
+            call_every=self.call_every,
+            call_every_func=self.call_every_func,
+            perc_decimal=self.perc_decimal,
+            call_every_seconds=self.call_every_seconds,
+        )
+        tmp_ret.call_countdown = self.call_countdown
+        tmp_ret.call_count = self.call_count
+        return tmp_ret
+
+    copy = __copy__
+
+    @property
+    def idle(self):
+        """
+        True if the bucket is in its starting (full or empty) state, so dropping it and creating a new one would make
+        no difference.
+        """
+        return self.value == self._full_value()
+
+    def __repr__(self):
+        return '%s(rate=%s, capacity=%s): %s' % (self.__class__.__name__, self.per_second, self.capacity, self.value)
+
+
+class TokenBucket(_Bucket):
+    """
+    A token bucket rate limiter.
+
+    The value is the number of tokens available, it starts full (at the capacity), and is refilled at "rate" tokens
+    per second up to the capacity.  Each request takes tokens (see try_acquire, acquire and acquire_async).  This
+    allows bursts of up to "capacity" requests, with an average of "rate" per second.
+
+    >>> limiter = TokenBucket(rate=10, capacity=20)
+    >>> if limiter.try_acquire():
+    ...     send_request()
+
+    The refill is computed from the time since the bucket was last read, and the value is kept between 0 and the
+    capacity with the min / max counters, so the call_every_func, reports, etc work as they do for AdvCounter.
+    Each successful acquire is a call (a sub) for the call_count.
+    """
+
+    def _full_value(self):
+        return self.capacity
+
+    def _can_take(self, value, tokens):
+        return value >= tokens
+
+    def _take(self, tokens):
+        self.sub(tokens)
+
+    def _wait_time(self, value, tokens):
+        return (tokens - value) / float(self.per_second)
+
+
+class LeakyBucket(_Bucket):
+    """
+    A leaky bucket (as a meter) rate limiter.
+
+    The value is the level of the bucket, it starts empty, each request adds to the level (if it fits under the
+    capacity), and the bucket leaks at "rate" per second.  This is the mirror image of the TokenBucket (the level is
+    the capacity minus the tokens) and has the same methods.
+    """
+    _direction = -1
+
+    def _full_value(self):
+        return 0
+
+    def _can_take(self, value, tokens):
+        return value + tokens <= self.capacity
+
+    def _take(self, tokens):
+        self.add(tokens)
+
+    def _wait_time(self, value, tokens):
+        return (value + tokens - self.capacity) / float(self.per_second)
+
+
+class KeyedRateLimiter(NamedCounter):
+    """
+    A set of rate limiters, one per key (such as a client ip or user), created as the keys are used.
+
+    >>> limiter = KeyedRateLimiter(rate=5, capacity=10)
+    >>> if not limiter.try_acquire(request.remote_addr):
+    ...     return too_many_requests()
+
+    The buckets are kept in a NamedCounter, so they can be reported on, merged, etc.  Keys are used as is (they are
+    not slugified, so keys like ip addresses do not clash), and are used as the counter names in reports.
+
+    Buckets that are back in their starting state can be dropped with prune() to limit the memory used by
+    keys that are no longer active.
+    """
+    rate = None
+    capacity = None
+    bucket_class = TokenBucket
+    _buckets = None
+
+    def __init__(self, rate, capacity=None, bucket_class=None, name=None, aggregates=False, **bucket_kwargs):
+        """
+        :param rate: see TokenBucket.
+        :param capacity: see TokenBucket.
+        :param bucket_class: the class used for the buckets, TokenBucket (the default) or LeakyBucket.
+        :param name: the name used for the report header.
+        :param aggregates: see NamedCounter.
+        :param bucket_kwargs: any other arguments for the buckets (clock, sleep, call_every_func, etc)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        if bucket_class is not None:
+            self.bucket_class = bucket_class
+        self.bucket_kwargs = bucket_kwargs
+        self._buckets = {}
+        self._next_id = 0
+        super(KeyedRateLimiter, self).__init__(name=name, locked=False, aggregates=aggregates)
+
+    def new(self, key, value=None, name=None, overwrite=False, description='', **kwargs):
+        """
+        Adds a bucket for a key (this is done automatically by get())
+        """
+        if key in self._buckets and not overwrite:
+            raise AttributeError('Key %r already exists in KeyedRateLimiter' % key)
+        if value is None:
+            tmp_kwargs = self.bucket_kwargs.copy()
+            tmp_kwargs.update(kwargs)
+            value = self.bucket_class(self.rate, capacity=self.capacity, **tmp_kwargs)
+        if key in self._buckets:
+            self.remove(key)
+        counter_key = 'bucket_%s' % self._next_id
+        while counter_key in self.counters:
+            self._next_id += 1
+            counter_key = 'bucket_%s' % self._next_id
+        self._next_id += 1
+        counter = super(KeyedRateLimiter, self).new(counter_key, value, name=str(key) if name is None else name,
+                                                    description=description)
+        self._buckets[key] = counter
+        return counter
+
+    def get(self, key):
+        try:
+            return self._buckets[key]
+        except KeyError:
+            return self.new(key)
+
+    def __contains__(self, item):
+        return item in self._buckets
+
+    def remove(self, *keys):
+        """
+        Removes the buckets for the keys (or all buckets if no keys are passed)
+        """
+        if not keys:
+            keys = list(self._buckets)
+        for key in keys:
+            counter = self._buckets.pop(key)
+            super(KeyedRateLimiter, self).remove(counter.key)
+
+    def prune(self):
+        """
+        Removes the buckets that are back in their starting state (see _Bucket.idle)
+
+        :return: the number of buckets removed.
+        """
+        keys = [key for key, bucket in self._buckets.items() if bucket.idle]
+        self.remove(*keys)
+        return len(keys)
+
+    def try_acquire(self, key, tokens=1):
+        """
+        see TokenBucket.try_acquire
+        """
+        return self.get(key).try_acquire(tokens)
+
+    def acquire(self, key, tokens=1, timeout=None):
+        """
+        see TokenBucket.acquire
+        """
+        return self.get(key).acquire(tokens, timeout=timeout)
+
+    async def acquire_async(self, key, tokens=1, timeout=None):
+        """
+        see TokenBucket.acquire_async
+        """
+        return await self.get(key).acquire_async(tokens, timeout=timeout)
+
+    def wait_time(self, key, tokens=1):
+        """
+        see TokenBucket.wait_time
+        """
+        return self.get(key).wait_time(tokens)
+
+    def __repr__(self):
+        return 'KeyedRateLimiter(rate=%s, capacity=%s): %s keys' % (self.rate, self.capacity, len(self._buckets))
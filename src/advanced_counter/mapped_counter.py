@@ -0,0 +1,445 @@
+"""
+A NamedCounter that keeps the counter values in a memory-mapped file, so they persist across restarts and can be read
+by other processes.
+
+"""
+import mmap
+import os
+import threading
+import time
+from struct import Struct
+from .adv_counter import BaseCounter, NamedCounter
+from .helpers import slugify
+from .shared_counter import BufferCounter, _NAMED_COUNTER_ARGS
+
+__all__ = ['MappedNamedCounter']
+
+_MAGIC = b'ACMAP\x00\x00\x00'
+_VERSION = 1
+# magic, version, typecode, capacity (records), used (records, including removed ones), generation
+_HEADER = Struct('<8sIc3xIIQ')
+_HEADER_SIZE = 64
+_CAPACITY_OFFSET = 16
+_USED_OFFSET = 20
+_GENERATION_OFFSET = 24
+_COUNT = Struct('<I')
+_GENERATION = Struct('<Q')
+
+# each record is the value (8 bytes), the call_count (8 bytes), the state, the key length and the key.
+RECORD_SIZE = 64
+MAX_KEY_SIZE = RECORD_SIZE - 18
+_STATE_OFFSET = 16
+_KEY_OFFSET = 18
+_FREE = 0
+_LIVE = 1
+_REMOVED = 2
+# the number of 8 byte items per record (the counter index in the value / call buffers is record * _STRIDE)
+_STRIDE = RECORD_SIZE // 8
+
+SYNC_NONE = None
+SYNC_ALWAYS = 'always'
+
+
+class MappedCounter(BufferCounter):
+    """
+    A BufferCounter in a MappedNamedCounter, this calls the store after each change so it can flush the file (see the
+    sync option of MappedNamedCounter).
+    """
+
+    @property
+    def value(self):
+        return self._store.value_buffer[self._index]
+
+    @value.setter
+    def value(self, value):
+        if self._attached:
+            if value.__class__ is not int and self._store.typecode == 'q':
+                # (checked before anything is changed, the buffer only takes ints)
+                if value != int(value):
+                    raise TypeError('A MappedNamedCounter with typecode \'q\' can only hold whole numbers (not %r), '
+                                    'use typecode=\'d\' for fractions' % value)
+                value = int(value)
+            self._store.value_buffer[self._index] = value
+
+    def _do_math(self, value=None, operation='add', ret='value', force=False):
+        tmp_ret = super(MappedCounter, self)._do_math(value, operation, ret=ret, force=force)
+        if self._store.sync is not None:
+            self._store._written()
+        return tmp_ret
+
+    def clear(self):
+        super(MappedCounter, self).clear()
+        if self._store.sync is not None:
+            self._store._written()
+
+
+class MappedNamedCounter(NamedCounter):
+    """
+    A NamedCounter where the counter values (and call counts) are kept in a memory-mapped file, with a fixed size
+    record per key, so updating a counter is a write into the mapped memory.
+
+    The values are in the file as they change, so they survive the process crashing (the OS writes the pages to the
+    disk, see the sync option for power loss), and opening the file again reattaches the counters with the values
+    they had, without reading or parsing the values::
+
+        >>> counters = MappedNamedCounter('/var/run/myjob/counters.map', 'records', 'errors')
+        >>> counters.add('records')
+
+    Other processes on the same host can open the file with readonly=True to read the live values (directly from
+    the mapped memory) for monitoring::
+
+        >>> live = MappedNamedCounter('/var/run/myjob/counters.map', readonly=True)
+        >>> print(live.report())
+
+    Only one process should write to a file.  The file grows (doubling the records) as counters are added, removed
+    counters leave a gap that is reused when the file is compacted (see compact).  Readers check for new, moved or
+    removed counters when they report, or when refresh() is called.
+
+    The counter settings (min/max counters, increment_by, call_every_func, etc) and names are not kept in the file,
+    so pass the same settings when reopening it.  Keys are limited to 46 bytes (utf-8).
+    """
+
+    def __init__(self,
+                 path,
+                 *args,
+                 readonly=False,
+                 typecode='q',
+                 capacity=64,
+                 sync=SYNC_NONE,
+                 **kwargs):
+        """
+        :param path: the file to use, it is created if it does not exist.
+        :param args: see NamedCounter, counters that are already in the file keep their values.
+        :param readonly: if True, the file is opened to read the values (it must exist, and counters cannot be
+            changed)
+        :param typecode: the type used to store the values for a new file, 'q' (signed 64 bit integers, the default,
+            results that are not whole numbers raise a TypeError) or 'd' (float).  An existing file uses the typecode
+            it was created with.
+        :param capacity: the number of records in a new file (it grows as needed)
+        :param sync: when the file is flushed to the disk (with msync), besides when it is closed:
+
+            * None: (the default) only when it is closed, otherwise the OS writes the changed pages in the
+              background.  The values survive the process crashing, but not the host crashing.
+            * 'always': after each change (this is much slower).
+            * a number: after a change if this many seconds have passed since the last flush.
+
+        :param kwargs: see NamedCounter.
+        """
+        if typecode not in ('q', 'd'):
+            raise AttributeError('typecode must be "q" or "d" (not %r)' % typecode)
+        if sync is not None and sync != SYNC_ALWAYS and not isinstance(sync, (int, float)):
+            raise AttributeError('sync must be None, "always" or a number of seconds (not %r)' % sync)
+        if readonly and (args or kwargs.get('aggregates')):
+            raise AttributeError('counters cannot be added to (and aggregates cannot be used with) a readonly '
+                                 'MappedNamedCounter.')
+        self.path = path
+        self.readonly = readonly
+        self.sync = sync
+        self._last_sync = time.monotonic()
+        self._lock = threading.RLock()
+        self._records = {}
+        self._scanned = 0
+        self._mmap = None
+        self._file = None
+        self._open(typecode, max(int(capacity), 1))
+
+        named_kwargs = {k: v for k, v in kwargs.items() if k in _NAMED_COUNTER_ARGS}
+        counter_kwargs = {k: v for k, v in kwargs.items() if k not in _NAMED_COUNTER_ARGS}
+        locked = named_kwargs.pop('locked', None)
+        super(MappedNamedCounter, self).__init__(locked=False, **named_kwargs)
+        self._attach_records(0)
+        # the counters that are already in the file are replaced to use the settings passed.
+        for arg in args:
+            self.new(arg, overwrite=True)
+        for key, value in counter_kwargs.items():
+            if isinstance(value, dict):
+                self.new(key, overwrite=True, **value)
+            elif isinstance(value, str):
+                self.new(key, name=value, overwrite=True)
+            else:
+                self.new(key, value=value, overwrite=True)
+        if locked is None:
+            locked = readonly or bool(args) or bool(counter_kwargs)
+        self.locked = locked
+
+    # the file
+
+    def _open(self, typecode, capacity):
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if self.readonly:
+            self._file = open(self.path, 'rb')
+        elif exists:
+            self._file = open(self.path, 'r+b')
+        else:
+            self._file = open(self.path, 'w+b')
+            self._file.truncate(_HEADER_SIZE + capacity * RECORD_SIZE)
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION, typecode.encode('ascii'), capacity, 0, 0))
+            self._file.flush()
+        self._map()
+
+    def _map(self):
+        access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=access)
+        magic, version, typecode, capacity, used, generation = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            self._close_file()
+            raise ValueError('%s is not a MappedNamedCounter file.' % self.path)
+        if version != _VERSION:
+            self._close_file()
+            raise ValueError('%s has an unsupported version (%s)' % (self.path, version))
+        self.typecode = typecode.decode('ascii')
+        self.capacity = capacity
+        self.generation = generation
+        records = memoryview(self._mmap)[_HEADER_SIZE:_HEADER_SIZE + capacity * RECORD_SIZE]
+        self.value_buffer = records.cast(self.typecode)
+        self.call_buffer = records[8:].cast('q')
+        records.release()
+
+    def _unmap(self):
+        self.value_buffer.release()
+        self.call_buffer.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def _close_file(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    @property
+    def used(self):
+        """
+        the number of records used in the file (including the records of removed counters, until it is compacted)
+        """
+        return _COUNT.unpack_from(self._mmap, _USED_OFFSET)[0]
+
+    def _set_header(self, used=None, generation=None):
+        if used is not None:
+            _COUNT.pack_into(self._mmap, _USED_OFFSET, used)
+        if generation is not None:
+            self.generation = generation
+            _GENERATION.pack_into(self._mmap, _GENERATION_OFFSET, generation)
+
+    def _record_key(self, record):
+        offset = _HEADER_SIZE + record * RECORD_SIZE
+        state = self._mmap[offset + _STATE_OFFSET]
+        length = self._mmap[offset + _STATE_OFFSET + 1]
+        return state, self._mmap[offset + _KEY_OFFSET:offset + _KEY_OFFSET + length].decode('utf-8')
+
+    def _attach_records(self, start):
+        """
+        adds the counters for the live records from "start" on.
+
+        If compact() was stopped part way through (for example by a crash), a key can have two live records with
+        the same contents, the last one is used (and the other one is marked as removed, unless this is a reader).
+        """
+        kwargs = self.def_counter_kwargs.copy()
+        kwargs.pop('value', None)
+        # a reader can see "used" before a remap for a file that has grown.
+        used = min(self.used, self.capacity)
+        for record in range(start, used):
+            state, key = self._record_key(record)
+            if state != _LIVE:
+                continue
+            duplicate = self._records.get(key)
+            if duplicate is not None:
+                if not self.readonly:
+                    self._mmap[_HEADER_SIZE + duplicate * RECORD_SIZE + _STATE_OFFSET] = _REMOVED
+                self._records[key] = record
+                self.counters[key]._index = record * _STRIDE
+                continue
+            counter = self._attach(record, kwargs)
+            self._records[key] = record
+            super(MappedNamedCounter, self).new(key, value=counter)
+        self._scanned = max(used, start)
+
+    def _attach(self, record, kwargs):
+        return MappedCounter(self, record * _STRIDE, **kwargs)
+
+    def get_lock(self, index):
+        return self._lock
+
+    def _written(self):
+        if self.sync == SYNC_ALWAYS:
+            self._mmap.flush()
+            return
+        now = time.monotonic()
+        if now - self._last_sync >= self.sync:
+            self._last_sync = now
+            self._mmap.flush()
+
+    def flush(self):
+        """
+        Writes the changes to the disk (msync).
+        """
+        if self._mmap is not None and not self.readonly:
+            self._mmap.flush()
+            self._last_sync = time.monotonic()
+
+    def _grow(self, capacity):
+        """
+        makes the file larger, the counters use the new mapping since they read the buffers from the store.
+        """
+        self._mmap.flush()
+        self._unmap()
+        self._file.truncate(_HEADER_SIZE + capacity * RECORD_SIZE)
+        os.pwrite(self._file.fileno(), _COUNT.pack(capacity), _CAPACITY_OFFSET)
+        self._map()
+        self._set_header(generation=self.generation + 1)
+
+    # counters
+
+    def new(self, key, value=None, name=None, overwrite=False, description='', **kwargs):
+        """
+        Adds a counter, see NamedCounter.new.  If the key is already in the file, the counter is attached to it and
+        keeps the value from the file (the value passed is only used for new keys).  If an existing counter object
+        is passed as the value, its settings (and value, for new keys) are used.
+        """
+        if self.readonly:
+            raise AttributeError('Counters cannot be added to a readonly MappedNamedCounter.')
+        slug = slugify(key)
+        encoded = slug.encode('utf-8')
+        if len(encoded) > MAX_KEY_SIZE:
+            raise AttributeError('Key %r is too long for a MappedNamedCounter (%s bytes max)' % (key, MAX_KEY_SIZE))
+        if slug in self.counters and not overwrite:
+            raise AttributeError('Key %r already exists in NamedCounter' % slug)
+
+        if issubclass(value.__class__, BaseCounter):
+            tmp_kwargs = dict(
+                min_counter=value.min_counter,
+                max_counter=value.max_counter,
+                rollover=value.rollover,
+                increment_by=value.increment_by,
+                call_every=value.call_every,
+                call_every_func=value.call_every_func,
+                perc_decimal=value.perc_decimal,
+                call_every_seconds=value.call_every_seconds,
+            )
+            value = value.value
+        else:
+            tmp_kwargs = self.def_counter_kwargs.copy()
+            tmp_kwargs.pop('value', None)
+        tmp_kwargs.update(kwargs)
+
+        with self._lock:
+            record = self._records.get(slug)
+            if record is None:
+                record = self._new_record(encoded)
+                self._records[slug] = record
+                if value is None:
+                    value = tmp_kwargs.get('min_counter') or 0
+                counter = self._attach(record, tmp_kwargs)
+                counter._set(value, skip_count=True)
+            else:
+                counter = self._attach(record, tmp_kwargs)
+        return super(MappedNamedCounter, self).new(key, value=counter, name=name, overwrite=True,
+                                                   description=description)
+
+    def _new_record(self, encoded):
+        used = self.used
+        if used >= self.capacity:
+            if used - len(self._records) > self.capacity // 4:
+                self.compact()
+                used = self.used
+            if used >= self.capacity:
+                self._grow(self.capacity * 2)
+        offset = _HEADER_SIZE + used * RECORD_SIZE
+        mapped = self._mmap
+        mapped[offset:offset + RECORD_SIZE] = bytes(RECORD_SIZE)
+        mapped[offset + _STATE_OFFSET + 1] = len(encoded)
+        mapped[offset + _KEY_OFFSET:offset + _KEY_OFFSET + len(encoded)] = encoded
+        mapped[offset + _STATE_OFFSET] = _LIVE
+        # the record is written before "used" includes it, so readers do not see a partial record.
+        self._set_header(used=used + 1)
+        return used
+
+    def remove(self, *keys):
+        """
+        Removes counters (see NamedCounter.remove), their records are reused when the file is compacted.
+        """
+        if self.readonly:
+            raise AttributeError('Counters cannot be removed from a readonly MappedNamedCounter.')
+        if not keys:
+            keys = list(self.counters.keys())
+        with self._lock:
+            for key in keys:
+                counter = self.counters[key] if key in self.counters else self.get(key)
+                record = self._records.pop(counter.key)
+                self._mmap[_HEADER_SIZE + record * RECORD_SIZE + _STATE_OFFSET] = _REMOVED
+                super(MappedNamedCounter, self).remove(counter.key)
+            # readers reattach their counters when the generation changes.
+            self._set_header(generation=self.generation + 1)
+
+    def compact(self):
+        """
+        Moves the records of the live counters together, so the space from removed counters can be reused.  The file
+        is not made smaller, so readers that have it mapped are not affected (they reattach the counters on their
+        next refresh).
+        """
+        if self.readonly:
+            raise AttributeError('A readonly MappedNamedCounter cannot be compacted.')
+        with self._lock:
+            mapped = self._mmap
+            new_record = 0
+            for key, record in sorted(self._records.items(), key=lambda item: item[1]):
+                if record != new_record:
+                    old = _HEADER_SIZE + record * RECORD_SIZE
+                    new = _HEADER_SIZE + new_record * RECORD_SIZE
+                    mapped[new:new + RECORD_SIZE] = mapped[old:old + RECORD_SIZE]
+                    # the old record is removed as soon as it is copied, so there is only one live record for the
+                    # key if this stops part way through (except between these two lines, see _attach_records).
+                    mapped[old + _STATE_OFFSET] = _REMOVED
+                    self._records[key] = new_record
+                    self.counters[key]._index = new_record * _STRIDE
+                new_record += 1
+            used = self.used
+            start = _HEADER_SIZE + new_record * RECORD_SIZE
+            mapped[start:_HEADER_SIZE + used * RECORD_SIZE] = bytes((used - new_record) * RECORD_SIZE)
+            self._set_header(used=new_record, generation=self.generation + 1)
+
+    def refresh(self):
+        """
+        For readers, attaches the counters that have been added to the file, and reattaches all of them if the file
+        has grown or been compacted.
+
+        :return: True if the counters changed.
+        """
+        generation = _GENERATION.unpack_from(self._mmap, _GENERATION_OFFSET)[0]
+        if generation != self.generation:
+            self._unmap()
+            self._map()
+            for key in list(self.counters.keys()):
+                NamedCounter.remove(self, key)
+            self._records.clear()
+            self._attach_records(0)
+            return True
+        if min(self.used, self.capacity) > self._scanned:
+            self._attach_records(self._scanned)
+            return True
+        return False
+
+    def report(self, *args, **kwargs):
+        if self.readonly:
+            self.refresh()
+        return super(MappedNamedCounter, self).report(*args, **kwargs)
+
+    def close(self):
+        """
+        Flushes the changes to the disk and closes the file, the counters cannot be used after this.
+        """
+        if self._mmap is None:
+            return
+        self.flush()
+        self._unmap()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        return 'MappedNamedCounter(%r): %s objects' % (self.path, len(self.counters))
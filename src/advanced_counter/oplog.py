@@ -0,0 +1,380 @@
+"""
+A write-ahead log of the operations on the counters in a NamedCounter, which can be replayed to rebuild the counter
+state (see NamedCounter.oplog).
+
+"""
+import os
+import time
+import zlib
+from struct import Struct, error as struct_error
+from .checkpoint import (_check_counter, _pack_value, _unpack_value, _TEXT, pack_checkpoint, unpack_checkpoint,
+                         new_stream, FULL, DELTA)
+
+__all__ = ['OperationLog', 'OPLOG_VERSION']
+
+OPLOG_VERSION = 1
+
+_MAGIC = b'ACOL'
+# magic, version
+_HEADER = Struct('<4sB3x')
+# payload length, crc32 of the payload (each write to the file is one frame)
+_FRAME = Struct('<II')
+# code (the operation or record type, and the flags), key id (or the length for snapshots)
+_RECORD = Struct('<BI')
+# the common case, an operation with an int value
+_INT_RECORD = Struct('<BIq')
+_LENGTH = Struct('<H')
+_LONG_LENGTH = Struct('<I')
+
+_OPERATIONS = ('add', 'sub', 'mult', 'div', 'set', 'clear')
+_OPERATION_CODES = {operation: code for code, operation in enumerate(_OPERATIONS)}
+_CLEAR = 5
+_KEY = 6
+_STATE = 7
+_REMOVE = 8
+_SNAPSHOT = 9
+_CODE_MASK = 15
+
+_NO_VALUE = 16
+_FORCE = 32
+_INT_VALUE = 64
+
+_STR_TYPE = b's'
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+_fsync = getattr(os, 'fdatasync', os.fsync)
+
+
+def _pack_operation_value(value):
+    if isinstance(value, str):
+        text = value.encode('utf-8')
+        return _TEXT.pack(_STR_TYPE, len(text)) + text
+    return _pack_value(value)
+
+
+def _unpack_operation_value(data, offset):
+    if data[offset:offset + 1] == _STR_TYPE:
+        length = _TEXT.unpack_from(data, offset)[1]
+        start = offset + _TEXT.size
+        return data[start:start + length].decode('utf-8'), start + length
+    return _unpack_value(data, offset)
+
+
+def _pack_key(key_id, key):
+    key = key.encode('utf-8')
+    return _RECORD.pack(_KEY, key_id) + _LENGTH.pack(len(key)) + key
+
+
+def _read_frames(data):
+    """
+    yields (start, end) for each complete frame, stopping at the first frame that is truncated or does not match
+    its checksum (the end of the log, for example if the process stopped while it was being written)
+    """
+    offset = _HEADER.size
+    size = len(data)
+    while offset + _FRAME.size <= size:
+        length, crc = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        end = start + length
+        if end > size or zlib.crc32(data[start:end]) != crc:
+            return
+        yield start, end
+        offset = end
+
+
+def _replay_frame(named_counter, data, offset, end, keys, counters):
+    """
+    applies the records in a frame to the named_counter.
+
+    :return: the number of operations applied
+    """
+    tmp_ret = 0
+    record_unpack = _RECORD.unpack_from
+    record_size = _RECORD.size
+    int_unpack = _INT_RECORD.unpack_from
+    int_size = _INT_RECORD.size
+    while offset < end:
+        code = data[offset]
+        if code & _INT_VALUE:
+            code, key_id, value = int_unpack(data, offset)
+            offset += int_size
+        else:
+            code, key_id = record_unpack(data, offset)
+            offset += record_size
+            record_type = code & _CODE_MASK
+            if record_type > _CLEAR:
+                if record_type == _KEY:
+                    length = _LENGTH.unpack_from(data, offset)[0]
+                    offset += _LENGTH.size
+                    keys[key_id] = data[offset:offset + length].decode('utf-8')
+                    counters.pop(key_id, None)
+                    offset += length
+                elif record_type == _STATE:
+                    length = _LONG_LENGTH.unpack_from(data, offset)[0]
+                    offset += _LONG_LENGTH.size
+                    for record in unpack_checkpoint(data[offset:offset + length])[3]:
+                        named_counter._restore_counter(record)
+                    counters.pop(key_id, None)
+                    offset += length
+                elif record_type == _REMOVE:
+                    key = keys[key_id]
+                    if key in named_counter.counters:
+                        named_counter.remove(key)
+                    counters.pop(key_id, None)
+                elif record_type == _SNAPSHOT:
+                    snapshot = data[offset:offset + key_id]
+                    # the snapshot is the full state, so counters that are not in it were removed before it.
+                    present = set(record.key for record in unpack_checkpoint(snapshot)[3])
+                    removed = [key for key in named_counter.counters if key not in present]
+                    if removed:
+                        named_counter.remove(*removed)
+                    named_counter.restore(snapshot)
+                    keys.clear()
+                    counters.clear()
+                    offset += key_id
+                else:
+                    raise ValueError('Invalid record type %s in operation log.' % record_type)
+                continue
+            if code & _NO_VALUE:
+                value = None
+            else:
+                value, offset = _unpack_operation_value(data, offset)
+
+        counter = counters.get(key_id)
+        if counter is None:
+            counter = counters[key_id] = named_counter.counters[keys[key_id]]
+        operation = code & _CODE_MASK
+        if operation == 0:
+            counter.add(value)
+        elif operation == _CLEAR:
+            counter.clear()
+        elif code & _FORCE:
+            counter.set(value, force=True)
+        else:
+            counter._do_math(value, _OPERATIONS[operation], ret='value')
+        tmp_ret += 1
+    return tmp_ret
+
+
+def replay_log(named_counter, path):
+    """
+    Replays an operation log into a NamedCounter (see NamedCounter.replay).
+
+    :return: the number of operations replayed
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size or data[:4] != _MAGIC:
+        raise ValueError('%s is not an operation log.' % path)
+    version = _HEADER.unpack_from(data, 0)[1]
+    if version != OPLOG_VERSION:
+        raise ValueError('Unsupported operation log version %s (expected %s)' % (version, OPLOG_VERSION))
+    operations = 0
+    keys = {}
+    counters = {}
+    try:
+        for start, end in _read_frames(data):
+            operations += _replay_frame(named_counter, data, start, end, keys, counters)
+    except (struct_error, IndexError, KeyError, UnicodeDecodeError) as err:
+        raise ValueError('Invalid operation log %s: %r' % (path, err))
+    return operations
+
+
+class OperationLog(object):
+    """
+    Logs each operation on the counters of a NamedCounter (the operation, the counter key, and the value passed)
+    to a binary write-ahead log, so the counters can be rebuilt by replaying it (see NamedCounter.oplog).
+
+    The records are buffered in memory and written to the file when the buffer is full, and the file is synced to
+    the disk (fsync) every commit_interval seconds (or when commit() is called), so each sync covers all of the
+    operations since the last one (a group commit).  Each write is a frame with a checksum, so replaying a log
+    that was being written when the process stopped ignores the partial frame at the end.
+
+    New counters are logged with their state, and the log starts with a snapshot (a full checkpoint, see
+    NamedCounter.checkpoint) of the counters.  When the file grows past compact_size, it is replaced by a new
+    snapshot (compacted), this can also be done by calling compact().
+
+    .. note::
+        like the checkpoints, changes made by setting counter.value directly (or restoring a checkpoint) are not
+        logged.  The values passed must be numbers, strings or None.
+    """
+
+    def __init__(self,
+                 named_counter,
+                 path,
+                 buffer_size=64 * 1024,
+                 commit_interval=1.0,
+                 compact_size=64 * 1024 * 1024):
+        """
+        :param named_counter: the NamedCounter to log.
+        :param path: the log file, if it exists it is replayed into the named_counter first.
+        :param buffer_size: the number of bytes buffered before they are written to the file.
+        :param commit_interval: the number of seconds between syncs of the file to the disk, checked as operations
+            are logged (None to only sync when commit(), compact() or close() are called)
+        :param compact_size: the size (in bytes) of the file that triggers a compaction (None to only compact
+            when compact() is called)
+        """
+        if buffer_size < 1:
+            raise AttributeError('buffer_size must be at least 1 (not %r)' % buffer_size)
+        for counter in named_counter.counters.values():
+            _check_counter(counter)
+            if counter._oplog is not None:
+                raise AttributeError('Counter %r already has an operation log.' % counter.key)
+        self.named_counter = named_counter
+        self.path = path
+        self.buffer_size = buffer_size
+        self.commit_interval = commit_interval
+        self.compact_size = compact_size
+        self.operations = 0
+        self.replayed = 0
+        self.size = 0
+        self._buffer = bytearray()
+        self._ids = {}
+        self._next_id = 0
+        self._commit_at = None
+        self._fd = None
+
+        if os.path.exists(path) and os.path.getsize(path):
+            self.replayed = replay_log(named_counter, path)
+        self.compact()
+        for counter in named_counter.counters.values():
+            counter._oplog = self._append
+            counter._pick_fast_path()
+        named_counter._add_tracker(self)
+
+    def _append(self, counter, operation, value, force):
+        key_id = self._ids[counter.key]
+        code = _OPERATION_CODES[operation]
+        if force:
+            code |= _FORCE
+        if value.__class__ is int and _INT_MIN <= value <= _INT_MAX:
+            self._buffer += _INT_RECORD.pack(code | _INT_VALUE, key_id, value)
+        elif value is None:
+            self._buffer += _RECORD.pack(code | _NO_VALUE, key_id)
+        else:
+            self._buffer += _RECORD.pack(code, key_id) + _pack_operation_value(value)
+        self.operations += 1
+        if len(self._buffer) >= self.buffer_size:
+            self._write()
+        elif self._commit_at is not None and time.monotonic() >= self._commit_at:
+            self._write()
+
+    def _write(self, sync=False):
+        """
+        writes the buffer to the file as a frame, and syncs the file if sync is True or the commit interval has
+        passed.
+        """
+        if self._buffer:
+            payload = bytes(self._buffer)
+            self._buffer.clear()
+            frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+            os.write(self._fd, frame)
+            self.size += len(frame)
+        if self.commit_interval is not None:
+            now = time.monotonic()
+            if sync or now >= self._commit_at:
+                _fsync(self._fd)
+                self._commit_at = now + self.commit_interval
+        elif sync:
+            _fsync(self._fd)
+        if self.compact_size is not None and self.size >= self.compact_size:
+            self.compact()
+
+    @property
+    def pending(self):
+        """
+        the number of bytes of records that have not been written to the file.
+        """
+        return len(self._buffer)
+
+    def commit(self):
+        """
+        Writes the buffered records to the file and syncs it to the disk.
+        """
+        self._write(sync=True)
+
+    def compact(self):
+        """
+        Replaces the log with a snapshot of the current state of the counters.  The new log is written to a
+        temporary file and then renamed, so the log is complete at any point.
+        """
+        counters = list(self.named_counter.counters.values())
+        self._ids = {}
+        parts = []
+        for key_id, counter in enumerate(counters):
+            self._ids[counter.key] = key_id
+            parts.append(_pack_key(key_id, counter.key))
+        self._next_id = len(counters)
+        snapshot = pack_checkpoint(FULL, new_stream(), 0, counters)
+        payload = _RECORD.pack(_SNAPSHOT, len(snapshot)) + snapshot + b''.join(parts)
+
+        tmp_path = self.path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            data = _HEADER.pack(_MAGIC, OPLOG_VERSION) + _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+            os.write(fd, data)
+            os.fsync(fd)
+        except Exception:
+            os.close(fd)
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, self.path)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = fd
+        self._buffer.clear()
+        self.size = len(data)
+        if self.commit_interval is not None:
+            self._commit_at = time.monotonic() + self.commit_interval
+
+    def _added(self, counter, old_counter):
+        _check_counter(counter)
+        if old_counter is not None and old_counter is not counter:
+            old_counter._oplog = None
+            old_counter._pick_fast_path()
+        key_id = self._ids.get(counter.key)
+        if key_id is None:
+            key_id = self._ids[counter.key] = self._next_id
+            self._next_id += 1
+            self._buffer += _pack_key(key_id, counter.key)
+        state = pack_checkpoint(DELTA, 0, 0, [counter])
+        self._buffer += _RECORD.pack(_STATE, key_id) + _LONG_LENGTH.pack(len(state)) + state
+        if counter._oplog is None:
+            counter._oplog = self._append
+            counter._pick_fast_path()
+        elif counter._oplog != self._append:
+            raise AttributeError('Counter %r already has an operation log.' % counter.key)
+        if len(self._buffer) >= self.buffer_size:
+            self._write()
+
+    def _removed_counter(self, counter):
+        counter._oplog = None
+        counter._pick_fast_path()
+        self._buffer += _RECORD.pack(_REMOVE, self._ids.pop(counter.key))
+        if len(self._buffer) >= self.buffer_size:
+            self._write()
+
+    def close(self):
+        """
+        Commits the log and stops logging the operations.
+        """
+        if self._fd is None:
+            return
+        self.commit()
+        os.close(self._fd)
+        self._fd = None
+        self.named_counter._remove_tracker(self)
+        for counter in self.named_counter.counters.values():
+            counter._oplog = None
+            counter._pick_fast_path()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        return 'OperationLog(%r): %s operations, %s bytes' % (self.path, self.operations, self.size)
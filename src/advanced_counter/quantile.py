@@ -0,0 +1,378 @@
+"""
+Streaming quantile estimates with a t-digest.
+
+"""
+from itertools import islice
+import math
+from .adv_counter import AdvCounter
+
+__all__ = ['QuantileCounter']
+
+_FAST_TYPES = frozenset((int, float))
+
+
+class QuantileCounter(AdvCounter):
+    """
+    A counter that estimates the quantiles (median, p99, etc) of the values added, using a t-digest, for values
+    where the bucket boundaries for a Histogram are not known ahead of time.
+
+    Instead of keeping every value, the digest keeps a sorted list of centroids (a mean and the number of values
+    merged into it), with small centroids near the ends of the distribution and large ones in the middle, so the
+    tails are kept more accurately.  The memory used is bounded by the compression (about compression centroids, and
+    a buffer of compression * 5 values that are merged in as it fills), no matter how many values are added.
+
+        >>> durations = QuantileCounter()
+        >>> durations.add_many(job_durations)
+        >>> durations.quantile(0.99)
+
+    The value of the counter is the number of values added, so it can be used in a NamedCounter (including as the
+    counter_class, or with NamedCounter.new(key, value=QuantileCounter())) and in reports like an AdvCounter.  The
+    count, total, mean, min_value, max_value and percentiles (p50, p90, p95, p99 and p999) can be used as report
+    fields.  sub, mult, div and set are not supported.
+
+    QuantileCounters can be merged (see merge and combine), for example to combine the digests from several shards.
+    """
+
+    def __init__(self, compression=100, **kwargs):
+        """
+        :param compression: the size of the digest, higher values are more accurate and use more memory (the
+            error is usually below 1 / compression near the median, and much lower at the tails)
+        :param kwargs: see AdvCounter (value is ignored)
+        """
+        if compression < 10:
+            raise AttributeError('compression must be at least 10 (not %r)' % compression)
+        self.compression = compression
+        self._buffer_size = int(compression * 5)
+        self._clear_digest()
+        kwargs.pop('value', None)
+        super(QuantileCounter, self).__init__(**kwargs)
+
+    def _clear_digest(self):
+        self.means = []
+        self.weights = []
+        self._buffer = []
+        self.count = 0
+        self.total = 0
+        self.min_value = None
+        self.max_value = None
+
+    @property
+    def value(self):
+        """
+        the number of values added.
+        """
+        return self.count
+
+    @value.setter
+    def value(self, value):
+        # the value is always the count.
+        pass
+
+    def _k(self, q):
+        """
+        the scale function (k1 in the t-digest paper), each centroid covers at most 1 unit of k.
+        """
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q(self, k):
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self, means=(), weights=()):
+        """
+        merges the buffer (and any other centroids passed) into the digest.
+        """
+        buffer = self._buffer
+        if not buffer and not means:
+            return
+        all_means = self.means + buffer
+        all_means.extend(means)
+        all_weights = self.weights + [1] * len(buffer)
+        all_weights.extend(weights)
+        total = float(sum(all_weights))
+        order = sorted(range(len(all_means)), key=all_means.__getitem__)
+
+        new_means = []
+        new_weights = []
+        first = order[0]
+        mean = all_means[first]
+        weight = all_weights[first]
+        seen = 0
+        # (k is at most compression / 4, past that sin() wraps around and the limit would drop again near q = 1)
+        k_max = self.compression / 4.0
+        q_limit = self._q(self._k(0) + 1) * total
+        for i in order[1:]:
+            item_weight = all_weights[i]
+            if seen + weight + item_weight <= q_limit:
+                weight += item_weight
+                mean += item_weight * (all_means[i] - mean) / weight
+            else:
+                new_means.append(mean)
+                new_weights.append(weight)
+                seen += weight
+                q_limit = self._q(min(self._k(seen / total) + 1, k_max)) * total
+                mean = all_means[i]
+                weight = item_weight
+        new_means.append(mean)
+        new_weights.append(weight)
+        self.means = new_means
+        self.weights = new_weights
+        del buffer[:]
+
+    def _insert(self, value):
+        self._buffer.append(value)
+        self.count += 1
+        self.total += value
+        if self.min_value is None:
+            self.min_value = self.max_value = value
+        elif value < self.min_value:
+            self.min_value = value
+        elif value > self.max_value:
+            self.max_value = value
+        if len(self._buffer) >= self._buffer_size:
+            self._compress()
+
+    def _do_math(self, value=None, operation='add', ret='value', force=False):
+        if operation != 'add':
+            raise AttributeError('QuantileCounter only supports add (not %s)' % operation)
+        if value is None:
+            raise AttributeError('A value must be passed to QuantileCounter.add()')
+        if ret == 'copy':
+            return self.copy()._do_math(value, operation, ret='self', force=force)
+        self._insert(value)
+        # the value is the count, this only updates the call count (and calls the observers and call_every_func)
+        self._set(0)
+        if ret == 'value':
+            return self.count
+        return self
+
+    def _pick_fast_path(self):
+        """
+        uses _fast_insert for add() when there are no observers or call_every_seconds timer, and adds the values
+        passed to add_many in blocks (see _add_block).
+        """
+        self._fast_add = None
+        self._fast_batch = False
+        if not self.fast_path or self.math_return != 'value' or self.call_timer is not None:
+            return
+        self._fast_batch = True
+        if self._observer is None:
+            self._fast_add = _fast_insert
+
+    def _add_block(self, numbers):
+        buffer = self._buffer
+        size = self._buffer_size
+        start = 0
+        while start < len(numbers):
+            end = start + size - len(buffer)
+            buffer.extend(numbers[start:end])
+            start = end
+            if len(buffer) >= size:
+                self._compress()
+        self.count += len(numbers)
+        self.total += sum(numbers)
+        low = min(numbers)
+        high = max(numbers)
+        if self.min_value is None or low < self.min_value:
+            self.min_value = low
+        if self.max_value is None or high > self.max_value:
+            self.max_value = high
+        if self._observer is not None:
+            self._observer(self)
+
+    def add_many(self, values):
+        """
+        Adds each of the values (see AdvCounter.add_many).
+
+        :param values: an iterable of values, an array.array or a numpy array.
+        :return: the number of values added.
+        """
+        if hasattr(values, 'tolist'):
+            values = values.tolist()
+        values = iter(values)
+        # iterators are read a block at a time, so a long stream is not copied into memory.
+        while True:
+            block = list(islice(values, self._buffer_size))
+            if not block:
+                return self.count
+            if None in block:
+                raise AttributeError('None cannot be added to a QuantileCounter.')
+            super(QuantileCounter, self).add_many(block)
+
+    @property
+    def mean(self):
+        """
+        the average of the values added (None if no values are added)
+        """
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def _estimate(self, index):
+        """
+        estimates the value with "index" values below it, interpolating between the centroids (treating the centroids
+        with one value as exact), and between the lowest / highest values and the first / last centroids.
+        """
+        means = self.means
+        weights = self.weights
+        count = self.count
+        last = len(means) - 1
+        if not last:
+            return means[0]
+        if index < 1:
+            return self.min_value
+        if weights[0] > 1 and index < weights[0] / 2.0:
+            return self.min_value + (index - 1) / (weights[0] / 2.0 - 1) * (means[0] - self.min_value)
+        if index > count - 1:
+            return self.max_value
+        if weights[last] > 1 and count - index <= weights[last] / 2.0:
+            return self.max_value - (count - index - 1) / (weights[last] / 2.0 - 1) * (self.max_value - means[last])
+
+        seen = weights[0] / 2.0
+        for i in range(last):
+            gap = (weights[i] + weights[i + 1]) / 2.0
+            if seen + gap > index:
+                left = index - seen - (0.5 if weights[i] == 1 else 0)
+                if left < 0:
+                    return means[i]
+                right = seen + gap - index - (0.5 if weights[i + 1] == 1 else 0)
+                if right <= 0:
+                    return means[i + 1]
+                return (means[i] * right + means[i + 1] * left) / (left + right)
+            seen += gap
+        return means[last]
+
+    def quantiles(self, *qs):
+        """
+        :param qs: the quantiles to estimate (0 - 1)
+        :return: a list of the estimated values (None if no values are added)
+        """
+        for q in qs:
+            if not 0 <= q <= 1:
+                raise AttributeError('quantiles must be between 0 and 1 (not %r)' % q)
+        if not self.count:
+            return [None] * len(qs)
+        self._compress()
+        return [self._estimate(q * self.count) for q in qs]
+
+    def quantile(self, q):
+        """
+        :param q: the quantile to estimate (0 - 1, 0.5 is the median)
+        :return: the estimated value (None if no values are added)
+        """
+        return self.quantiles(q)[0]
+
+    @property
+    def p50(self):
+        return self.quantile(0.5)
+
+    @property
+    def p90(self):
+        return self.quantile(0.9)
+
+    @property
+    def p95(self):
+        return self.quantile(0.95)
+
+    @property
+    def p99(self):
+        return self.quantile(0.99)
+
+    @property
+    def p999(self):
+        return self.quantile(0.999)
+
+    @property
+    def centroids(self):
+        """
+        the number of centroids in the digest.
+        """
+        self._compress()
+        return len(self.means)
+
+    def clear(self):
+        """
+        Removes all of the values.
+        """
+        self._clear_digest()
+        super(QuantileCounter, self).clear()
+
+    def merge(self, *others):
+        """
+        Adds the values from other QuantileCounters to this one (the compression of this counter is used).
+        """
+        means = []
+        weights = []
+        for other in others:
+            if not other.count:
+                continue
+            other._compress()
+            means.extend(other.means)
+            weights.extend(other.weights)
+            self.count += other.count
+            self.total += other.total
+            if self.min_value is None or other.min_value < self.min_value:
+                self.min_value = other.min_value
+            if self.max_value is None or other.max_value > self.max_value:
+                self.max_value = other.max_value
+            self.call_count += other.call_count
+        self._compress(means, weights)
+        if self._observer is not None:
+            self._observer(self)
+        return self
+
+    @classmethod
+    def combine(cls, *counters, **kwargs):
+        """
+        Returns a new QuantileCounter with the values from all of the counters (see AdvCounter.combine, the bounds
+        and on_conflict options are ignored).  The other settings are taken from the first counter.
+        """
+        if len(counters) == 1 and not isinstance(counters[0], QuantileCounter):
+            counters = tuple(counters[0])
+        if not counters:
+            raise AttributeError('At least one counter must be passed to combine.')
+        tmp_ret = counters[0].copy()
+        tmp_ret.merge(*counters[1:])
+        return tmp_ret
+
+    def __copy__(self):
+        tmp_ret = self.__class__(
+            compression=self.compression,
+            min_counter=self.min_counter,
+            max_counter=self.max_counter,
+            call_every=self.call_every,
+            call_every_func=self.call_every_func,
+            perc_decimal=self.perc_decimal,
+            call_every_seconds=self.call_every_seconds,
+        )
+        tmp_ret.means = list(self.means)
+        tmp_ret.weights = list(self.weights)
+        tmp_ret._buffer = list(self._buffer)
+        tmp_ret.count = self.count
+        tmp_ret.total = self.total
+        tmp_ret.min_value = self.min_value
+        tmp_ret.max_value = self.max_value
+        tmp_ret.call_countdown = self.call_countdown
+        tmp_ret.call_count = self.call_count
+        return tmp_ret
+
+    copy = __copy__
+
+    def __repr__(self):
+        return 'QuantileCounter(compression=%s): %s values' % (self.compression, self.count)
+
+
+def _fast_insert(counter, value):
+    """
+    the add routine for QuantileCounters without observers or a call_every_seconds timer (see _pick_fast_path), this
+    is the same as _do_math for int and float values, and passes anything else to it.
+    """
+    if value.__class__ not in _FAST_TYPES:
+        return counter._do_math(value, 'add', ret='value')
+    counter._insert(value)
+    counter.call_count += 1
+    counter.call_countdown -= 1
+    if counter.call_countdown <= 0:
+        counter.call_countdown = counter._call_every
+        if counter.call_every_func is not None:
+            counter._fire_call_every()
+    return counter.count
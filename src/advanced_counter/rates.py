@@ -0,0 +1,232 @@
+"""
+Rate (throughput) tracking and progress estimates for counters.
+
+"""
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime, timedelta
+from itertools import repeat
+import math
+import time
+
+__all__ = ['RateTracker', 'Progress', 'format_duration']
+
+DEFAULT_RATE_WINDOWS = (1, 5, 15, 60)
+
+
+def _window_label(seconds):
+    if seconds >= 60 and not seconds % 60:
+        return '%sm' % (seconds // 60)
+    return '%ss' % seconds
+
+
+def format_duration(seconds):
+    """
+    formats a number of seconds as "h:mm:ss" (or "--:--:--" if seconds is None)
+    """
+    if seconds is None:
+        return '--:--:--'
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '%d:%02d:%02d' % (hours, minutes, seconds)
+
+
+class Progress(namedtuple('Progress', ('value', 'perc', 'rate', 'elapsed', 'remaining'))):
+    """
+    A progress estimate for a counter (see RateTracker.progress)
+
+        * value: the counter value.
+        * perc: the percent complete (see AdvCounter.perc)
+        * rate: the smoothed rate (per second).
+        * elapsed: the number of seconds since the rate tracking started.
+        * remaining: the estimated number of seconds until the counter reaches the max_counter (None if the
+          counter is not moving towards it)
+    """
+    __slots__ = ()
+
+    @property
+    def eta(self):
+        """
+        the estimated completion time as a datetime (or None)
+        """
+        if self.remaining is None:
+            return None
+        return datetime.now() + timedelta(seconds=self.remaining)
+
+    @property
+    def elapsed_str(self):
+        return format_duration(self.elapsed)
+
+    @property
+    def remaining_str(self):
+        return format_duration(self.remaining)
+
+    def __str__(self):
+        return '{:.0%} ({:.1f}/s, elapsed {}, remaining {})'.format(
+            self.perc, self.rate, self.elapsed_str, self.remaining_str)
+
+
+class RateTracker(object):
+    """
+    Tracks the rate (per second) that a counter is changing.
+
+    This keeps exponentially weighted moving average (EWMA) rates for each of the windows (by default 1, 5, 15 and
+    60 seconds), the mean rate since tracking started, and a ring buffer of the per second rates for the last
+    "history" seconds.
+
+    Nothing is done when the counter changes, the tracker is updated when it is read (from the change in the counter
+    since the last read).  If more than one second has passed since the last read, the change is spread evenly
+    over the time since then, so the per second buckets (and the short windows) are only exact if the tracker is
+    read at least once per second, the longer windows and the mean rate are not affected by how often it is read.
+    """
+
+    def __init__(self, counter, windows=DEFAULT_RATE_WINDOWS, history=60, source='value', rate_window=None,
+                 clock=time.monotonic):
+        """
+        :param counter: the counter to track.
+        :param windows: the EWMA windows, in seconds.
+        :param history: the number of per second buckets kept.
+        :param source: the counter attribute that is tracked, 'value' (the default) or 'call_count'.
+        :param rate_window: the window used for the "rate" property (defaults to the longest window)
+        :param clock: the function used to read the clock.
+        """
+        if not windows:
+            raise AttributeError('At least one window must be set.')
+        if rate_window is None:
+            rate_window = max(windows)
+        if rate_window not in windows:
+            raise AttributeError('rate_window (%r) must be one of the windows.' % rate_window)
+        self.counter = counter
+        self.source = source
+        self.windows = tuple(windows)
+        self.labels = [_window_label(w) for w in self.windows]
+        self.rate_window = rate_window
+        self.clock = clock
+        self._alphas = [1 - math.exp(-1.0 / w) for w in self.windows]
+        self._buckets = deque(maxlen=history)
+        self.start()
+
+    def start(self):
+        """
+        (re)starts tracking from the current value.
+        """
+        now = self.clock()
+        self.start_time = now
+        self._last_read = now
+        self._last_tick = now
+        self._start_count = self._last_count = self._read()
+        self._pending = 0.0
+        self._ewma = [None] * len(self.windows)
+        self._buckets.clear()
+
+    def _read(self):
+        return getattr(self.counter, self.source)
+
+    def update(self):
+        """
+        brings the rates up to date with the counter, this is called by the other methods.
+
+        :return: the current time (from the tracker clock)
+        """
+        now = self.clock()
+        current = self._read()
+        delta = float(current - self._last_count)
+        self._last_count = current
+        ticks = int(now - self._last_tick)
+        if ticks <= 0:
+            self._pending += delta
+        else:
+            boundary = self._last_tick + ticks
+            elapsed = now - self._last_read
+            if elapsed > 0:
+                completed = delta * (boundary - self._last_read) / elapsed
+            else:
+                completed = delta
+            per_second = (self._pending + completed) / ticks
+            self._pending = delta - completed
+            for i, alpha in enumerate(self._alphas):
+                if self._ewma[i] is None:
+                    self._ewma[i] = per_second
+                else:
+                    self._ewma[i] = per_second + (self._ewma[i] - per_second) * (1 - alpha) ** ticks
+            self._buckets.extend(repeat(per_second, min(ticks, self._buckets.maxlen)))
+            self._last_tick = boundary
+        self._last_read = now
+        return now
+
+    @property
+    def elapsed(self):
+        """
+        the number of seconds since tracking started.
+        """
+        return self.clock() - self.start_time
+
+    def progress(self):
+        """
+        Estimates the time remaining until the counter reaches its max_counter, using the smoothed rate (the
+        rate_window EWMA).
+
+        :return: a Progress namedtuple.
+        :raises AttributeError: if the min/max counters are not both set, or the tracker is not tracking the value.
+        """
+        counter = self.counter
+        if counter.max_counter is None or counter.min_counter is None:
+            raise AttributeError('progress is only valid for counters with min and max_counter set.')
+        if self.source != 'value':
+            raise AttributeError('progress is only valid when tracking the counter value.')
+        rate = self.rate
+        value = self._last_count
+        left = counter.max_counter - value
+        if left <= 0:
+            remaining = 0.0
+        elif rate > 0:
+            remaining = float(left) / rate
+        else:
+            remaining = None
+        return Progress(value, counter.perc, rate, self._last_read - self.start_time, remaining)
+
+    def _mean(self, now):
+        elapsed = now - self.start_time
+        if elapsed <= 0:
+            return 0.0
+        return float(self._last_count - self._start_count) / elapsed
+
+    @property
+    def mean_rate(self):
+        """
+        the average rate since tracking started.
+        """
+        return self._mean(self.update())
+
+    @property
+    def rate(self):
+        """
+        the EWMA rate for the rate_window (or the mean rate until the first second has passed).
+        """
+        now = self.update()
+        tmp_ret = self._ewma[self.windows.index(self.rate_window)]
+        if tmp_ret is None:
+            return self._mean(now)
+        return tmp_ret
+
+    def rates(self):
+        """
+        :return: an OrderedDict of the EWMA rates keyed by the window label ('1s', '5s', '15s', '1m'), and the mean
+            rate (keyed by 'mean')
+        """
+        now = self.update()
+        mean = self._mean(now)
+        tmp_ret = OrderedDict()
+        for label, ewma in zip(self.labels, self._ewma):
+            tmp_ret[label] = mean if ewma is None else ewma
+        tmp_ret['mean'] = mean
+        return tmp_ret
+
+    def per_second(self):
+        """
+        :return: a list of the rates for each of the last "history" seconds (oldest first)
+        """
+        self.update()
+        return list(self._buckets)
+
+    def __repr__(self):
+        return 'RateTracker: %s/s' % self.rate
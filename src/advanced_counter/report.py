@@ -0,0 +1,378 @@
+"""
+Pre-compiled reports for NamedCounter.
+
+"""
+from string import Formatter
+from .helpers import make_list
+from .rates import format_duration
+
+__all__ = ['CompiledReport']
+
+_FORMATTER = Formatter()
+
+DEFAULT_LINE_FORMAT = '{indent}{name} : {value}'
+DEFAULT_PERC_LINE_FORMAT = '{indent}{name} : {value} ({perc_complete})'
+
+_LINE_FIELDS = ('indent', 'description', 'name', 'key', 'value', 'min_counter', 'max_counter', 'perc_complete')
+_HEADER_FIELDS = ('num_counters', 'name', 'sum', 'min', 'max', 'indent')
+_PROGRESS_FIELDS = ('elapsed', 'eta', 'eta_time')
+
+
+def _root_field(field_name):
+    for i, char in enumerate(field_name):
+        if char in '.[':
+            return field_name[:i]
+    return field_name
+
+
+def _template_fields(template):
+    """
+    returns the set of (root) field names used in a format string.
+    """
+    tmp_ret = set()
+    for literal, field_name, format_spec, conversion in _FORMATTER.parse(template):
+        if field_name is None:
+            continue
+        tmp_ret.add(_root_field(field_name))
+        if format_spec and '{' in format_spec:
+            tmp_ret.update(_template_fields(format_spec))
+    return tmp_ret
+
+
+class _Template(object):
+    """
+    a format string, and the fields that it uses.
+    """
+    __slots__ = ('text', 'fields', 'formatted')
+
+    def __init__(self, text):
+        self.text = text
+        # the same rule as report(), strings without a "{" are used as is.
+        self.formatted = '{' in text
+        if self.formatted:
+            self.fields = _template_fields(text)
+        else:
+            self.fields = set()
+
+
+def _get_description(report, counter):
+    return counter.description
+
+
+def _get_name(report, counter):
+    return counter.name
+
+
+def _get_ljust_name(report, counter):
+    return counter.name.ljust(report._pad_size)
+
+
+def _get_rjust_name(report, counter):
+    return counter.name.rjust(report._pad_size)
+
+
+def _get_key(report, counter):
+    return counter.key
+
+
+def _get_value(report, counter):
+    return counter.value
+
+
+def _get_min_counter(report, counter):
+    return counter.min_counter
+
+
+def _get_max_counter(report, counter):
+    return counter.max_counter
+
+
+def _get_perc_complete(report, counter):
+    if counter._has_min_max:
+        return counter.perc_str
+    return ''
+
+
+def _get_indent(report, counter):
+    return report._indent
+
+
+_LINE_GETTERS = {
+    'indent': _get_indent,
+    'description': _get_description,
+    'name': _get_name,
+    'key': _get_key,
+    'value': _get_value,
+    'min_counter': _get_min_counter,
+    'max_counter': _get_max_counter,
+    'perc_complete': _get_perc_complete,
+}
+
+
+def _attr_getter(field):
+    def _get_attr(report, counter):
+        try:
+            return getattr(counter, field)
+        except AttributeError:
+            raise KeyError(field)
+    return _get_attr
+
+
+def _rate_fields(counter):
+    tmp_ret = {}
+    for label, rate in counter.rates().items():
+        tmp_ret['rate_' + label] = rate
+    tmp_ret['rate'] = counter.rate
+    return tmp_ret
+
+
+def _progress_fields(counter):
+    if counter._has_min_max:
+        progress = counter.progress()
+        eta = progress.eta
+        return dict(
+            elapsed=progress.elapsed_str,
+            eta=progress.remaining_str,
+            eta_time='' if eta is None else eta.strftime('%H:%M:%S'),
+        )
+    return dict(elapsed=format_duration(counter.rate_tracker.elapsed), eta='', eta_time='')
+
+
+class _LineBuilder(object):
+    """
+    builds the formatting dict for a line (and description line) template, with only the fields that are used.
+    """
+    __slots__ = ('line', 'desc', 'constants', 'getters', 'rates', 'progress')
+
+    def __init__(self, line, desc, justify_name, kwargs):
+        self.line = line
+        self.desc = desc
+        fields = set(line.fields)
+        if desc is not None:
+            fields.update(desc.fields)
+        self.constants = {}
+        self.getters = []
+        self.rates = False
+        self.progress = False
+        for field in fields:
+            if field == 'name' and '{name}' in line.text:
+                if justify_name == '<':
+                    self.getters.append((field, _get_ljust_name))
+                    continue
+                if justify_name == '>':
+                    self.getters.append((field, _get_rjust_name))
+                    continue
+            if field in _LINE_GETTERS:
+                self.getters.append((field, _LINE_GETTERS[field]))
+            elif field in kwargs:
+                # passed kwargs take precedence over the rate and progress fields.
+                self.constants[field] = kwargs[field]
+            elif field == 'rate' or field.startswith('rate_'):
+                self.rates = True
+            elif field in _PROGRESS_FIELDS:
+                self.progress = True
+            else:
+                self.getters.append((field, _attr_getter(field)))
+
+    @property
+    def justified(self):
+        return '{name}' in self.line.text
+
+    def build(self, report, counter):
+        tmp_ret = self.constants.copy()
+        for field, getter in self.getters:
+            tmp_ret[field] = getter(report, counter)
+        if self.rates:
+            for field, value in _rate_fields(counter).items():
+                tmp_ret.setdefault(field, value)
+        if self.progress:
+            for field, value in _progress_fields(counter).items():
+                tmp_ret.setdefault(field, value)
+        return tmp_ret
+
+
+class CompiledReport(object):
+    """
+    A NamedCounter report with the templates parsed ahead of time (see NamedCounter.compile_report).  Calling
+    render() (or the object itself) returns the same output as NamedCounter.report() with the same arguments,
+    but only the fields that the templates use are looked up, and the name padding and sum/min/max values are
+    only computed if they are used (and are read from the NamedCounter if it was created with aggregates=True).
+
+    The counters are read each time it is rendered, so changes to the counter values (and new counters if no
+    counter list was passed) are included.
+    """
+
+    def __init__(self,
+                 named_counter,
+                 header='',
+                 footer='',
+                 justify_name='>',
+                 line_indent=None,
+                 counters=None,
+                 line_format=None,
+                 desc_line_format='    {indent}{description}',
+                 sep='\n',
+                 **kwargs):
+        """
+        See NamedCounter.report for the parameters.
+        """
+        for field in kwargs:
+            if field in _LINE_FIELDS or field in _HEADER_FIELDS:
+                raise TypeError('report() got multiple values for keyword argument %r' % field)
+        self.named_counter = named_counter
+        if counters is not None:
+            counters = make_list(counters)
+        self.counters = counters
+        self.justify_name = justify_name
+        self.line_indent = line_indent
+        self.sep = sep
+        self.kwargs = kwargs
+
+        self.header = _Template(header) if header else None
+        self.footer = _Template(footer) if footer else None
+        self._name_header = _Template('{name}')
+
+        desc = _Template(desc_line_format) if desc_line_format else None
+        if line_format is None:
+            self._line = _LineBuilder(_Template(DEFAULT_LINE_FORMAT), desc, justify_name, kwargs)
+            self._perc_line = _LineBuilder(_Template(DEFAULT_PERC_LINE_FORMAT), desc, justify_name, kwargs)
+        else:
+            self._line = self._perc_line = _LineBuilder(_Template(line_format), desc, justify_name, kwargs)
+        self._needs_pad = justify_name in ('<', '>') and (self._line.justified or self._perc_line.justified)
+
+        self._pad_size = 0
+        self._indent = ''
+
+    def _header_dict(self, template, counters, aggregates):
+        named_counter = self.named_counter
+        tmp_ret = {}
+        for field in template.fields:
+            if field in named_counter.counters:
+                tmp_ret[field] = named_counter.counters[field]
+            elif field == 'num_counters':
+                tmp_ret[field] = len(counters)
+            elif field == 'name':
+                tmp_ret[field] = named_counter.name
+            elif field == 'indent':
+                tmp_ret[field] = self._indent
+            elif field in ('sum', 'min', 'max'):
+                tmp_ret[field] = aggregates[field]
+            elif field in self.kwargs:
+                tmp_ret[field] = self.kwargs[field]
+        return tmp_ret
+
+    def _format_hf(self, template, counters, aggregates):
+        if not template.formatted:
+            return template.text
+        return template.text.format_map(self._header_dict(template, counters, aggregates))
+
+    def _aggregates(self, recs):
+        """
+        computes the name padding and the sum/min/max values (only the parts that are used)
+        """
+        all_value_min = 0
+        all_value_max = 0
+        all_value_sum = 0
+        pad_size = 0
+        for c_rec in recs:
+            val = c_rec.value
+            pad_size = max(pad_size, len(c_rec.name))
+            all_value_max = max(val, all_value_max)
+            all_value_min = min(val, all_value_min)
+            all_value_sum += val
+        return pad_size, dict(sum=all_value_sum, min=all_value_min, max=all_value_max)
+
+    @staticmethod
+    def _tracked_aggregates(tracked):
+        """
+        the same as _aggregates, using the values kept by the NamedCounter (the min and max include 0, as they do
+        when they are computed)
+        """
+        value_min = tracked.min_value
+        value_max = tracked.max_value
+        return tracked.name_width, dict(
+            sum=tracked.total,
+            min=0 if value_min is None else min(value_min, 0),
+            max=0 if value_max is None else max(value_max, 0),
+        )
+
+    def _pad(self, recs):
+        pad_size = 0
+        for c_rec in recs:
+            pad_size = max(pad_size, len(c_rec.name))
+        return pad_size
+
+    def render(self):
+        """
+        :return: the report as a string (or a list of lines if sep is None)
+        """
+        named_counter = self.named_counter
+        all_counters = named_counter.counters
+        if self.counters is None:
+            counters = list(all_counters.keys())
+        else:
+            counters = self.counters
+        recs = [all_counters[c] for c in counters]
+
+        header = self.header
+        if header is None and named_counter.name:
+            header = self._name_header
+        footer = self.footer
+
+        aggregates = None
+        hf_fields = set()
+        if header is not None:
+            hf_fields.update(header.fields)
+        if footer is not None:
+            hf_fields.update(footer.fields)
+        tracked = named_counter._aggregates
+        if tracked is not None and (self.counters is not None or not tracked.int_only):
+            # the tracked values are only used for reports on all of the counters, and only when all of the values
+            # are ints (so the output is exactly the same as adding them up here).
+            tracked = None
+        if 'sum' in hf_fields or 'min' in hf_fields or 'max' in hf_fields:
+            if tracked is None:
+                self._pad_size, aggregates = self._aggregates(recs)
+            else:
+                self._pad_size, aggregates = self._tracked_aggregates(tracked)
+        elif self._needs_pad:
+            if tracked is None:
+                self._pad_size = self._pad(recs)
+            else:
+                self._pad_size = tracked.name_width
+
+        line_indent = self.line_indent
+        if line_indent is None:
+            if header is not None or footer is not None:
+                line_indent = 4
+            else:
+                line_indent = 0
+        self._indent = ' ' * line_indent if line_indent else ''
+
+        tmp_ret = []
+        if header is not None:
+            tmp_ret.append(self._format_hf(header, counters, aggregates))
+
+        line = self._line
+        perc_line = self._perc_line
+        for c_rec in recs:
+            builder = perc_line if c_rec._has_min_max else line
+            line_dict = builder.build(self, c_rec)
+            tmp_ret.append(builder.line.text.format_map(line_dict))
+            if builder.desc is not None and c_rec.description:
+                tmp_ret.append(builder.desc.text.format_map(line_dict))
+
+        if footer is not None:
+            tmp_ret.append(self._format_hf(footer, counters, aggregates))
+
+        if self.sep is not None:
+            return self.sep.join(tmp_ret)
+        return tmp_ret
+
+    __call__ = render
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return 'CompiledReport: %r' % self.named_counter
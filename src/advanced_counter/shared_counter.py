@@ -0,0 +1,252 @@
+"""
+Counters that keep their values in a shared buffer (such as a multiprocessing.shared_memory block) so that the
+values can be updated from more than one process.
+
+"""
+from collections import OrderedDict
+import multiprocessing
+from .adv_counter import AdvCounter, BaseCounter, NamedCounter
+from .helpers import slugify
+
+__all__ = ['BufferCounter', 'SharedNamedCounter']
+
+_NAMED_COUNTER_ARGS = ('min_counter', 'max_counter', 'rollover', 'increment_by', 'locked', 'name', 'counter_class',
+                       'aggregates')
+
+
+class BufferCounter(AdvCounter):
+    """
+    An AdvCounter that keeps its value and call_count in a shared buffer instead of on the instance.
+
+    The store passed must have "value_buffer" and "call_buffer" attributes (sequences such as arrays or memoryviews that can be
+    indexed by the counter index), and a "get_lock(index)" method returning the lock used for that index.
+
+    The other settings (min/max counters, increment_by, call_every, etc) are kept on the instance, so each process
+    should create its counters with the same settings.  The call_countdown (and so the call_every_func) is also
+    local to each instance.
+
+    Creating the counter does not change the value in the buffer.
+    """
+    fast_path = False
+
+    def __init__(self, store, index, **kwargs):
+        self._store = store
+        self._index = index
+        self._attached = False
+        super(BufferCounter, self).__init__(**kwargs)
+        self._attached = True
+
+    @property
+    def value(self):
+        return self._store.value_buffer[self._index]
+
+    @value.setter
+    def value(self, value):
+        if self._attached:
+            self._store.value_buffer[self._index] = value
+
+    @property
+    def call_count(self):
+        return self._store.call_buffer[self._index]
+
+    @call_count.setter
+    def call_count(self, value):
+        if self._attached:
+            self._store.call_buffer[self._index] = value
+
+    def _do_math(self, value=None, operation='add', ret='value', force=False):
+        with self._store.get_lock(self._index):
+            return super(BufferCounter, self)._do_math(value, operation, ret=ret, force=force)
+
+    def clear(self):
+        with self._store.get_lock(self._index):
+            super(BufferCounter, self).clear()
+
+    def __copy__(self):
+        """
+        returns a normal (unshared) AdvCounter with the same settings and value.
+        """
+        tmp_ret = AdvCounter(
+            value=self.value,
+            min_counter=self.min_counter,
+            max_counter=self.max_counter,
+            rollover=self.rollover,
+            increment_by=self.increment_by,
+            call_every=self.call_every,
+            call_every_func=self.call_every_func,
+            perc_decimal=self.perc_decimal,
+            no_scan=True,
+            call_every_seconds=self.call_every_seconds,
+        )
+        tmp_ret.call_countdown = self.call_countdown
+        tmp_ret.call_count = self.call_count
+        return tmp_ret
+
+    copy = __copy__
+
+    @classmethod
+    def combine(cls, *counters, **kwargs):
+        """
+        returns a normal (unshared) AdvCounter, see AdvCounter.combine.
+        """
+        return AdvCounter.combine(*counters, **kwargs)
+
+
+class SharedNamedCounter(NamedCounter):
+    """
+    A NamedCounter where the counter values (and call counts) are kept in a multiprocessing.shared_memory block, so
+    that worker processes can update the same counters, and the parent can report on the live totals.
+
+    The set of counters is fixed when the SharedNamedCounter is created.  Updates are protected by multiprocessing
+    locks (striped across the counters), so there is no message passing between the processes for each update.
+
+    The instance is passed to the workers when they are started (for example using the initializer / initargs of a
+    ProcessPoolExecutor or multiprocessing.Pool, or as an argument to a Process), which attaches the worker to the
+    same shared memory block.
+
+    >>> def init_worker(counters):
+    ...     global COUNTERS
+    ...     COUNTERS = counters
+    >>> def work(rec):
+    ...     COUNTERS.add('records')
+    >>> with SharedNamedCounter('records', 'errors') as counters:
+    ...     with ProcessPoolExecutor(initializer=init_worker, initargs=(counters,)) as pool:
+    ...         list(pool.map(work, range(1000)))
+    ...     print(counters.report())
+    records : 1000
+     errors : 0
+
+    SharedNamedCounter needs Python 3.8 or later (for multiprocessing.shared_memory).
+
+    .. note::
+        the lock objects can only be passed to other processes as the processes are started, they cannot be sent
+        through a queue or as the arguments to pool.map / submit.
+    """
+
+    def __init__(self,
+                 *args,
+                 typecode='q',
+                 lock_count=16,
+                 mp_context=None,
+                 **kwargs):
+        """
+        :param args: see NamedCounter, all counters must be created here.
+        :param typecode: the type used to store the values, 'q' (signed 64 bit integers, the default) or 'd' (float).
+        :param lock_count: the number of locks used, counters share locks based on their position.
+        :param mp_context: the multiprocessing context used to create the locks (defaults to the default context)
+        :param kwargs: see NamedCounter (aggregates is not supported)
+        """
+        if kwargs.get('aggregates'):
+            raise AttributeError('aggregates cannot be used with a SharedNamedCounter, the values are changed by '
+                                 'other processes.')
+        # (imported here, multiprocessing.shared_memory is new in Python 3.8 and the rest of the package is not)
+        from multiprocessing import shared_memory
+        if mp_context is None:
+            mp_context = multiprocessing.get_context()
+        kwargs['locked'] = True
+        capacity = max(len(args) + len([k for k in kwargs if k not in _NAMED_COUNTER_ARGS]), 1)
+        self.typecode = typecode
+        self._owner = True
+        self._slots = {}
+        self._shm = shared_memory.SharedMemory(create=True, size=capacity * 16)
+        self._locks = [mp_context.Lock() for i in range(max(min(lock_count, capacity), 1))]
+        self._map_buffer(capacity)
+        super(SharedNamedCounter, self).__init__(*args, **kwargs)
+
+    def _map_buffer(self, capacity):
+        self.capacity = capacity
+        self.value_buffer = self._shm.buf[:capacity * 8].cast(self.typecode)
+        self.call_buffer = self._shm.buf[capacity * 8:capacity * 16].cast('q')
+
+    def get_lock(self, index):
+        return self._locks[index % len(self._locks)]
+
+    def new(self, key, value=None, name=None, overwrite=False, description='', **kwargs):
+        """
+        Adds a new counter, see NamedCounter.new.  this can only be called while the SharedNamedCounter is being
+        created.
+
+        If an existing counter object is passed as the value, its settings and value are copied.
+        """
+        index = len(self._slots)
+        if slugify(key) in self._slots:
+            raise AttributeError('Key %r already exists in NamedCounter' % key)
+        if index >= self.capacity:
+            raise AttributeError('SharedNamedCounter has a fixed set of counters, %r cannot be added' % key)
+
+        if issubclass(value.__class__, BaseCounter):
+            tmp_kwargs = dict(
+                min_counter=value.min_counter,
+                max_counter=value.max_counter,
+                rollover=value.rollover,
+                increment_by=value.increment_by,
+                call_every=value.call_every,
+                call_every_func=value.call_every_func,
+                perc_decimal=value.perc_decimal,
+                call_every_seconds=value.call_every_seconds,
+            )
+            value = value.value
+        else:
+            tmp_kwargs = self.def_counter_kwargs.copy()
+            tmp_kwargs.pop('value', None)
+        tmp_kwargs.update(kwargs)
+        if value is None:
+            value = tmp_kwargs.get('min_counter') or 0
+
+        counter = self._attach(index, tmp_kwargs)
+        counter._set(value, skip_count=True)
+        counter = super(SharedNamedCounter, self).new(key, value=counter, name=name, description=description)
+        self._slots[counter.key] = (index, name, description, tmp_kwargs)
+        return counter
+
+    def _attach(self, index, kwargs):
+        return BufferCounter(self, index, **kwargs)
+
+    def __getstate__(self):
+        return dict(
+            shm_name=self._shm.name,
+            capacity=self.capacity,
+            typecode=self.typecode,
+            locks=self._locks,
+            slots=self._slots,
+            name=self.name,
+        )
+
+    def __setstate__(self, state):
+        self.typecode = state['typecode']
+        self.name = state['name']
+        self._owner = False
+        self._locks = state['locks']
+        self._slots = {}
+        from multiprocessing import shared_memory
+        self._shm = shared_memory.SharedMemory(name=state['shm_name'])
+        self._map_buffer(state['capacity'])
+        self.def_counter_kwargs = {}
+        self.counters = OrderedDict()
+        self.counter_lookup = {}
+        self.counter_count = 0
+        self.locked = True
+        for key, (index, name, description, kwargs) in state['slots'].items():
+            counter = self._attach(index, kwargs)
+            super(SharedNamedCounter, self).new(key, value=counter, name=name, description=description)
+            self._slots[key] = (index, name, description, kwargs)
+
+    def close(self):
+        """
+        Detaches this process from the shared memory block.  the counters cannot be used after this.
+        """
+        if self._shm is None:
+            return
+        self.value_buffer.release()
+        self.call_buffer.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
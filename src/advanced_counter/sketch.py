@@ -0,0 +1,340 @@
+"""
+Approximate counting for large (or unbounded) sets of keys, using a Count-Min Sketch.
+
+"""
+from array import array
+from collections.abc import Iterator
+from hashlib import blake2b
+import math
+from .adv_counter import NamedCounter, SlottedCounter
+
+__all__ = ['CountMinSketch', 'ApproxNamedCounter']
+
+_MASK_64 = (1 << 64) - 1
+
+# the types that are treated as more than one key, anything else (str, bytes, tuples, ints, etc) is a single key.
+_KEY_LISTS = (list, set, frozenset, Iterator)
+
+
+def _key_hash(key):
+    """
+    returns two 64 bit hashes for a key, these are the same in every process (unlike hash()), so sketches from
+    different processes can be merged.
+    """
+    if not isinstance(key, bytes):
+        key = str(key).encode('utf-8')
+    tmp_hash = int.from_bytes(blake2b(key, digest_size=16).digest(), 'little')
+    return tmp_hash & _MASK_64, (tmp_hash >> 64) | 1
+
+
+class CountMinSketch(object):
+    """
+    A Count-Min Sketch, a fixed size table of counts that gives an estimate of the count for any key.
+
+    The estimates are never lower than the real counts (as long as only positive values are added), and are higher
+    by at most epsilon * total with a probability of 1 - delta, where total is the sum of all of the values added.
+    The table has "depth" rows of "width" cells, width = ceil(e / epsilon) and depth = ceil(ln(1 / delta)).
+
+    With conservative=True, each add only raises the cells that are needed to raise the estimate for the key (the
+    "conservative update"), which gives noticeably lower errors for skewed data, but only positive values can be
+    added.
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01, width=None, depth=None, conservative=False, typecode='q'):
+        """
+        :param epsilon: the error bound, as a fraction of the total count.
+        :param delta: the probability that an estimate is outside of the error bound.
+        :param width: the number of cells per row (overrides epsilon)
+        :param depth: the number of rows (overrides delta)
+        :param conservative: if True, use the conservative update.
+        :param typecode: the array type used for the cells, 'q' (64 bit integers, the default) or 'd' (float).
+        """
+        if width is None:
+            if not 0 < epsilon < 1:
+                raise AttributeError('epsilon must be between 0 and 1 (not %r)' % epsilon)
+            width = int(math.ceil(math.e / epsilon))
+        if depth is None:
+            if not 0 < delta < 1:
+                raise AttributeError('delta must be between 0 and 1 (not %r)' % delta)
+            depth = int(math.ceil(math.log(1.0 / delta)))
+        if width < 1 or depth < 1:
+            raise AttributeError('width and depth must be at least 1.')
+        self.width = width
+        self.depth = depth
+        self.conservative = conservative
+        self.typecode = typecode
+        self.table = array(typecode, bytes(width * depth * array(typecode).itemsize))
+        self._rows = [(row, row * width) for row in range(depth)]
+        self.total = 0
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    @property
+    def error_bound(self):
+        """
+        the most that an estimate should be over the real count (with a probability of 1 - delta)
+        """
+        return self.epsilon * self.total
+
+    def _cells(self, key):
+        """
+        returns the index of the cell for the key in each row (using double hashing, row i uses h1 + i * h2)
+        """
+        h1, h2 = _key_hash(key)
+        width = self.width
+        h1 %= width
+        h2 %= width
+        return [offset + (h1 + row * h2) % width for row, offset in self._rows]
+
+    def add(self, key, value=1):
+        """
+        adds a value to the count for a key.
+
+        :return: the new estimate for the key.
+        """
+        if self.conservative and value < 0:
+            raise ValueError('only positive values can be added to a conservative update sketch.')
+        table = self.table
+        cells = self._cells(key)
+        self.total += value
+        if self.conservative:
+            estimate = min(table[cell] for cell in cells) + value
+            for cell in cells:
+                if table[cell] < estimate:
+                    table[cell] = estimate
+            return estimate
+        for cell in cells:
+            table[cell] += value
+        return min(table[cell] for cell in cells)
+
+    def estimate(self, key):
+        """
+        :return: the estimated count for a key (0 if it has not been added)
+        """
+        table = self.table
+        return min(table[cell] for cell in self._cells(key))
+
+    __getitem__ = estimate
+
+    def merge(self, other):
+        """
+        adds the counts from another sketch (with the same width and depth) to this one.
+        """
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise AttributeError('Only sketches with the same width and depth can be merged.')
+        table = self.table
+        for i, count in enumerate(other.table):
+            if count:
+                table[i] += count
+        self.total += other.total
+
+    def clear(self):
+        for i in range(len(self.table)):
+            self.table[i] = 0
+        self.total = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def __repr__(self):
+        return 'CountMinSketch(width=%s, depth=%s): total=%s' % (self.width, self.depth, self.total)
+
+
+class ApproxNamedCounter(object):
+    """
+    A NamedCounter-like counter for large (or unbounded) sets of keys, such as counts per IP address or per url,
+    that uses a fixed amount of memory.
+
+    The counts for all keys are kept in a CountMinSketch, and exact counters (in a NamedCounter, which is used for
+    the reports) are kept for the keys with the highest counts (the heavy hitters).  When a key that is not tracked
+    has an estimate higher than the lowest tracked counter, it replaces that counter, starting from its estimate.
+    This means that the tracked values are the estimate at the time the key started being tracked, plus the exact
+    counts since then.
+
+    Looking up a key (get, [key], or the return from add/sub) returns the tracked value if the key is tracked,
+    otherwise the estimate from the sketch.
+    """
+
+    def __init__(self,
+                 epsilon=0.001,
+                 delta=0.01,
+                 width=None,
+                 depth=None,
+                 conservative=False,
+                 track=100,
+                 increment_by=1,
+                 name=None,
+                 typecode='q'):
+        """
+        :param epsilon: see CountMinSketch.
+        :param delta: see CountMinSketch.
+        :param width: see CountMinSketch.
+        :param depth: see CountMinSketch.
+        :param conservative: see CountMinSketch.
+        :param track: the number of keys that are tracked exactly.
+        :param increment_by: the default value to add.
+        :param name: the name used for the report header.
+        :param typecode: see CountMinSketch.
+        """
+        if track < 1:
+            raise AttributeError('track must be at least 1.')
+        self.sketch = CountMinSketch(epsilon=epsilon, delta=delta, width=width, depth=depth,
+                                     conservative=conservative, typecode=typecode)
+        self.track = track
+        self.increment_by = increment_by
+        self.name = name
+        self.tracked = NamedCounter(name=name, counter_class=SlottedCounter, aggregates=True)
+        self._tracked_keys = {}
+        self._keys = {}
+        self._next_id = 0
+
+    def _add(self, key, value):
+        estimate = self.sketch.add(key, value)
+        counter = self._tracked_keys.get(key)
+        if counter is not None:
+            return counter.add(value)
+        tracked = self.tracked
+        if len(self._tracked_keys) >= self.track:
+            if not estimate > tracked.min_value:
+                return estimate
+            self._untrack(tracked.bottom(1)[0])
+        tracked_key = 'k%s' % self._next_id
+        while tracked_key in tracked:
+            self._next_id += 1
+            tracked_key = 'k%s' % self._next_id
+        self._next_id += 1
+        counter = tracked.new(tracked_key, value=estimate, name=str(key))
+        self._tracked_keys[key] = counter
+        self._keys[counter.key] = key
+        return estimate
+
+    def _untrack(self, tracked_key):
+        key = self._keys.pop(tracked_key)
+        del self._tracked_keys[key]
+        self.tracked.remove(tracked_key)
+
+    def _apply(self, keys, value, force_dict):
+        if not isinstance(keys, _KEY_LISTS):
+            if not force_dict:
+                return self._add(keys, value)
+            keys = (keys,)
+        tmp_ret = {}
+        for key in keys:
+            tmp_ret[key] = self._add(key, value)
+        if not force_dict and len(tmp_ret) == 1:
+            return tmp_ret.popitem()[1]
+        return tmp_ret
+
+    def add(self, keys, value=None, force_dict=False):
+        """
+        adds a value (or the increment_by value) to one or more keys.  keys can be a single key (a str, bytes,
+        tuple, int, etc) or a list, set or iterator of keys.
+
+        :return: the new value for the key (or a dict of key/values if more than one key is passed)
+        """
+        if value is None:
+            value = self.increment_by
+        return self._apply(keys, value, force_dict)
+
+    def sub(self, keys, value=None, force_dict=False):
+        """
+        subtracts a value (or the increment_by value) from one or more keys, this cannot be used with a
+        conservative update sketch.
+        """
+        if value is None:
+            value = self.increment_by
+        return self._apply(keys, -value, force_dict)
+
+    __call__ = add
+
+    def get(self, key):
+        """
+        :return: the tracked value for a key if it is tracked, otherwise the estimate.
+        """
+        counter = self._tracked_keys.get(key)
+        if counter is not None:
+            return counter.value
+        return self.sketch.estimate(key)
+
+    __getitem__ = get
+
+    def __contains__(self, key):
+        """
+        True if the key is tracked exactly.
+        """
+        return key in self._tracked_keys
+
+    def keys(self):
+        """
+        the tracked keys.
+        """
+        return list(self._tracked_keys)
+
+    def values(self):
+        for counter in self._tracked_keys.values():
+            yield counter.value
+    __iter__ = values
+
+    def items(self):
+        for key, counter in self._tracked_keys.items():
+            yield key, counter.value
+
+    def top(self, k=10):
+        """
+        :return: the keys of the k tracked counters with the highest values (highest first)
+        """
+        return [self._keys[tracked_key] for tracked_key in self.tracked.top(k)]
+
+    def bottom(self, k=10):
+        """
+        :return: the keys of the k tracked counters with the lowest values (lowest first)
+        """
+        return [self._keys[tracked_key] for tracked_key in self.tracked.bottom(k)]
+
+    @property
+    def total(self):
+        """
+        the sum of all of the values added (this is exact)
+        """
+        return self.sketch.total
+
+    @property
+    def error_bound(self):
+        """
+        see CountMinSketch.error_bound
+        """
+        return self.sketch.error_bound
+
+    def report(self, counters=None, **kwargs):
+        """
+        returns a report on the tracked counters, see NamedCounter.report for the parameters.  counters can be a
+        list of tracked keys (for example from top())
+        """
+        if counters is not None:
+            if not isinstance(counters, _KEY_LISTS):
+                counters = (counters,)
+            counters = [self._tracked_keys[key].key for key in counters if key in self._tracked_keys]
+        return self.tracked.report(counters=counters, **kwargs)
+
+    def clear(self):
+        """
+        clears the sketch and the tracked counters.
+        """
+        self.sketch.clear()
+        for tracked_key in list(self._keys):
+            self._untrack(tracked_key)
+
+    def __len__(self):
+        return len(self._tracked_keys)
+
+    def __repr__(self):
+        return 'ApproxNamedCounter(%s tracked, total=%s)' % (len(self), self.total)
+
+    def __str__(self):
+        return self.report()
@@ -0,0 +1,187 @@
+"""
+Sliding window counters (the total over the last x seconds or the last x calls).
+
+"""
+import math
+import time
+from .adv_counter import AdvCounter
+from .helpers import minmax
+
+__all__ = ['WindowCounter']
+
+
+class WindowCounter(AdvCounter):
+    """
+    A counter whose value is the total of the adds (and subs) over a sliding window, either the last window_seconds
+    seconds or the last window_calls calls, instead of the total since it was created.
+
+    The window is kept as a ring of buckets, each holding the total for a slice of the window (window_seconds /
+    buckets seconds, or window_calls / buckets calls), with a running total of the buckets.  As the window moves,
+    the oldest buckets are cleared and subtracted from the running total, so adding and reading are both O(1)
+    (amortized, float totals are re-summed from the buckets when buckets are cleared).  The window moves a bucket at
+    a time, so for time windows the value covers between window_seconds - window_seconds / buckets and
+    window_seconds seconds.  For call windows the buckets default to one per call, which makes the value exact.
+
+    The increment_by helpers, percentages and min/max counters work as they do for AdvCounter, with the min/max
+    counters applied to the window total when it is read.  Rollover is not supported, and only add and sub can be
+    used.
+
+    .. note::
+        the call_every_func and observers are called as the counter is added to, not as values leave a time window.
+    """
+    fast_path = False
+
+    def __init__(self, window_seconds=None, window_calls=None, buckets=None, clock=time.monotonic, **kwargs):
+        """
+        :param window_seconds: the length of the window in seconds.
+        :param window_calls: the length of the window in calls (only one of window_seconds or window_calls can be
+            set)
+        :param buckets: the number of buckets the window is split into (defaults to 60 for time windows and
+            window_calls for call windows, window_calls must be a multiple of this)
+        :param clock: the function used to read the time.
+        :param kwargs: see AdvCounter (value and rollover are not supported)
+        """
+        if (window_seconds is None) == (window_calls is None):
+            raise AttributeError('Either window_seconds or window_calls must be set.')
+        if kwargs.pop('rollover', False):
+            raise AttributeError('WindowCounters cannot rollover.')
+        kwargs.pop('value', None)
+        if window_seconds is not None:
+            if buckets is None:
+                buckets = 60
+            if window_seconds <= 0 or buckets < 1:
+                raise AttributeError('window_seconds and buckets must be greater than 0.')
+            self._bucket_size = float(window_seconds) / buckets
+        else:
+            if buckets is None:
+                buckets = window_calls
+            if window_calls < 1 or buckets < 1 or window_calls % buckets:
+                raise AttributeError('window_calls must be a multiple of buckets.')
+            self._bucket_size = window_calls // buckets
+        self.window_seconds = window_seconds
+        self.window_calls = window_calls
+        self.buckets = buckets
+        self.clock = clock
+        self._clear_window()
+        super(WindowCounter, self).__init__(**kwargs)
+
+    def _clear_window(self):
+        self._ring = [0] * self.buckets
+        self._total = 0
+        self._tick = 0
+        self._calls = 0
+        self._start = self.clock()
+
+    def _time_tick(self):
+        return int((self.clock() - self._start) / self._bucket_size)
+
+    def _advance(self, tick):
+        """
+        moves the window forward to "tick", clearing the buckets that have left it.
+        """
+        steps = tick - self._tick
+        if steps <= 0:
+            return
+        ring = self._ring
+        buckets = self.buckets
+        if steps >= buckets:
+            self._ring = [0] * buckets
+            self._total = 0
+        else:
+            total = self._total
+            for t in range(self._tick + 1, tick + 1):
+                index = t % buckets
+                total -= ring[index]
+                ring[index] = 0
+            if total.__class__ is float:
+                # re-sum float windows, so the rounding errors from the running total do not build up.
+                total = math.fsum(ring)
+            self._total = total
+        self._tick = tick
+
+    @property
+    def value(self):
+        """
+        the total over the window.
+        """
+        if self.window_calls is None:
+            self._advance(self._time_tick())
+        return minmax(self._total, self.min_counter, self.max_counter)
+
+    @value.setter
+    def value(self, value):
+        # the value is always computed from the window.
+        pass
+
+    def _do_math(self, value=None, operation='add', ret='value', force=False):
+        if operation not in ('add', 'sub'):
+            raise AttributeError('WindowCounter only supports add and sub (not %s)' % operation)
+        if ret == 'copy':
+            return self.copy()._do_math(value, operation, ret='self', force=force)
+        value = self._get_increment(self._get_other(value), force, operation=operation)
+        if operation == 'sub':
+            value = -value
+        if self.window_calls is None:
+            tick = self._time_tick()
+        else:
+            tick = self._calls // self._bucket_size
+            self._calls += 1
+        self._advance(tick)
+        index = tick % self.buckets
+        self._ring[index] = value + self._ring[index]
+        self._total = value + self._total
+        # the value is computed from the window, this only updates the call count (and calls the observers and
+        # call_every_func)
+        self._set(0)
+        if ret == 'value':
+            return self.value
+        return self
+
+    def window(self):
+        """
+        :return: a list of the bucket totals, oldest first (without the min/max counters applied)
+        """
+        if self.window_calls is None:
+            self._advance(self._time_tick())
+        start = self._tick + 1
+        return [self._ring[t % self.buckets] for t in range(start, start + self.buckets)]
+
+    def clear(self):
+        """
+        Clears the window.
+        """
+        self._clear_window()
+        super(WindowCounter, self).clear()
+
+    def __copy__(self):
+        tmp_ret = self.__class__(
+            window_seconds=self.window_seconds,
+            window_calls=self.window_calls,
+            buckets=self.buckets,
+            clock=self.clock,
+            min_counter=self.min_counter,
+            max_counter=self.max_counter,
+            increment_by=self.increment_by,
+            call_every=self.call_every,
+            call_every_func=self.call_every_func,
+            perc_decimal=self.perc_decimal,
+            no_scan=True,
+            call_every_seconds=self.call_every_seconds,
+        )
+        tmp_ret._ring = list(self._ring)
+        tmp_ret._total = self._total
+        tmp_ret._tick = self._tick
+        tmp_ret._calls = self._calls
+        tmp_ret._start = self._start
+        tmp_ret.call_countdown = self.call_countdown
+        tmp_ret.call_count = self.call_count
+        return tmp_ret
+
+    copy = __copy__
+
+    def __repr__(self):
+        if self.window_calls is None:
+            window = '%ss' % self.window_seconds
+        else:
+            window = '%s calls' % self.window_calls
+        return 'WindowCounter(%s): %s' % (window, self.value)
@@ -0,0 +1,63 @@
+"""
+Helpers shared by the tests.
+
+"""
+from decimal import Decimal
+from src.advanced_counter.adv_counter import NamedCounter
+
+
+class FakeClock(object):
+    """
+    a clock that only moves when it is told to, for the clock / sleep arguments of the time based counters.
+    """
+
+    def __init__(self, step=0.0):
+        self.now = 1000.0
+        self.step = step
+        self.reads = 0
+        self.slept = []
+
+    def __call__(self):
+        self.reads += 1
+        return self.now
+
+    def tick(self):
+        self.now += self.step
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def counter_state(nc):
+    """
+    returns the state of the counters in a NamedCounter, to compare restored (or replayed) counters with the originals.
+    """
+    return {key: (c.name, c.description, c.value, c.min_counter, c.max_counter, c.rollover, c.call_count,
+                  c.call_countdown, getattr(c.increment_by, 'current_index', None))
+            for key, c in nc.counters.items()}
+
+
+def make_counters():
+    """
+    returns a NamedCounter with a mix of counter settings and value types, with some values added.
+    """
+    nc = NamedCounter()
+    nc.new('records', description='records read')
+    nc.new('errors', name='Error Count')
+    nc.new('progress', min_counter=0, max_counter=100)
+    nc.new('wheel', min_counter=0, max_counter=9, rollover=True)
+    nc.new('steps', increment_by=[1, 2, 5, 10])
+    nc.new('money', value=Decimal('1.25'))
+    nc.new('ratio', value=0.5)
+    nc.new('big', value=10 ** 30)
+    nc.add('records', 15)
+    nc.add('errors', 2)
+    nc.add('progress', '40%')
+    for i in range(13):
+        nc.add('wheel')
+    for i in range(3):
+        nc.add('steps')
+    nc.add('money', Decimal('0.10'))
+    nc.sub('ratio', 2.25)
+    return nc
@@ -0,0 +1,238 @@
+import decimal
+import random
+from unittest import TestCase
+from src.advanced_counter.adv_counter import AdvCounter, NamedCounter, SlottedCounter
+from src.advanced_counter.aggregates import CounterAggregates
+from src.advanced_counter.concurrent_counter import ConcurrentCounter
+from src.advanced_counter.shared_counter import SharedNamedCounter
+
+
+class TestObservers(TestCase):
+
+    def test_add_remove(self):
+        seen = []
+        other = []
+        tc = AdvCounter()
+        tc.add_observer(lambda c: seen.append(c.value))
+        tc += 1
+        tc.add(2)
+        tc.sub(1)
+        tc.set(10)
+        tc.mult(2)
+        tc.clear()
+        self.assertEqual(seen, [1, 3, 2, 10, 20, 0])
+
+        tc.add_observer(other.append)
+        tc.add()
+        self.assertEqual(seen[-1], 1)
+        self.assertEqual(other, [tc])
+
+        tc.remove_observer(other.append)
+        tc.add()
+        self.assertEqual(len(other), 1)
+        self.assertEqual(seen[-1], 2)
+        self.assertEqual(tc._fast_add.__name__, '_fast_add_hooked')
+
+        with self.assertRaises(ValueError):
+            tc.remove_observer(other.append)
+
+    def test_fast_path(self):
+        tc = AdvCounter()
+        self.assertEqual(tc._fast_add.__name__, '_fast_add_unbounded')
+        tc.add_observer(print)
+        self.assertEqual(tc._fast_add.__name__, '_fast_add_hooked')
+        tc.remove_observer(print)
+        self.assertEqual(tc._fast_add.__name__, '_fast_add_unbounded')
+
+    def test_before_call_every(self):
+        seen = []
+        values = []
+        tc = AdvCounter(call_every=3, call_every_func=lambda c: values.append(seen[-1]))
+        tc.add_observer(lambda c: seen.append(c.value))
+        for i in range(7):
+            tc.add()
+        self.assertEqual(values, [3, 6])
+
+    def test_add_many(self):
+        seen = []
+        values = []
+        tc = AdvCounter(call_every=4, call_every_func=lambda c: values.append(seen[-1]))
+        tc.add_observer(lambda c: seen.append(c.value))
+        tc.add_many([1] * 10)
+        self.assertEqual(values, [4, 8])
+        self.assertEqual(seen[-1], 10)
+
+    def test_concurrent(self):
+        seen = []
+        tc = ConcurrentCounter()
+        tc.add_observer(lambda c: seen.append(c.value))
+        tc.add(5)
+        self.assertEqual(seen, [])
+        tc.flush()
+        self.assertEqual(seen, [5])
+        tc.clear()
+        self.assertEqual(seen, [5, 0])
+
+
+class TestCounterAggregates(TestCase):
+
+    def test_basic(self):
+        agg = CounterAggregates()
+        self.assertEqual(agg.total, 0)
+        self.assertIsNone(agg.min_value)
+        self.assertIsNone(agg.max_value)
+
+        counters = [AdvCounter(value=i) for i in (5, -3, 10)]
+        for c, name in zip(counters, ('a', 'bbb', 'cc')):
+            c.name = name
+            agg.add(c)
+        self.assertEqual(agg.total, 12)
+        self.assertEqual(agg.min_value, -3)
+        self.assertEqual(agg.max_value, 10)
+        self.assertEqual(agg.name_width, 3)
+
+        counters[1].add(20)
+        self.assertEqual(agg.total, 32)
+        self.assertEqual(agg.min_value, 5)
+        self.assertEqual(agg.max_value, 17)
+
+        agg.remove(counters[1])
+        self.assertEqual(agg.total, 15)
+        self.assertEqual(agg.max_value, 10)
+        self.assertEqual(agg.name_width, 2)
+        self.assertEqual(len(agg), 2)
+
+        counters[1].add(100)
+        self.assertEqual(agg.total, 15)
+
+    def test_types(self):
+        agg = CounterAggregates()
+        ci = AdvCounter(value=1)
+        cd = AdvCounter(value=decimal.Decimal('1.5'))
+        for c in (ci, cd):
+            c.name = 'x'
+            agg.add(c)
+        self.assertFalse(agg.int_only)
+        self.assertEqual(agg.total, decimal.Decimal('2.5'))
+        cd.set(2)
+        self.assertTrue(agg.int_only)
+        self.assertEqual(agg.total, 3)
+        ci.set(0.5)
+        self.assertEqual(agg.total, 2.5)
+
+    def test_random(self):
+        rnd = random.Random(42)
+        agg = CounterAggregates()
+        counters = []
+        for i in range(50):
+            c = SlottedCounter(value=rnd.randint(-100, 100))
+            c.name = 'c' * rnd.randint(1, 20)
+            counters.append(c)
+            agg.add(c)
+        live = list(counters)
+        for i in range(3000):
+            action = rnd.random()
+            if action < 0.05 and live:
+                c = live.pop(rnd.randrange(len(live)))
+                agg.remove(c)
+            elif action < 0.1:
+                c = rnd.choice(counters)
+                if c not in live:
+                    live.append(c)
+                    agg.add(c)
+            else:
+                rnd.choice(counters).add(rnd.randint(-50, 50))
+            if not i % 7:
+                values = [c.value for c in live]
+                self.assertEqual(agg.total, sum(values))
+                self.assertEqual(agg.min_value, min(values, default=None))
+                self.assertEqual(agg.max_value, max(values, default=None))
+                self.assertEqual(agg.name_width, max((len(c.name) for c in live), default=0))
+        self.assertLess(len(agg._min_heap), 2 * len(live) + 100)
+
+
+class TestNamedAggregates(TestCase):
+
+    def test_properties(self):
+        for aggregates in (False, True):
+            with self.subTest(aggregates=aggregates):
+                nc = NamedCounter(aggregates=aggregates)
+                self.assertEqual(nc.total, 0)
+                self.assertIsNone(nc.min_value)
+                nc.add('a', 5)
+                nc.add('b', 3)
+                nc.sub('c', 2)
+                self.assertEqual(nc.total, 6)
+                self.assertEqual(nc.min_value, -2)
+                self.assertEqual(nc.max_value, 5)
+                nc.remove('a')
+                self.assertEqual(nc.total, 1)
+                self.assertEqual(nc.max_value, 3)
+                nc.new('b', 10, overwrite=True)
+                self.assertEqual(nc.total, 8)
+
+    def test_merge(self):
+        nc = NamedCounter(a=1, b=2, aggregates=True).merge(NamedCounter(a=3))
+        self.assertEqual(nc.total, 6)
+        nc.add('b')
+        self.assertEqual(nc.total, 7)
+
+    def test_report(self):
+        rnd = random.Random(7)
+        kwargs = dict(header='{name} {num_counters} {sum} {min} {max}', footer='[{sum}]')
+        for values in ([], [0], [5, -3, 7], [-1, -2], [decimal.Decimal('1.0'), 0], [0.1, 0.2, 0.3]):
+            with self.subTest(values=values):
+                plain = NamedCounter(name='test')
+                tracked = NamedCounter(name='test', aggregates=True)
+                for i, value in enumerate(values):
+                    key = 'counter_' * rnd.randint(1, 3) + str(i)
+                    plain.new(key, value)
+                    tracked.new(key, value)
+                self.assertEqual(plain.report(**kwargs), tracked.report(**kwargs))
+                self.assertEqual(plain.report(justify_name='<'), tracked.report(justify_name='<'))
+                for key in list(plain.keys()):
+                    plain.add(key, 3)
+                    tracked.add(key, 3)
+                self.assertEqual(plain.report(**kwargs), tracked.report(**kwargs))
+                self.assertEqual(plain.report(counters=list(plain.keys())[:1], **kwargs),
+                                 tracked.report(counters=list(tracked.keys())[:1], **kwargs))
+
+    def test_shared(self):
+        with self.assertRaises(AttributeError):
+            SharedNamedCounter('a', aggregates=True)
+
+
+class TestTopK(TestCase):
+
+    def test_top_bottom(self):
+        for aggregates in (False, True):
+            with self.subTest(aggregates=aggregates):
+                nc = NamedCounter(aggregates=aggregates)
+                for i, value in enumerate((5, 1, 9, -4, 7, 3)):
+                    nc.new('c%s' % i, value)
+                self.assertEqual(nc.top(3), ['c2', 'c4', 'c0'])
+                self.assertEqual(nc.bottom(2), ['c3', 'c1'])
+                self.assertEqual(nc.top(0), [])
+                self.assertEqual(len(nc.top(100)), 6)
+                nc.add('c3', 20)
+                nc.remove('c2')
+                self.assertEqual(nc.top(2), ['c3', 'c4'])
+                self.assertEqual(nc.bottom(1), ['c1'])
+                self.assertEqual(nc.report(counters=nc.top(1)), 'c3 : 16')
+
+    def test_random(self):
+        rnd = random.Random(3)
+        nc = NamedCounter(aggregates=True)
+        for i in range(200):
+            nc.new('c%s' % i, rnd.randint(0, 10000))
+        for i in range(2000):
+            key = 'c%s' % rnd.randrange(200)
+            if rnd.random() < 0.02:
+                nc.remove(key) if key in nc else nc.new(key, rnd.randint(0, 10000))
+            elif key in nc:
+                nc.add(key, rnd.randint(-500, 500))
+            if not i % 11:
+                k = rnd.randint(1, 30)
+                values = sorted(nc.values())
+                self.assertEqual([nc[key].value for key in nc.top(k)], values[::-1][:k])
+                self.assertEqual([nc[key].value for key in nc.bottom(k)], values[:k])
@@ -0,0 +1,78 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from src.advanced_counter.async_counter import AsyncCounter
+
+
+class TestAsyncCounter(IsolatedAsyncioTestCase):
+
+    async def test_not_blocking(self):
+        started = []
+        release = asyncio.Event()
+
+        async def callback(counter):
+            started.append(counter.value)
+            await release.wait()
+
+        tc = AsyncCounter(call_every=10, call_every_func=callback)
+        tc.add_many([1] * 10)
+        self.assertTrue(tc.running)
+        await asyncio.sleep(0)
+        self.assertEqual([10], started)
+        for i in range(90):
+            tc += 1
+        self.assertEqual(100, tc.value)
+        release.set()
+        await tc.drain()
+        self.assertFalse(tc.running)
+        # the 9 call_every points passed while the first callback was running are merged into one more call.
+        self.assertEqual([10, 100], started)
+        self.assertEqual(8, tc.skipped)
+
+    async def test_drop(self):
+        calls = []
+
+        async def callback(counter):
+            calls.append(counter.value)
+            await asyncio.sleep(0)
+
+        tc = AsyncCounter(call_every=2, call_every_func=callback, overflow='drop')
+        tc.add_many([1] * 10)
+        await tc.drain()
+        self.assertEqual([10], calls)
+        self.assertEqual(4, tc.skipped)
+
+        for i in range(4):
+            tc += 1
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+        self.assertEqual([10, 12, 14], calls)
+
+    async def test_sync_callback(self):
+        calls = []
+        async with AsyncCounter(call_every=3, call_every_func=lambda c: calls.append(c.value)) as tc:
+            for i in range(7):
+                tc.add()
+            self.assertEqual([3, 6], calls)
+
+    async def test_errors(self):
+        async def callback(counter):
+            raise ValueError('boom')
+
+        tc = AsyncCounter(call_every=1, call_every_func=callback)
+        tc += 1
+        with self.assertLogs('src.advanced_counter.async_counter'):
+            with self.assertRaises(ValueError):
+                await tc.drain()
+        await tc.drain()
+
+    def test_no_loop(self):
+        async def callback(counter):
+            pass
+
+        tc = AsyncCounter(call_every=1, call_every_func=callback)
+        with self.assertRaises(RuntimeError):
+            tc += 1
+
+    def test_invalid_overflow(self):
+        with self.assertRaises(AttributeError):
+            AsyncCounter(overflow='queue')
@@ -0,0 +1,138 @@
+from decimal import Decimal
+from unittest import TestCase
+from src.advanced_counter.adv_counter import NamedCounter, SlottedCounter
+from src.advanced_counter.checkpoint import unpack_checkpoint
+from src.advanced_counter.distinct import DistinctCounter
+from tests.helpers import counter_state as state, make_counters
+
+
+class TestCheckpoint(TestCase):
+
+    def test_round_trip(self):
+        nc = make_counters()
+        data = nc.checkpoint()
+        self.assertIsInstance(data, bytes)
+
+        restored = NamedCounter()
+        restored.new('steps', increment_by=[1, 2, 5, 10])
+        restored.restore(data)
+        self.assertEqual(state(restored), state(nc))
+        self.assertEqual(restored['Error Count'].value, 2)
+        self.assertEqual(restored['money'].value.__class__, Decimal)
+
+        # the restored counters carry on where the originals were.
+        for counter in (nc, restored):
+            counter.add('steps')
+            counter.add('wheel')
+            counter.add('progress', 70)
+        self.assertEqual(state(restored), state(nc))
+
+    def test_call_every(self):
+        calls = []
+        nc = NamedCounter()
+        nc.new('c', call_every=5, call_every_func=lambda c: calls.append(c.value))
+        for i in range(7):
+            nc.add('c')
+        restored = NamedCounter()
+        restored.new('c', call_every=5, call_every_func=lambda c: calls.append(-c.value))
+        restored.restore(nc.checkpoint())
+        for i in range(3):
+            restored.add('c')
+        self.assertEqual(calls, [5, -10])
+
+    def test_deltas(self):
+        nc = make_counters()
+        checkpoints = nc.checkpointer()
+        saved = [checkpoints.full()]
+        self.assertEqual(checkpoints.pending, 0)
+        nc.add('records', 5)
+        nc.add('records')
+        nc.set('progress', 90)
+        self.assertEqual(checkpoints.pending, 2)
+        saved.append(checkpoints.delta())
+        self.assertEqual(len(unpack_checkpoint(saved[-1])[3]), 2)
+
+        nc.new('late', value=3)
+        nc.remove('ratio')
+        nc.add('steps')
+        saved.append(checkpoints.delta())
+        self.assertEqual(len(unpack_checkpoint(saved[-1])[3]), 3)
+        saved.append(checkpoints.delta())
+        self.assertEqual(unpack_checkpoint(saved[-1])[3], [])
+
+        restored = NamedCounter()
+        restored.new('steps', increment_by=[1, 2, 5, 10])
+        restored.restore(*saved)
+        self.assertEqual(state(restored), state(nc))
+        self.assertNotIn('ratio', restored)
+
+        # the deltas can also be restored one at a time.
+        restored = NamedCounter()
+        restored.new('steps', increment_by=[1, 2, 5, 10])
+        restored.restore(saved[0])
+        restored.restore(saved[1])
+        with self.assertRaises(ValueError):
+            restored.restore(saved[3])
+        restored.restore(saved[2], saved[3])
+        self.assertEqual(state(restored), state(nc))
+
+        with self.assertRaises(ValueError):
+            NamedCounter().restore(saved[1])
+
+        checkpoints.close()
+        nc.add('records')
+        self.assertEqual(checkpoints.pending, 0)
+        self.assertIsNone(nc['records']._observer)
+
+    def test_delta_needs_full(self):
+        nc = make_counters()
+        with self.assertRaises(AttributeError):
+            nc.checkpointer().delta()
+
+    def test_overwrite(self):
+        nc = NamedCounter('a')
+        checkpoints = nc.checkpointer()
+        checkpoints.full()
+        old = nc['a']
+        nc.new('a', value=7, overwrite=True)
+        old.add(5)
+        delta = unpack_checkpoint(checkpoints.delta())[3]
+        self.assertEqual([(rec.key, rec.value) for rec in delta], [('a', 7)])
+
+    def test_slotted_and_aggregates(self):
+        nc = NamedCounter(counter_class=SlottedCounter, aggregates=True)
+        for i in range(100):
+            nc.add('c%s' % i, i)
+        restored = NamedCounter(counter_class=SlottedCounter, aggregates=True)
+        restored.new('c5', value=1000)
+        restored.restore(nc.checkpoint())
+        self.assertEqual(restored.total, nc.total)
+        self.assertEqual(restored.max_value, 99)
+        self.assertEqual(restored.top(2), ['c99', 'c98'])
+
+    def test_rename(self):
+        nc = NamedCounter(aggregates=True)
+        nc.new('a', name='A Much Longer Name', value=3)
+        nc.new('b', name='B')
+        restored = NamedCounter(aggregates=True)
+        restored.new('a', name='Old')
+        restored.new('b')
+        restored.restore(nc.checkpoint())
+        self.assertNotIn('Old', restored)
+        self.assertIs(restored['A Much Longer Name'], restored['a'])
+        self.assertIs(restored['B'], restored['b'])
+        self.assertEqual(restored.report(), 'A Much Longer Name : 3\n                 B : 0')
+        self.assertEqual(restored.total, 3)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            NamedCounter().restore(b'not a checkpoint')
+        data = make_counters().checkpoint()
+        with self.assertRaises(ValueError):
+            NamedCounter().restore(data[:-3])
+        with self.assertRaises(ValueError):
+            NamedCounter().restore(data[:4] + b'\x09' + data[5:])
+        nc = NamedCounter()
+        nc.new('distinct', value=DistinctCounter())
+        with self.assertRaises(AttributeError):
+            nc.checkpoint()
@@ -0,0 +1,107 @@
+import threading
+from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from src.advanced_counter.concurrent_counter import ConcurrentCounter
+
+
+class TestConcurrentCounter(TestCase):
+
+    def test_basic(self):
+        tc = ConcurrentCounter()
+        tc.add()
+        tc += 10
+        tc(4)
+        tc.sub(2)
+        tc -= 1
+        self.assertEqual(12, tc.value)
+        self.assertEqual(5, tc.call_count)
+        tc *= 2
+        self.assertEqual(24, tc.value)
+        self.assertEqual(6, tc.call_count)
+        tc.set(3)
+        self.assertEqual(3, int(tc))
+
+    def test_threads(self):
+        tc = ConcurrentCounter()
+
+        def work(count):
+            for i in range(count):
+                tc.add()
+            tc.add_many([2] * count)
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(work, [5000] * 16))
+        self.assertEqual(16 * 5000 * 3, tc.value)
+        self.assertEqual(16 * 5000 * 2, tc.call_count)
+
+    def test_thread_churn(self):
+        tc = ConcurrentCounter()
+        tc.add(5)
+
+        def work():
+            tc.add()
+            tc.add(2)
+
+        for i in range(200):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        # only the main thread's cell is left, the others are folded in as their threads end.
+        self.assertEqual(1, len(tc._cells))
+        self.assertEqual(605, tc.value)
+        self.assertEqual(401, tc.call_count)
+
+    def test_call_every_on_flush(self):
+        vals = []
+        tc = ConcurrentCounter(call_every=10, call_every_func=lambda c: vals.append(c.value))
+
+        def work(count):
+            for i in range(count):
+                tc.add()
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(work, [25] * 4))
+        self.assertEqual([], vals)
+        self.assertEqual(100, tc.flush())
+        self.assertEqual([100] * 10, vals)
+        self.assertEqual(10, tc.call_countdown)
+        tc.add_many([1] * 5)
+        tc.flush()
+        self.assertEqual(10, len(vals))
+        self.assertEqual(5, tc.call_countdown)
+
+    def test_min_max(self):
+        tc = ConcurrentCounter(min_counter=0, max_counter=10)
+        tc += 25
+        self.assertEqual(10, tc.value)
+        tc.flush()
+        tc -= 3
+        self.assertEqual(7, tc.value)
+        tc.sub(20)
+        self.assertEqual(0, tc.value)
+
+    def test_rollover(self):
+        tc = ConcurrentCounter(min_counter=0, max_counter=59, rollover=True)
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda x: tc.add(x), [61] * 100))
+        self.assertEqual(6100 % 60, tc.value)
+
+    def test_locked_paths(self):
+        tc = ConcurrentCounter(increment_by=[1, 2, 3])
+        tc.add()
+        tc.add()
+        tc.add(2)
+        self.assertEqual(6, tc.value)
+        tc.clear()
+        self.assertEqual(0, tc.value)
+        self.assertEqual(0, tc.call_count)
+        tc2 = tc + 0
+        self.assertIsInstance(tc2, ConcurrentCounter)
+        self.assertEqual(1, tc2.value)
+
+    def test_perc(self):
+        tc = ConcurrentCounter(min_counter=0, max_counter=200)
+        tc.add('10%')
+        tc.add()
+        self.assertEqual(21, tc.value)
+        self.assertEqual(2, tc.call_count)
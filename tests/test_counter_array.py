@@ -0,0 +1,135 @@
+import math
+from unittest import TestCase
+from src.advanced_counter.counter_array import CounterArray, CounterView
+from src.advanced_counter.adv_counter import AdvCounter
+
+
+class TestCounterArray(TestCase):
+
+    def test_init(self):
+        ca = CounterArray(3, min_counter=5, max_counter=10)
+        self.assertEqual(3, len(ca))
+        self.assertEqual([5, 5, 5], list(ca.values))
+        self.assertEqual(5, ca[0].min_counter)
+        self.assertEqual(10, ca[0].max_counter)
+        self.assertFalse(ca[0].rollover)
+
+    def test_init_errors(self):
+        with self.assertRaises(AttributeError):
+            CounterArray(2, min_counter=10, max_counter=5)
+        with self.assertRaises(AttributeError):
+            CounterArray(2, max_counter=5, rollover=True)
+
+    def test_add(self):
+        ca = CounterArray(3, max_counter=10)
+        ca.add([0, 1, 1], [5, 4, 4])
+        self.assertEqual([5, 8, 0], list(ca.values))
+        ca.add(2)
+        ca.add([0, 2], 3)
+        self.assertEqual([8, 8, 4], list(ca.values))
+        self.assertEqual([2, 2, 2], list(ca.call_counts))
+        ca[1] += 5
+        self.assertEqual(10, ca[1].value)
+
+    def test_mismatched_amounts(self):
+        ca = CounterArray(3)
+        with self.assertRaises(ValueError):
+            ca.add([0, 1], [1, 2, 3])
+
+    def test_matches_adv_counter(self):
+        ops = [('add', 5), ('add', 30), ('sub', 7), ('mult', 3), ('sub', 100), ('set', 1), ('add', 10 ** 6),
+               ('set', 200), ('sub', 1)]
+        TESTS = [
+            # (test_num, counter kwargs, typecode)
+            (1, {}, 'q'),
+            (2, {'min_counter': 0}, 'q'),
+            (3, {'max_counter': 50}, 'q'),
+            (4, {'min_counter': 5, 'max_counter': 50}, 'q'),
+            (5, {'min_counter': 0, 'max_counter': 59, 'rollover': True}, 'q'),
+            (6, {'min_counter': 0, 'max_counter': 59, 'rollover': True}, 'd'),
+        ]
+        for test_num, kwargs, typecode in TESTS:
+            with self.subTest(test_num=test_num):
+                ca = CounterArray(2, typecode=typecode, **kwargs)
+                tc = AdvCounter(**kwargs)
+                for op, value in ops:
+                    getattr(tc, op)(value)
+                    getattr(ca, op)([1], [value])
+                    self.assertEqual(tc.value, ca[1].value)
+                tc.div(2)
+                ca.div([1], [2])
+                # integer arrays round down.
+                self.assertEqual(tc.value if typecode == 'd' else math.floor(tc.value), ca[1].value)
+                self.assertEqual(tc.call_count, ca[1].call_count)
+                self.assertEqual(0, ca[0].call_count)
+
+    def test_integer_rounding(self):
+        ca = CounterArray(3)
+        ca.set([0, 1, 2], [7, -7, 10])
+        ca.div([0, 1], 2)
+        ca.add(2, 2.0)
+        ca.mult(2, 0.5)
+        self.assertEqual([3, -4, 6], list(ca.values))
+        for op, amount in (('add', 0.5), ('sub', 0.5), ('mult', 0.25), ('set', 1.5)):
+            with self.subTest(op=op):
+                with self.assertRaises(TypeError):
+                    getattr(ca, op)(2, amount)
+        self.assertEqual([3, -4, 6], list(ca.values))
+        self.assertEqual([2, 2, 3], list(ca.call_counts))
+        ca = CounterArray(1, value=7, typecode='d')
+        ca.div(0, 2)
+        self.assertEqual(3.5, ca[0].value)
+
+    def test_clear(self):
+        ca = CounterArray(2)
+        ca.append(min_counter=3)
+        ca.add([0, 1, 2], [10, 20, 30])
+        ca.clear([1, 2])
+        self.assertEqual([10, 0, 3], list(ca.values))
+        self.assertEqual([1, 0, 0], list(ca.call_counts))
+        ca.clear()
+        self.assertEqual([0, 0, 3], list(ca.values))
+
+    def test_set_max(self):
+        ca = CounterArray(2, value=40)
+        ca.set_max([0], 30, 0)
+        self.assertEqual([30, 40], list(ca.values))
+        ca.set_max(1, 9, 0, rollover=True)
+        self.assertEqual(0, ca[1].value)
+        ca.add(1, 13)
+        self.assertEqual(3, ca[1].value)
+
+
+class TestCounterView(TestCase):
+
+    def test_view(self):
+        ca = CounterArray(2, min_counter=0, max_counter=100)
+        cv = ca[1]
+        self.assertIsInstance(cv, CounterView)
+        self.assertEqual(1, cv())
+        cv += 19
+        self.assertEqual(20, cv.value)
+        self.assertEqual(20, ca.values[1])
+        self.assertEqual(0.2, cv.perc)
+        self.assertEqual('20%', cv.perc_str)
+        cv -= 10
+        cv *= 3
+        self.assertEqual(30, int(cv))
+        self.assertEqual(4, len(cv))
+        self.assertTrue(cv > 10)
+        self.assertTrue(cv == ca[1])
+        self.assertEqual('30 (0 <-> 100)', repr(cv))
+        cv.clear()
+        self.assertFalse(cv)
+
+    def test_view_errors(self):
+        ca = CounterArray(2)
+        with self.assertRaises(IndexError):
+            ca[2]
+        self.assertEqual(1, ca[-1].index)
+        with self.assertRaises(AttributeError):
+            ca[0].perc
+
+    def test_iter(self):
+        ca = CounterArray(3, value=2)
+        self.assertEqual([2, 2, 2], [c.value for c in ca])
@@ -0,0 +1,139 @@
+import threading
+from unittest import TestCase
+from src.advanced_counter.adv_counter import CounterSnapshot, NamedCounter
+from src.advanced_counter.dispatcher import CallbackDispatcher, DispatchedCounter
+
+
+class TestCallbackDispatcher(TestCase):
+
+    def blocked_dispatcher(self, **kwargs):
+        """
+        returns a dispatcher with its thread blocked on the first callback, and the event to release it
+        """
+        release = threading.Event()
+        started = threading.Event()
+
+        def wait(arg):
+            started.set()
+            release.wait(5)
+
+        dispatcher = CallbackDispatcher(**kwargs)
+        dispatcher.submit(wait, None)
+        started.wait(5)
+        return dispatcher, release
+
+    def test_order(self):
+        calls = []
+        with CallbackDispatcher() as dispatcher:
+            for i in range(100):
+                dispatcher.submit(calls.append, i)
+            self.assertTrue(dispatcher.flush(5))
+        self.assertEqual(list(range(100)), calls)
+        with self.assertRaises(RuntimeError):
+            dispatcher.submit(calls.append, 1)
+
+    def test_drop_oldest(self):
+        calls = []
+        dispatcher, release = self.blocked_dispatcher(maxsize=3)
+        for i in range(10):
+            dispatcher.submit(calls.append, i)
+        self.assertEqual(3, len(dispatcher))
+        release.set()
+        dispatcher.flush(5)
+        dispatcher.close()
+        self.assertEqual([7, 8, 9], calls)
+        self.assertEqual(7, dispatcher.dropped)
+
+    def test_coalesce(self):
+        calls = []
+        dispatcher, release = self.blocked_dispatcher(overflow='coalesce')
+        for i in range(10):
+            dispatcher.submit(calls.append, ('a', i), key='a')
+            dispatcher.submit(calls.append, ('b', i), key='b')
+        dispatcher.submit(calls.append, ('c', 0))
+        self.assertEqual(3, len(dispatcher))
+        release.set()
+        dispatcher.flush(5)
+        dispatcher.close()
+        self.assertEqual([('a', 9), ('b', 9), ('c', 0)], calls)
+        self.assertEqual(18, dispatcher.dropped)
+
+    def test_coalesce_counters(self):
+        calls = []
+        dispatcher, release = self.blocked_dispatcher(overflow='coalesce')
+        for i in range(20):
+            # the counters are dropped while their callbacks are queued, so their ids can be reused.
+            tc = DispatchedCounter(i, call_every=1, call_every_func=calls.append, dispatcher=dispatcher)
+            tc.add()
+            del tc
+        tc = DispatchedCounter(dispatcher=dispatcher)
+        self.assertIsNot(tc._dispatch_key, tc.copy()._dispatch_key)
+        release.set()
+        dispatcher.flush(5)
+        dispatcher.close()
+        self.assertEqual(list(range(1, 21)), [snap.value for snap in calls])
+
+    def test_block(self):
+        calls = []
+        dispatcher, release = self.blocked_dispatcher(maxsize=2, overflow='block')
+        dispatcher.submit(calls.append, 0)
+        dispatcher.submit(calls.append, 1)
+        submitter = threading.Thread(target=dispatcher.submit, args=(calls.append, 2))
+        submitter.start()
+        submitter.join(0.05)
+        self.assertTrue(submitter.is_alive())
+        release.set()
+        submitter.join(5)
+        dispatcher.flush(5)
+        dispatcher.close()
+        self.assertEqual([0, 1, 2], calls)
+        self.assertEqual(0, dispatcher.dropped)
+
+    def test_errors(self):
+        with CallbackDispatcher() as dispatcher:
+            with self.assertLogs('src.advanced_counter.dispatcher'):
+                dispatcher.submit(lambda arg: 1 / arg, 0)
+                dispatcher.flush(5)
+        self.assertEqual(1, dispatcher.errors)
+
+    def test_invalid(self):
+        with self.assertRaises(AttributeError):
+            CallbackDispatcher(overflow='queue')
+        with self.assertRaises(AttributeError):
+            CallbackDispatcher(maxsize=0)
+
+
+class TestDispatchedCounter(TestCase):
+
+    def test_snapshots(self):
+        calls = []
+        main_thread = threading.current_thread()
+
+        def callback(snap):
+            calls.append((snap, threading.current_thread() is main_thread))
+
+        with CallbackDispatcher() as dispatcher:
+            tc = DispatchedCounter(min_counter=0, max_counter=20, call_every=5, call_every_func=callback,
+                                   dispatcher=dispatcher)
+            for i in range(10):
+                tc += 1
+            tc.add_many([1] * 5)
+            dispatcher.flush(5)
+        self.assertEqual([5, 10, 15], [snap.value for snap, on_main in calls])
+        self.assertEqual([5, 10, 15], [snap.call_count for snap, on_main in calls])
+        self.assertEqual(['25%', '50%', '75%'], [snap.perc_str for snap, on_main in calls])
+        self.assertFalse(any(on_main for snap, on_main in calls))
+        self.assertIsInstance(calls[0][0], CounterSnapshot)
+        with self.assertRaises(AttributeError):
+            calls[0][0].value = 1
+
+    def test_named_counter(self):
+        calls = []
+        with CallbackDispatcher() as dispatcher:
+            nc = NamedCounter(counter_class=DispatchedCounter)
+            nc.new('records', name='Records', call_every=2, call_every_func=calls.append, dispatcher=dispatcher)
+            nc.add('records')
+            nc.add('records')
+            dispatcher.flush(5)
+        self.assertEqual([('records', 'Records', 2)], [(s.key, s.name, s.value) for s in calls])
+        self.assertIs(dispatcher, nc.records.copy().dispatcher)
@@ -0,0 +1,103 @@
+import pickle
+from unittest import TestCase
+from src.advanced_counter.adv_counter import NamedCounter
+from src.advanced_counter.distinct import DistinctCounter
+
+
+class TestDistinctCounter(TestCase):
+
+    def test_estimate(self):
+        for precision, count in ((10, 500), (12, 20000), (14, 100000)):
+            with self.subTest(precision=precision, count=count):
+                dc = DistinctCounter(precision=precision)
+                for i in range(count):
+                    dc.add('item-%s' % i)
+                # repeats do not change the estimate.
+                value = dc.value
+                for i in range(0, count, 3):
+                    dc.add('item-%s' % i)
+                self.assertEqual(dc.value, value)
+                error = 1.04 / (2 ** precision) ** 0.5
+                self.assertLess(abs(value - count), count * error * 4)
+                self.assertEqual(dc.call_count, count + len(range(0, count, 3)))
+
+    def test_small(self):
+        dc = DistinctCounter()
+        self.assertEqual(dc.value, 0)
+        self.assertEqual(dc.add('a'), 1)
+        dc += 'b'
+        dc.add(b'c')
+        dc.add(5)
+        self.assertEqual(dc.value, 4)
+        self.assertEqual(len(dc), 4)
+        dc.clear()
+        self.assertEqual(dc.value, 0)
+        self.assertEqual(dc.call_count, 0)
+
+    def test_not_supported(self):
+        dc = DistinctCounter()
+        for meth in ('sub', 'mult', 'div', 'set'):
+            with self.subTest(meth=meth):
+                with self.assertRaises(AttributeError):
+                    getattr(dc, meth)(1)
+        with self.assertRaises(AttributeError):
+            dc.add()
+        with self.assertRaises(AttributeError):
+            DistinctCounter(precision=20)
+
+    def test_merge(self):
+        dc1 = DistinctCounter(precision=12)
+        dc2 = DistinctCounter(precision=12)
+        full = DistinctCounter(precision=12)
+        for i in range(3000):
+            dc1.add(i)
+            full.add(i)
+        for i in range(2000, 6000):
+            dc2.add(i)
+            full.add(i)
+        tc = DistinctCounter.combine(dc1, dc2)
+        self.assertEqual(tc.registers, full.registers)
+        self.assertEqual(tc.value, full.value)
+        self.assertEqual(tc.call_count, 7000)
+        self.assertEqual(dc1.value, DistinctCounter.combine([dc1]).value)
+        dc1.merge(dc2)
+        self.assertEqual(dc1.value, full.value)
+        with self.assertRaises(AttributeError):
+            dc1.merge(DistinctCounter(precision=10))
+
+    def test_serialize(self):
+        dc = DistinctCounter(precision=10)
+        for i in range(5000):
+            dc.add(i)
+        data = dc.to_bytes()
+        self.assertEqual(len(data), 5 + 768)
+        tc = DistinctCounter.from_bytes(data)
+        self.assertEqual(tc.precision, 10)
+        self.assertEqual(tc.registers, dc.registers)
+        self.assertEqual(tc.value, dc.value)
+        with self.assertRaises(ValueError):
+            DistinctCounter.from_bytes(b'abcd' + data[4:])
+        with self.assertRaises(ValueError):
+            DistinctCounter.from_bytes(data[:-3])
+        self.assertEqual(pickle.loads(pickle.dumps(dc)).value, dc.value)
+
+    def test_call_every(self):
+        calls = []
+        dc = DistinctCounter(call_every=10, call_every_func=lambda c: calls.append(c.value))
+        for i in range(25):
+            dc.add(i % 15)
+        self.assertEqual(calls, [10, 15])
+
+    def test_named(self):
+        nc = NamedCounter(counter_class=DistinctCounter, name='Visitors', aggregates=True)
+        for i in range(100):
+            nc.add('ips', 'ip-%s' % (i % 40))
+            nc.add('users', 'user-%s' % (i % 7))
+        self.assertEqual(nc.report(), 'Visitors\n      ips : 40\n    users : 7')
+        self.assertEqual(nc.total, 47)
+        nc2 = NamedCounter(ips=DistinctCounter())
+        for i in range(30, 60):
+            nc2.add('ips', 'ip-%s' % i)
+        merged = nc.merge(nc2)
+        self.assertIsInstance(merged['ips'], DistinctCounter)
+        self.assertEqual(merged['ips'].value, 60)
@@ -0,0 +1,186 @@
+from functools import partial
+from unittest import TestCase
+from src.advanced_counter.adv_counter import NamedCounter
+from src.advanced_counter.histogram import Histogram, LinearBuckets, ExponentialBuckets, HdrBuckets
+
+
+class TestLayouts(TestCase):
+
+    def test_linear(self):
+        layout = LinearBuckets(0, 10, 5)
+        self.assertEqual(layout.position(-1), 0)
+        self.assertEqual(layout.position(0), 1)
+        self.assertEqual(layout.position(9.99), 1)
+        self.assertEqual(layout.position(10), 2)
+        self.assertEqual(layout.position(49), 5)
+        self.assertEqual(layout.position(50), 6)
+        self.assertEqual(layout.bounds(2), (10, 20))
+        self.assertEqual(layout.bounds(6), (50, float('inf')))
+
+    def test_exponential(self):
+        layout = ExponentialBuckets(1, 2, 10)
+        self.assertEqual(layout.position(0.5), 0)
+        self.assertEqual(layout.position(1), 1)
+        self.assertEqual(layout.position(3.9), 2)
+        self.assertEqual(layout.position(4), 3)
+        self.assertEqual(layout.position(1023), 10)
+        self.assertEqual(layout.position(1024), 11)
+        for i in range(10):
+            self.assertEqual(layout.position(2 ** i), i + 1)
+        layout = ExponentialBuckets(0.001, 10, 6)
+        for i in range(6):
+            lower, upper = layout.bounds(i + 1)
+            self.assertEqual(layout.position(lower), i + 1)
+
+    def test_hdr(self):
+        layout = HdrBuckets(highest=10 ** 6, significant_figures=2)
+        # every int below 256 has its own bucket.
+        for value in range(256):
+            self.assertEqual(layout.bounds(layout.position(value)), (value, value + 1))
+        last = 0
+        for value in range(256, 10 ** 6, 997):
+            position = layout.position(value)
+            self.assertGreaterEqual(position, last)
+            last = position
+            lower, upper = layout.bounds(position)
+            self.assertTrue(lower <= value < upper)
+            self.assertLessEqual(upper - lower, value / 100.0)
+        self.assertEqual(layout.position(-1), 0)
+        self.assertEqual(layout.position(2 * 10 ** 6), layout.buckets + 1)
+
+    def test_hdr_resolution(self):
+        layout = HdrBuckets(highest=60, significant_figures=3, resolution=0.000001)
+        lower, upper = layout.bounds(layout.position(0.0153))
+        self.assertTrue(lower <= 0.0153 < upper)
+        self.assertLess(upper - lower, 0.0153 / 1000)
+
+    def test_bucket_boundaries(self):
+        layouts = [
+            HdrBuckets(highest=60, significant_figures=2, resolution=1e-6),
+            HdrBuckets(highest=60, significant_figures=3, resolution=1e-6),
+            HdrBuckets(highest=3600, significant_figures=2, resolution=0.001),
+            HdrBuckets(highest=10 ** 6, significant_figures=2),
+            LinearBuckets(0.1, 0.1, 500),
+            ExponentialBuckets(0.001, 1.1, 200),
+        ]
+        for layout in layouts:
+            with self.subTest(layout=layout):
+                for position in range(1, layout.buckets + 1):
+                    lower, upper = layout.bounds(position)
+                    self.assertEqual(layout.position(lower), position)
+
+    def test_invalid(self):
+        with self.assertRaises(AttributeError):
+            LinearBuckets(0, 0, 10)
+        with self.assertRaises(AttributeError):
+            ExponentialBuckets(0, 2, 10)
+        with self.assertRaises(AttributeError):
+            HdrBuckets(significant_figures=6)
+        with self.assertRaises(AttributeError):
+            Histogram(layout=[1, 2, 3])
+
+
+class TestHistogram(TestCase):
+
+    def test_record(self):
+        h = Histogram(LinearBuckets(0, 10, 10))
+        for value in range(100):
+            h.add(value)
+        self.assertEqual(h.value, 100)
+        self.assertEqual(h.count, 100)
+        self.assertEqual(h.call_count, 100)
+        self.assertEqual(h.total, sum(range(100)))
+        self.assertEqual(h.mean, 49.5)
+        self.assertEqual((h.min_value, h.max_value), (0, 99))
+        self.assertEqual(h.buckets()[0], (0, 10, 10))
+        h.record(500, count=5)
+        self.assertEqual(h.count, 105)
+        self.assertEqual(h.call_count, 101)
+        self.assertEqual(h.buckets()[-1], (100, float('inf'), 5))
+
+    def test_percentiles(self):
+        h = Histogram(LinearBuckets(0, 10, 10))
+        for value in range(100):
+            h.add(value)
+        self.assertEqual(h.p50, 50)
+        self.assertEqual(h.p90, 90)
+        self.assertEqual(h.percentile(0), 0)
+        self.assertEqual(h.percentile(100), 99)
+        self.assertEqual(h.percentiles(25, 75), [25, 75])
+        with self.assertRaises(AttributeError):
+            h.percentile(101)
+        self.assertIsNone(Histogram().p50)
+
+    def test_hdr_percentiles(self):
+        h = Histogram(HdrBuckets(highest=10 ** 7, significant_figures=2))
+        for value in range(1, 100001):
+            h.add(value)
+        for percent, expected in ((50, 50000), (99, 99000), (99.9, 99900)):
+            self.assertAlmostEqual(h.percentile(percent), expected, delta=expected / 100.0)
+        self.assertAlmostEqual(h.p999, 99900, delta=999)
+
+    def test_unsupported(self):
+        h = Histogram()
+        with self.assertRaises(AttributeError):
+            h.sub(5)
+        with self.assertRaises(AttributeError):
+            h.add()
+
+    def test_copy_and_merge(self):
+        h1 = Histogram(ExponentialBuckets(1, 2, 20))
+        h2 = Histogram(ExponentialBuckets(1, 2, 20))
+        for value in range(1, 1001):
+            h1.add(value)
+            h2.add(value + 1000)
+        h3 = h1.copy()
+        self.assertEqual(h3.counts, h1.counts)
+        h3.add(5)
+        self.assertEqual(h1.count, 1000)
+        merged = Histogram.combine(h1, h2)
+        self.assertEqual(merged.count, 2000)
+        self.assertEqual((merged.min_value, merged.max_value), (1, 2000))
+        self.assertEqual(merged.call_count, 2000)
+        self.assertEqual(h1.count, 1000)
+        with self.assertRaises(AttributeError):
+            h1.merge(Histogram(ExponentialBuckets(1, 2, 10)))
+
+    def test_clear(self):
+        h = Histogram()
+        h.add(10)
+        h.clear()
+        self.assertEqual(h.count, 0)
+        self.assertIsNone(h.min_value)
+        self.assertEqual(sum(h.counts), 0)
+
+    def test_named_counter(self):
+        histogram = partial(Histogram, layout=LinearBuckets(0, 10, 10))
+        nc = NamedCounter(counter_class=histogram)
+        for value in range(100):
+            nc.add('latency', value)
+            nc.add('size', value * 2)
+        self.assertEqual(nc['latency'].p50, 50)
+        report = nc.report(line_format='{name} : {count} p50={p50} p99={p99:.1f}')
+        self.assertEqual(report, 'latency : 100 p50=50.0 p99=98.1\n   size : 100 p50=100.0 p99=196.0')
+
+        nc2 = NamedCounter(counter_class=histogram)
+        nc2.add('latency', 5)
+        merged = nc.merge(nc2)
+        self.assertEqual(merged['latency'].count, 101)
+
+    def test_fast_path(self):
+        h1 = Histogram(HdrBuckets(highest=10 ** 6))
+        h2 = Histogram(HdrBuckets(highest=10 ** 6))
+        changed = []
+        h2.add_observer(changed.append)
+        self.assertIsNotNone(h1._fast_add)
+        self.assertIsNone(h2._fast_add)
+        for value in (5, 1.5, 300, 10 ** 7, -2, 77):
+            h1.add(value)
+            h2.add(value)
+        self.assertEqual(h1.counts, h2.counts)
+        self.assertEqual(h1._blocks, h2._blocks)
+        self.assertEqual((h1.count, h1.total, h1.min_value, h1.max_value),
+                         (h2.count, h2.total, h2.min_value, h2.max_value))
+        self.assertEqual(h1.call_count, h2.call_count)
+        self.assertEqual(len(changed), 6)
+        self.assertEqual(h1.percentiles(0, 50, 100), h2.percentiles(0, 50, 100))
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+from unittest import TestCase, IsolatedAsyncioTestCase
+from unittest import mock
+from src.advanced_counter.limiter import TokenBucket, LeakyBucket, KeyedRateLimiter
+from tests.helpers import FakeClock
+
+
+class TestTokenBucket(TestCase):
+
+    def make(self, bucket_class=TokenBucket, **kwargs):
+        clock = FakeClock()
+        return clock, bucket_class(clock=clock, sleep=clock.sleep, **kwargs)
+
+    def test_try_acquire(self):
+        clock, tb = self.make(rate=2, capacity=4)
+        self.assertEqual(tb.value, 4)
+        self.assertTrue(tb.try_acquire(3))
+        self.assertTrue(tb.try_acquire())
+        self.assertFalse(tb.try_acquire())
+        self.assertEqual(tb.value, 0)
+        clock.now += 0.25
+        self.assertEqual(tb.value, 0.5)
+        self.assertFalse(tb.try_acquire())
+        self.assertEqual(tb.wait_time(), 0.25)
+        clock.now += 0.25
+        self.assertTrue(tb.try_acquire())
+        clock.now += 100
+        self.assertEqual(tb.value, 4)
+        self.assertEqual(tb.call_count, 3)
+        self.assertTrue(tb.idle)
+        self.assertEqual(tb.perc_str, '100%')
+
+    def test_concurrent_read(self):
+        reading = threading.Event()
+        taken = threading.Event()
+
+        class PausedBucket(TokenBucket):
+            # pauses a reader thread part way through the refill, until the main thread has taken a token.
+            @property
+            def per_second(self):
+                if threading.current_thread() is reader:
+                    reading.set()
+                    taken.wait(0.2)
+                return self._per_second
+
+            @per_second.setter
+            def per_second(self, value):
+                self._per_second = value
+
+        clock, tb = self.make(bucket_class=PausedBucket, rate=1, capacity=2)
+        self.assertTrue(tb.try_acquire(2))
+        clock.now += 1
+        reader = threading.Thread(target=lambda: tb.value)
+        reader.start()
+        reading.wait(1)
+        self.assertTrue(tb.try_acquire())
+        taken.set()
+        reader.join()
+        self.assertFalse(tb.try_acquire())
+        self.assertEqual(tb.value, 0)
+
+    def test_acquire(self):
+        clock, tb = self.make(rate=10, capacity=10, value=0)
+        self.assertTrue(tb.acquire(5))
+        self.assertAlmostEqual(clock.now, 1000.5)
+        self.assertFalse(tb.acquire(5, timeout=0.1))
+        self.assertAlmostEqual(clock.now, 1000.6)
+        self.assertAlmostEqual(tb.value, 1)
+        self.assertTrue(tb.acquire(5, timeout=1))
+        with self.assertRaises(ValueError):
+            tb.acquire(11)
+
+    def test_errors(self):
+        with self.assertRaises(AttributeError):
+            TokenBucket(rate=0)
+        with self.assertRaises(AttributeError):
+            TokenBucket(rate=1, max_counter=5)
+
+    def test_call_every(self):
+        calls = []
+        clock, tb = self.make(rate=1, capacity=10, call_every=2, call_every_func=lambda c: calls.append(c.value))
+        for i in range(5):
+            tb.try_acquire()
+        self.assertEqual(calls, [8, 6])
+
+    def test_leaky(self):
+        clock, lb = self.make(LeakyBucket, rate=2, capacity=4)
+        self.assertEqual(lb.value, 0)
+        self.assertTrue(lb.try_acquire(3))
+        self.assertFalse(lb.try_acquire(2))
+        self.assertEqual(lb.wait_time(2), 0.5)
+        self.assertTrue(lb.acquire(2))
+        self.assertAlmostEqual(clock.now, 1000.5)
+        self.assertEqual(lb.value, 4)
+        clock.now += 10
+        self.assertTrue(lb.idle)
+
+    def test_copy(self):
+        clock, tb = self.make(rate=2, capacity=4)
+        tb.try_acquire(4)
+        tc = tb.copy()
+        clock.now += 1
+        self.assertEqual((tb.value, tc.value), (2, 2))
+        tc.try_acquire(2)
+        self.assertEqual((tb.value, tc.value), (2, 0))
+
+
+class TestKeyedRateLimiter(TestCase):
+
+    def test_keys(self):
+        clock = FakeClock()
+        kl = KeyedRateLimiter(rate=1, capacity=2, clock=clock, sleep=clock.sleep, name='Limits')
+        self.assertTrue(kl.try_acquire('10.0.1.1'))
+        self.assertTrue(kl.try_acquire('10.0.1.1'))
+        self.assertFalse(kl.try_acquire('10.0.1.1'))
+        self.assertTrue(kl.try_acquire('100.1.1'))
+        self.assertEqual(kl.wait_time('10.0.1.1'), 1)
+        self.assertIn('10.0.1.1', kl)
+        self.assertEqual(kl.report(), 'Limits\n    10.0.1.1 : 0 (0%)\n     100.1.1 : 1 (50%)')
+        self.assertTrue(kl.acquire('10.0.1.1'))
+        self.assertEqual(clock.slept, [1])
+        clock.now += 10
+        kl.try_acquire('other')
+        self.assertEqual(kl.prune(), 2)
+        self.assertEqual(list(kl._buckets), ['other'])
+        kl.remove('other')
+        self.assertEqual(len(kl), 0)
+
+    def test_leaky(self):
+        kl = KeyedRateLimiter(rate=1, capacity=2, bucket_class=LeakyBucket)
+        self.assertIsInstance(kl['a'], LeakyBucket)
+        self.assertTrue(kl.try_acquire('a', 2))
+        self.assertFalse(kl.try_acquire('a'))
+
+
+class TestAsyncAcquire(IsolatedAsyncioTestCase):
+
+    async def test_acquire_async(self):
+        clock = FakeClock()
+
+        async def fake_sleep(seconds):
+            clock.sleep(seconds)
+
+        tb = TokenBucket(rate=4, capacity=4, value=0, clock=clock)
+        with mock.patch('src.advanced_counter.limiter.asyncio.sleep', fake_sleep):
+            self.assertTrue(await tb.acquire_async(2))
+            self.assertAlmostEqual(clock.now, 1000.5)
+            self.assertFalse(await tb.acquire_async(4, timeout=0.5))
+            kl = KeyedRateLimiter(rate=4, clock=clock)
+            self.assertTrue(await kl.acquire_async('a', 4))
+            self.assertTrue(await kl.acquire_async('a', 1))
+        self.assertTrue(await TokenBucket(rate=1000, value=0).acquire_async(1))
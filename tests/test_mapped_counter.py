@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import tempfile
+from unittest import TestCase
+from src.advanced_counter.mapped_counter import MappedNamedCounter
+
+
+def read_values(path, queue):
+    with MappedNamedCounter(path, readonly=True) as counters:
+        queue.put({key: counter.value for key, counter in counters.counters.items()})
+
+
+class TestMappedNamedCounter(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'counters.map')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_reopen(self):
+        with MappedNamedCounter(self.path, 'records', 'errors', ratio={'value': 5}) as counters:
+            counters.add('records', 15)
+            counters.add('errors')
+            counters.add('ratio', 2)
+            self.assertEqual(counters.report(), 'records : 15\n errors : 1\n  ratio : 7')
+            self.assertTrue(counters.locked)
+            with self.assertRaises(KeyError):
+                counters.add('other')
+
+        with MappedNamedCounter(self.path, 'records', 'errors', 'warnings') as counters:
+            self.assertEqual(counters['records'].value, 15)
+            self.assertEqual(counters['records'].call_count, 1)
+            self.assertEqual(counters['ratio'].value, 7)
+            self.assertEqual(counters['warnings'].value, 0)
+            counters.add('records')
+
+        with MappedNamedCounter(self.path) as counters:
+            self.assertEqual(list(counters.counters), ['records', 'errors', 'ratio', 'warnings'])
+            self.assertEqual(counters['records'].value, 16)
+            self.assertFalse(counters.locked)
+
+    def test_float(self):
+        with MappedNamedCounter(self.path, typecode='d') as counters:
+            counters.add('seconds', 0.25)
+            counters.add('seconds', 0.5)
+        with MappedNamedCounter(self.path) as counters:
+            self.assertEqual(counters.typecode, 'd')
+            self.assertEqual(counters['seconds'].value, 0.75)
+
+    def test_integer_values(self):
+        with MappedNamedCounter(self.path, 'records', progress={'max_counter': 200}) as counters:
+            counters.add('records', 2.0)
+            counters.add('progress', '10%')
+            with self.assertRaises(TypeError):
+                counters.add('records', 0.5)
+            self.assertEqual(counters['records'].value, 2)
+            self.assertEqual(counters['records'].call_count, 1)
+            self.assertEqual(counters['progress'].value, 20)
+
+    def test_settings(self):
+        with MappedNamedCounter(self.path) as counters:
+            counters.new('wheel', min_counter=0, max_counter=9, rollover=True)
+            counters.new('steps', increment_by=[1, 2, 5])
+            for i in range(13):
+                counters.add('wheel')
+            counters.add('steps')
+            counters.add('steps')
+            self.assertEqual(counters['wheel'].value, 3)
+            self.assertEqual(counters['steps'].value, 3)
+
+    def test_growth_and_compact(self):
+        with MappedNamedCounter(self.path, capacity=4) as counters:
+            for i in range(10):
+                counters.add('c%s' % i, i)
+            self.assertEqual(counters.capacity, 16)
+            counters.remove('c0', 'c3', 'c4')
+            self.assertEqual(counters.used, 10)
+            counters.compact()
+            self.assertEqual(counters.used, 7)
+            self.assertEqual({k: c.value for k, c in counters.counters.items()},
+                             {'c%s' % i: i for i in (1, 2, 5, 6, 7, 8, 9)})
+            counters.add('c9')
+            counters.add('c10', 10)
+            self.assertEqual(counters.used, 8)
+        self.assertEqual(os.path.getsize(self.path), 64 + 16 * 64)
+
+        with MappedNamedCounter(self.path) as counters:
+            self.assertEqual(counters['c9'].value, 10)
+            self.assertEqual(counters['c10'].value, 10)
+            self.assertNotIn('c3', counters)
+
+    def test_half_compacted(self):
+        with MappedNamedCounter(self.path) as counters:
+            for i in range(5):
+                counters.add('c%s' % i, i)
+            counters.remove('c1')
+        # a crash during compact() after copying the c2 record over the removed c1 record.
+        with open(self.path, 'r+b') as f:
+            f.seek(64 + 2 * 64)
+            record = f.read(64)
+            f.seek(64 + 64)
+            f.write(record)
+
+        with MappedNamedCounter(self.path) as counters:
+            self.assertEqual(dict(counters.items()), {'c0': 0, 'c2': 2, 'c3': 3, 'c4': 4})
+            counters.add('c2', 10)
+            counters.compact()
+            self.assertEqual(counters.used, 4)
+        with MappedNamedCounter(self.path) as counters:
+            self.assertEqual(dict(counters.items()), {'c0': 0, 'c2': 12, 'c3': 3, 'c4': 4})
+
+    def test_reader(self):
+        with MappedNamedCounter(self.path, 'records', capacity=2) as counters:
+            reader = MappedNamedCounter(self.path, readonly=True)
+            counters.add('records', 5)
+            self.assertEqual(reader['records'].value, 5)
+            with self.assertRaises(AttributeError):
+                reader.new('other')
+            with self.assertRaises(TypeError):
+                reader.add('records')
+
+            counters.new('errors')
+            counters.new('warnings', value=3)
+            self.assertEqual(reader.report(), ' records : 5\n  errors : 0\nwarnings : 3')
+            counters.remove('records')
+            counters.compact()
+            counters.add('errors', 2)
+            self.assertEqual(reader.report(), '  errors : 2\nwarnings : 3')
+            self.assertFalse(reader.refresh())
+            reader.close()
+
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=read_values, args=(self.path, queue))
+            process.start()
+            self.assertEqual(queue.get(timeout=30), {'errors': 2, 'warnings': 3})
+            process.join()
+
+    def test_sync(self):
+        for sync in (None, 'always', 60):
+            with MappedNamedCounter(self.path, 'records', sync=sync) as counters:
+                counters.add('records')
+                counters.flush()
+        with MappedNamedCounter(self.path) as counters:
+            self.assertEqual(counters['records'].value, 3)
+
+    def test_invalid(self):
+        with self.assertRaises(AttributeError):
+            MappedNamedCounter(self.path, sync='sometimes')
+        with self.assertRaises(AttributeError):
+            MappedNamedCounter(self.path, typecode='i')
+        with MappedNamedCounter(self.path) as counters:
+            with self.assertRaises(AttributeError):
+                counters.new('x' * 50)
+        with open(self.path, 'wb') as f:
+            f.write(b'not a counter file' * 10)
+        with self.assertRaises(ValueError):
+            MappedNamedCounter(self.path)
+        with self.assertRaises(AttributeError):
+            MappedNamedCounter(self.path, 'records', readonly=True)
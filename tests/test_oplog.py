@@ -0,0 +1,169 @@
+from decimal import Decimal
+import os
+import tempfile
+from unittest import TestCase
+from src.advanced_counter.adv_counter import NamedCounter, SlottedCounter
+from src.advanced_counter.distinct import DistinctCounter
+from tests.helpers import counter_state as state, make_counters
+
+
+def run_operations(nc):
+    for i in range(25):
+        nc.add('records')
+        nc.add('wheel', 3)
+        nc.add('steps')
+    nc.sub('wheel', 7)
+    nc.add('progress', '40%')
+    nc['progress'].mult(2)
+    nc['progress'].div(Decimal('3'))
+    nc['records'].set(1000, force=True)
+    counter = nc['records']
+    counter += 2.5
+    nc.new('late', value=3, name='Late Items')
+    nc.add('late', 10 ** 30)
+    nc['steps'].clear()
+    nc.add('steps')
+    nc.remove('records')
+
+
+class TestOperationLog(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'counters.log')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_replay(self):
+        nc = make_counters()
+        nc.add('records', 7)
+        with nc.oplog(self.path) as log:
+            self.assertIsNone(nc['records']._fast_add)
+            run_operations(nc)
+            self.assertGreater(log.pending, 0)
+            self.assertEqual(log.operations, 84)
+        self.assertTrue(nc['wheel']._fast_batch)
+        self.assertIsNone(nc['wheel']._oplog)
+
+        replayed = make_counters()
+        self.assertEqual(replayed.replay(self.path), 84)
+        self.assertEqual(state(replayed), state(nc))
+        self.assertEqual(replayed['Late Items'].value, 10 ** 30 + 3)
+
+        # the replayed counters carry on the same way.
+        for counter in (nc, replayed):
+            counter.add('steps')
+            counter.add('wheel', 4)
+        self.assertEqual(state(replayed), state(nc))
+
+    def test_recover(self):
+        calls = []
+        nc = make_counters()
+        nc.new('c', call_every=10, call_every_func=lambda c: calls.append(c.value))
+        log = nc.oplog(self.path, commit_interval=None)
+        for i in range(15):
+            nc.add('c')
+            nc.add('steps')
+        log.commit()
+        for i in range(3):
+            nc.add('c')
+        self.assertEqual(calls, [10])
+        # the process stops without closing the log, the operations that were not committed are lost.
+
+        recovered = make_counters()
+        recovered.new('c', call_every=10, call_every_func=lambda c: calls.append(-c.value))
+        with recovered.oplog(self.path) as log:
+            self.assertEqual(log.replayed, 30)
+            self.assertEqual(recovered['c'].value, 15)
+            self.assertEqual(recovered['steps'].value, nc['steps'].value)
+            for i in range(5):
+                recovered.add('c')
+        self.assertEqual(calls, [10, -10, -20])
+
+        again = make_counters()
+        again.new('c', call_every=10, call_every_func=lambda c: None)
+        again.replay(self.path)
+        self.assertEqual(again['c'].value, 20)
+        self.assertEqual(again['c'].call_countdown, recovered['c'].call_countdown)
+
+    def test_partial_write(self):
+        nc = make_counters()
+        with nc.oplog(self.path, buffer_size=64) as log:
+            for i in range(100):
+                nc.add('records')
+        size = os.path.getsize(self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(size - 5)
+        replayed = make_counters()
+        count = replayed.replay(self.path)
+        self.assertLess(count, 100)
+        self.assertGreater(count, 80)
+        # (make_counters starts records at 15)
+        self.assertEqual(replayed['records'].value, 15 + count)
+
+    def test_compact(self):
+        nc = NamedCounter(counter_class=SlottedCounter)
+        with nc.oplog(self.path, buffer_size=1024, compact_size=16 * 1024) as log:
+            for i in range(20000):
+                nc.add('c%s' % (i % 50), i)
+            self.assertLess(log.size, 20 * 1024)
+            nc.remove('c0')
+            nc.add('c1')
+            log.compact()
+            self.assertLess(log.size, 2048)
+            nc.add('c2', 5)
+        replayed = NamedCounter(counter_class=SlottedCounter)
+        self.assertEqual(replayed.replay(self.path), 1)
+        self.assertEqual(state(replayed), state(nc))
+        self.assertNotIn('c0', replayed)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_remove_compact(self):
+        nc = NamedCounter('a', 'b')
+        with nc.oplog(self.path):
+            nc.add('a')
+            nc.remove('b')
+        reopened = NamedCounter('a', 'b')
+        with reopened.oplog(self.path) as log:
+            # the log is compacted when it is opened again.
+            self.assertEqual(log.replayed, 1)
+            reopened.add('a')
+        replayed = NamedCounter('a', 'b')
+        replayed.replay(self.path)
+        self.assertEqual(list(replayed.counters), ['a'])
+        self.assertEqual(replayed['a'].value, 2)
+
+    def test_overwrite(self):
+        nc = NamedCounter('a')
+        with nc.oplog(self.path):
+            old = nc['a']
+            nc.add('a', 2)
+            nc.new('a', value=7, overwrite=True)
+            old.add(5)
+            nc.add('a')
+        self.assertIsNone(old._oplog)
+        replayed = NamedCounter()
+        replayed.replay(self.path)
+        self.assertEqual(replayed['a'].value, 8)
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not an operation log')
+        with self.assertRaises(ValueError):
+            NamedCounter().replay(self.path)
+        with self.assertRaises(ValueError):
+            NamedCounter().oplog(self.path)
+        os.remove(self.path)
+
+        nc = NamedCounter()
+        nc.new('distinct', value=DistinctCounter())
+        with self.assertRaises(AttributeError):
+            nc.oplog(self.path)
+
+        nc = NamedCounter('a')
+        with nc.oplog(self.path):
+            other = NamedCounter()
+            other.new('a', value=nc['a'])
+            with self.assertRaises(AttributeError):
+                other.oplog(self.path + '2')
@@ -1,10 +1,13 @@
 import decimal
 from unittest import TestCase
-from src.advanced_counter.adv_counter import NamedCounter, AdvCounter, \
+from src.advanced_counter.adv_counter import NamedCounter, AdvCounter, SlottedCounter, \
     minmax, IncrementByDict, IncrementByValue, IncrementByList,\
     INCREMENT_LIST_ON_INDEX_RESET, \
     INCREMENT_LIST_ON_INDEX_NOTHING, INCREMENT_LIST_ON_INDEX_SET
 
+from src.advanced_counter.helpers import minmax_many, tree_reduce, CallTimer
+from tests.helpers import FakeClock
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
 
 """
@@ -57,6 +60,14 @@ class TestIncrementObjs(TestCase):
         with self.assertRaises(TypeError):
             ti = IncrementByValue('foobar')
 
+    def test_base_attributes(self):
+        ti = IncrementByValue()
+        ti.counter = 'my counter'
+        ti.other = 5
+        self.assertEqual(ti.counter, 'my counter')
+        self.assertEqual(ti.other, 5)
+        self.assertIsNone(IncrementByValue().counter)
+
     def test_base_no_scan(self):
         ti = IncrementByValue('foobar', no_scan=True)
         self.assertEqual(ti(), 'foobar')
@@ -201,6 +212,47 @@ class TestMinMax(TestCase):
                 act_val = minmax(value, min_val, max_val, rollover=rollover)
                 self.assertEqual(act_val, exp_val)
 
+    def test_minmax_rollover_large(self):
+        TESTS = [
+            # (test_num, value, min, max, exp_val),
+            (1, 10 ** 9, 0, 59, 10 ** 9 % 60),
+            (2, -(10 ** 9), 0, 59, -(10 ** 9) % 60),
+            (3, 10 ** 9 + 5, 5, 64, 5 + 10 ** 9 % 60),
+            (4, 10 ** 12 + 0.5, 0, 59, 40.5),
+            (5, -0.5, 0, 59, 59.5),
+            (6, decimal.Decimal('-210'), 0, 99, decimal.Decimal('90')),
+            (7, decimal.Decimal('314.5'), 1, 100, decimal.Decimal('14.5')),
+            (8, decimal.Decimal('-10') ** 9, 0, 59, decimal.Decimal('20')),
+        ]
+        for test_num, value, min_val, max_val, exp_val in TESTS:
+            with self.subTest(test_num=test_num):
+                act_val = minmax(value, min_val, max_val, rollover=True)
+                self.assertEqual(exp_val, act_val)
+                self.assertEqual(type(exp_val), type(act_val))
+
+    def test_minmax_rollover_matches_loop(self):
+        def loop_minmax(value, min_val, max_val):
+            diff = max_val - min_val + 1
+            while value > max_val:
+                value -= diff
+            while value < min_val:
+                value += diff
+            return value
+
+        for min_val, max_val in ((0, 59), (10, 99), (-5, 5), (1, 1)):
+            for value in range(-300, 300):
+                with self.subTest(value=value, min_val=min_val, max_val=max_val):
+                    self.assertEqual(loop_minmax(value, min_val, max_val), minmax(value, min_val, max_val, True))
+
+    def test_minmax_many(self):
+        values = [-210, -10, 0, 10, 40, 100, 101, 314]
+        for min_val, max_val, rollover in ((None, None, False), (None, 100, False), (10, None, False),
+                                           (10, 100, False), (0, 99, True), (1, 100, True)):
+            with self.subTest(min_val=min_val, max_val=max_val, rollover=rollover):
+                exp_vals = [minmax(v, min_val, max_val, rollover) for v in values]
+                self.assertEqual(exp_vals, minmax_many(values, min_val, max_val, rollover))
+        self.assertEqual([1, 59, 0], minmax_many(iter([61, -1, 10 ** 9 * 60]), 0, 59, True))
+
 
 class TestCounterObj(TestCase):
 
@@ -540,6 +592,424 @@ class TestCounterObj(TestCase):
         tc(set=10, add=3, mult=2)
         self.assertEqual(23, int(tc))
 
+    def test_set_max(self):
+        tc = AdvCounter(value=10, min_counter=0, max_counter=100)
+        tc.set_max(50)
+        self.assertEqual(50, tc.max_counter)
+        self.assertEqual(0, tc.min_counter)
+        tc += 100
+        self.assertEqual(50, int(tc))
+        tc.set_max(min_counter=60)
+        self.assertEqual(50, tc.max_counter)
+        self.assertEqual(60, tc.min_counter)
+
+
+class TestFastPath(TestCase):
+
+    def make_pair(self, **kwargs):
+        fast = AdvCounter(**kwargs)
+        slow = AdvCounter(**kwargs)
+        slow.fast_path = False
+        slow.set_max()
+        return fast, slow
+
+    def test_fast_path_selected(self):
+        self.assertIsNotNone(AdvCounter()._fast_add)
+        self.assertIsNotNone(AdvCounter(min_counter=0, max_counter=10)._fast_add)
+        self.assertIsNone(AdvCounter(min_counter=0, max_counter=10, rollover=True)._fast_add)
+        self.assertIsNone(AdvCounter(increment_by=[1, 2])._fast_add)
+        tc = AdvCounter()
+        tc.fast_path = False
+        tc.set_max()
+        self.assertIsNone(tc._fast_add)
+
+    def test_fast_path_matches_generic(self):
+        TESTS = [
+            # (test_num, counter kwargs, values to add)
+            (1, {}, [None, 1, 5, -3, 2.5]),
+            (2, {'min_counter': 0}, [None, -10, 4, -4, 3.0]),
+            (3, {'max_counter': 20}, [None, 30, -5, 5, 5.0]),
+            (4, {'min_counter': 5, 'max_counter': 20, 'value': 10}, [None, 30, -50, 20.0, -3, '10%']),
+            (5, {'increment_by': 3, 'call_every': 2, 'call_every_func': lambda c: None}, [None, None, 4, None]),
+            (6, {'min_counter': 0, 'max_counter': 100}, ['50%', None, AdvCounter(10), 60]),
+            (7, {'value': decimal.Decimal('1.5')}, [None, decimal.Decimal('2.25'), -4]),
+        ]
+        for test_num, kwargs, values in TESTS:
+            with self.subTest(test_num=test_num):
+                fast, slow = self.make_pair(**kwargs)
+                self.assertIsNotNone(fast._fast_add)
+                for v in values:
+                    self.assertEqual(slow.add(v), fast.add(v))
+                    self.assertEqual(type(slow.value), type(fast.value))
+                fast += 1
+                slow += 1
+                fast()
+                slow()
+                self.assertEqual(slow.value, fast.value)
+                self.assertEqual(slow.call_count, fast.call_count)
+                self.assertEqual(slow.call_countdown, fast.call_countdown)
+
+    def test_fast_path_call_every(self):
+        fast_vals = []
+        slow_vals = []
+        fast = AdvCounter(call_every=3, call_every_func=lambda c: fast_vals.append(c.value))
+        slow = AdvCounter(call_every=3, call_every_func=lambda c: slow_vals.append(c.value))
+        slow.fast_path = False
+        slow.set_max()
+        for i in range(10):
+            fast()
+            slow()
+        self.assertEqual([3, 6, 9], fast_vals)
+        self.assertEqual(slow_vals, fast_vals)
+
+    def test_fast_path_set_max(self):
+        tc = AdvCounter()
+        self.assertEqual(tc._fast_add.__name__, '_fast_add_unbounded')
+        tc.set_max(10, 0)
+        self.assertEqual(tc._fast_add.__name__, '_fast_add_clamped')
+        tc += 20
+        self.assertEqual(10, int(tc))
+
+
+class TestBatch(TestCase):
+
+    def run_both(self, values, ops=None, **kwargs):
+        batch_vals = []
+        single_vals = []
+        call_every_func = kwargs.pop('call_every_func', None)
+        if call_every_func is not None:
+            batch_kwargs = dict(kwargs, call_every_func=lambda c: batch_vals.append((c.value, c.call_count)))
+            single_kwargs = dict(kwargs, call_every_func=lambda c: single_vals.append((c.value, c.call_count)))
+        else:
+            batch_kwargs = single_kwargs = kwargs
+        batch = AdvCounter(**batch_kwargs)
+        single = AdvCounter(**single_kwargs)
+        if ops is None:
+            ret = batch.add_many(values)
+            for v in values:
+                single.add(v)
+        else:
+            ret = batch.apply_batch(ops)
+            for op, v in ops:
+                getattr(single, op)(v)
+        self.assertEqual(single.value, ret)
+        self.assertEqual(single.value, batch.value)
+        self.assertEqual(single.call_count, batch.call_count)
+        self.assertEqual(single.call_countdown, batch.call_countdown)
+        self.assertEqual(single_vals, batch_vals)
+        return batch
+
+    def test_add_many(self):
+        values = [1, 5, None, -3, 2.5, None, 7] * 30
+        TESTS = [
+            # (test_num, counter kwargs)
+            (1, {}),
+            (2, {'min_counter': 0, 'max_counter': 20}),
+            (3, {'min_counter': 0}),
+            (4, {'max_counter': 50}),
+            (5, {'min_counter': 0, 'max_counter': 9, 'rollover': True}),
+            (6, {'call_every': 7, 'call_every_func': True}),
+            (7, {'call_every': 1, 'call_every_func': True, 'max_counter': 100}),
+            (8, {'max_counter': 30, 'call_every_func': True}),
+            (9, {'increment_by': [1, 2, 3], 'call_every': 4, 'call_every_func': True}),
+        ]
+        for test_num, kwargs in TESTS:
+            with self.subTest(test_num=test_num):
+                if test_num == 9:
+                    self.run_both([None if v is None else 1 for v in values], **kwargs)
+                else:
+                    self.run_both(values, **kwargs)
+
+    def test_add_many_rollover_ints(self):
+        tc = self.run_both([10 ** 9, 7, -3, 59] * 10, min_counter=0, max_counter=59, rollover=True)
+        self.assertTrue(0 <= tc.value <= 59)
+
+    def test_add_many_mixed(self):
+        self.run_both([1, '10%', None, AdvCounter(5), 3] * 5, min_counter=0, max_counter=1000,
+                      call_every=3, call_every_func=True)
+
+    def test_add_many_repeated(self):
+        tc = AdvCounter(call_every=5, call_every_func=lambda c: None)
+        tc.add_many([1, 2, 3])
+        tc.add_many([])
+        tc.add_many(iter([4, 5, 6]))
+        self.assertEqual(21, tc.value)
+        self.assertEqual(6, tc.call_count)
+        self.assertEqual(4, tc.call_countdown)
+
+    def test_apply_batch(self):
+        ops = [('add', 5), ('sub', None), ('add', None), ('mult', 2), ('sub', 3), ('set', 4), ('div', 2),
+               ('add', 1.5), ('sub', 1)] * 10
+        for kwargs in ({}, {'min_counter': 0, 'max_counter': 100}, {'call_every': 4, 'call_every_func': True},
+                       {'min_counter': 0, 'max_counter': 99, 'rollover': True}):
+            with self.subTest(kwargs=kwargs):
+                self.run_both(None, ops=ops, **kwargs)
+
+    def test_apply_batch_perc(self):
+        ops = [('add', 5), ('add', '10%'), ('sub', None), ('sub', '5%'), ('set', '20%')] * 5
+        self.run_both(None, ops=ops, min_counter=0, max_counter=100, call_every=3, call_every_func=True)
+
+    def test_apply_batch_invalid(self):
+        tc = AdvCounter()
+        with self.assertRaises(AttributeError):
+            tc.apply_batch([('add', 1), ('foo', 2)])
+
+
+class TestSlottedCounter(TestCase):
+
+    def test_no_dict(self):
+        tc = SlottedCounter()
+        self.assertFalse(hasattr(tc, '__dict__'))
+        with self.assertRaises(AttributeError):
+            tc.foobar = 1
+        self.assertTrue(hasattr(AdvCounter(), '__dict__'))
+
+    def test_api(self):
+        tc = SlottedCounter(value=30, min_counter=10, max_counter=110)
+        self.assertEqual(30, int(tc))
+        self.assertAlmostEqual(0.20, tc.perc, 2)
+        tc += 30
+        self.assertEqual(60, tc.value)
+        self.assertEqual('50%', tc.perc_str)
+        tc.sub(100)
+        self.assertEqual(10, tc.value)
+        tc *= 3
+        self.assertEqual(30, tc.value)
+        tc /= 2
+        self.assertEqual(15, tc.value)
+        tc2 = tc + 5
+        self.assertIsInstance(tc2, SlottedCounter)
+        self.assertEqual(20, tc2)
+        self.assertEqual(15, tc)
+        self.assertTrue(tc < tc2)
+        self.assertEqual(4, tc.call_count)
+        self.assertEqual(10, tc.min_counter)
+        self.assertEqual(110, tc.max_counter)
+
+    def test_rollover_and_call_every(self):
+        vals = []
+        tc = SlottedCounter(min_counter=0, max_counter=9, rollover=True, call_every=4,
+                            call_every_func=lambda c: vals.append(c.value))
+        for i in range(12):
+            tc()
+        self.assertEqual([4, 8, 2], vals)
+        tc.clear()
+        self.assertEqual(0, tc.call_count)
+
+    def test_named_counter(self):
+        tc = NamedCounter('t1', 't2', max_counter=50, min_counter=0, counter_class=SlottedCounter)
+        self.assertIsInstance(tc.t1, SlottedCounter)
+        tc.t1 += 10
+        tc.add('t2', 20)
+        tc.new('t3', value=AdvCounter(4))
+        self.assertEqual([10, 20, 4], list(tc.values()))
+        exp_out = 't1 : 10 (20%)\n' \
+                  't2 : 20 (40%)\n' \
+                  't3 : 4'
+        self.assertEqual(exp_out, tc.report())
+
+
+class TestCombine(TestCase):
+
+    def test_combine(self):
+        c1 = AdvCounter(min_counter=0, max_counter=10)
+        c2 = AdvCounter(min_counter=5, max_counter=20)
+        c1 += 4
+        c1 += 3
+        c2.add(2)
+        tc = AdvCounter.combine(c1, c2)
+        self.assertIsInstance(tc, AdvCounter)
+        self.assertEqual(14, tc.value)
+        self.assertEqual(3, tc.call_count)
+        self.assertEqual(5, tc.min_counter)
+        self.assertEqual(30, tc.max_counter)
+        self.assertEqual(7, c1.value)
+        self.assertEqual(7, c2.value)
+
+    def test_combine_iterable(self):
+        tc = SlottedCounter.combine(AdvCounter(i) for i in range(5))
+        self.assertIsInstance(tc, SlottedCounter)
+        self.assertEqual(10, tc.value)
+
+    def test_combine_bounds(self):
+        c1 = AdvCounter(5, min_counter=0, max_counter=10)
+        c2 = AdvCounter(5, min_counter=2, max_counter=20)
+        c3 = AdvCounter(5, min_counter=1)
+        tc = AdvCounter.combine(c1, c2, bounds='widest')
+        self.assertEqual((0, 20, 10), (tc.min_counter, tc.max_counter, tc.value))
+        tc = AdvCounter.combine(c1, c2, bounds='first')
+        self.assertEqual((0, 10, 10), (tc.min_counter, tc.max_counter, tc.value))
+        tc = AdvCounter.combine(c1, c2, c3)
+        self.assertEqual((3, None, 15), (tc.min_counter, tc.max_counter, tc.value))
+        with self.assertRaises(AttributeError):
+            AdvCounter.combine(c1, c2, bounds='foo')
+
+    def test_combine_rollover(self):
+        c1 = AdvCounter(50, min_counter=0, max_counter=59, rollover=True)
+        c2 = AdvCounter(50, min_counter=0, max_counter=59, rollover=True)
+        tc = AdvCounter.combine(c1, c2)
+        self.assertTrue(tc.rollover)
+        self.assertEqual((0, 59, 40), (tc.min_counter, tc.max_counter, tc.value))
+        tc = AdvCounter.combine(iter([c1, c2]))
+        self.assertEqual((0, 59, 40), (tc.min_counter, tc.max_counter, tc.value))
+        tc = AdvCounter.combine(c1, c2, bounds='sum')
+        self.assertEqual((0, 118, 100), (tc.min_counter, tc.max_counter, tc.value))
+        tc = AdvCounter.combine(c1, c2, bounds='first')
+        self.assertEqual(40, tc.value)
+
+        c3 = AdvCounter(50, min_counter=0, max_counter=59)
+        with self.assertRaises(AttributeError):
+            AdvCounter.combine(c1, c3)
+        tc = AdvCounter.combine(c1, c3, bounds='first', on_conflict='clamp')
+        self.assertFalse(tc.rollover)
+        self.assertEqual(59, tc.value)
+
+    def test_combine_call_every(self):
+        vals = []
+        c1 = AdvCounter(call_every=4, call_every_func=lambda c: vals.append(c.value))
+        c2 = AdvCounter()
+        c1.add_many([1] * 3)
+        c2.add_many([1] * 6)
+        tc = AdvCounter.combine(c1, c2)
+        self.assertEqual([], vals)
+        self.assertEqual(9, tc.call_count)
+        self.assertEqual(3, tc.call_countdown)
+        tc.add_many([1] * 3)
+        self.assertEqual([12], vals)
+
+    def test_combine_empty(self):
+        with self.assertRaises(AttributeError):
+            AdvCounter.combine()
+
+    def test_merge(self):
+        nc1 = NamedCounter('a', 'b', max_counter=100, name='Totals')
+        nc1.a.add(5)
+        nc1.b.add(2)
+        nc2 = NamedCounter('b', c={'name': 'Counter C', 'value': 3})
+        nc2.b.add(4)
+        tc = nc1.merge(nc2)
+        self.assertEqual(['a', 'b', 'c'], list(tc.keys()))
+        self.assertEqual({'a': 5, 'b': 6, 'c': 3}, dict(tc.items()))
+        self.assertEqual(2, tc.b.call_count)
+        self.assertIsNone(tc.b.max_counter)
+        self.assertEqual('Counter C', tc['Counter C'].name)
+        self.assertEqual('Totals', tc.name)
+        self.assertEqual(2, nc1.b.value)
+
+        wheels = [NamedCounter(wheel={'min_counter': 0, 'max_counter': 9, 'rollover': True, 'value': 6})
+                  for i in range(2)]
+        tc = wheels[0].merge(wheels[1])
+        self.assertEqual((0, 9, 2), (tc.wheel.min_counter, tc.wheel.max_counter, tc.wheel.value))
+
+    def test_tree_reduce(self):
+        parts = []
+        for i in range(100):
+            nc = NamedCounter()
+            nc.add('even' if i % 2 else 'odd')
+            nc.add('all', i)
+            parts.append(nc)
+        tc = tree_reduce(parts, NamedCounter.merge, fan_in=8)
+        self.assertEqual({'odd': 50, 'even': 50, 'all': 4950}, dict(tc.items()))
+        with ThreadPoolExecutor(4) as executor:
+            tc = tree_reduce(parts, NamedCounter.merge, fan_in=3, executor=executor)
+        self.assertEqual({'odd': 50, 'even': 50, 'all': 4950}, dict(tc.items()))
+        self.assertEqual(100, tc.all.call_count)
+
+    def test_tree_reduce_single(self):
+        self.assertEqual(5, tree_reduce([5], max))
+        self.assertEqual(9, tree_reduce(range(10), max, fan_in=2))
+        with self.assertRaises(ValueError):
+            tree_reduce([], max)
+
+
+class TestCallTimer(TestCase):
+
+    def make_counter(self, step, **kwargs):
+        clock = FakeClock(step)
+        vals = []
+        tc = AdvCounter(call_every_func=lambda c: vals.append(c.call_count), **kwargs)
+        tc.call_timer.clock = clock
+        tc.call_timer.restart()
+        return tc, clock, vals
+
+    def test_timer_sampling(self):
+        clock = FakeClock(0.001)
+        timer = CallTimer(1, clock=clock)
+        fired = []
+        for i in range(10500):
+            clock.tick()
+            if timer.check():
+                fired.append(i)
+        self.assertEqual(10, len(fired))
+        # the clock is read at most every 64 calls here, not on every call.
+        self.assertLess(clock.reads, 250)
+        for prev, i in zip(fired, fired[1:]):
+            self.assertLess(abs(i - prev - 1000), 64)
+        self.assertTrue(timer.sample_every <= timer.max_sample)
+
+    def test_timer_rate_change(self):
+        clock = FakeClock(0.0001)
+        timer = CallTimer(1, clock=clock)
+        for i in range(20000):
+            clock.tick()
+            timer.check()
+        self.assertEqual(64, timer.sample_every)
+        clock.step = 0.5
+        fired = 0
+        for i in range(1000):
+            clock.tick()
+            fired += timer.check()
+        self.assertGreater(fired, 400)
+        self.assertEqual(1, timer.sample_every)
+        with self.assertRaises(ValueError):
+            CallTimer(0)
+
+    def test_seconds_only(self):
+        tc, clock, vals = self.make_counter(0.01, call_every_seconds=1)
+        self.assertIsNotNone(tc._fast_add)
+        self.assertFalse(tc._fast_batch)
+        self.assertEqual(1, tc.call_every_seconds)
+        for i in range(1050):
+            clock.tick()
+            tc.add()
+        self.assertEqual(10, len(vals))
+        self.assertEqual(1050, tc.value)
+
+    def test_seconds_and_calls(self):
+        # the count is reached first, the timer is restarted each time
+        tc, clock, vals = self.make_counter(0.001, call_every=100, call_every_seconds=1)
+        for i in range(1000):
+            clock.tick()
+            tc.add()
+        self.assertEqual(list(range(100, 1001, 100)), vals)
+
+        # the time is reached first
+        tc, clock, vals = self.make_counter(0.4, call_every=100, call_every_seconds=1)
+        for i in range(20):
+            clock.tick()
+            tc.add()
+        self.assertEqual([3, 6, 8, 11, 13, 16, 18], vals)
+
+    def test_generic_path(self):
+        for fast_path in (True, False):
+            with self.subTest(fast_path=fast_path):
+                tc, clock, vals = self.make_counter(0.4, min_counter=0, max_counter=10, call_every=100,
+                                                    call_every_seconds=1)
+                tc.fast_path = fast_path
+                tc.set_max()
+                for i in range(20):
+                    clock.tick()
+                    tc.add()
+                tc.add_many([1] * 5)
+                self.assertEqual([3, 6, 8, 11, 13, 16, 18], vals)
+                self.assertEqual(10, tc.value)
+                self.assertEqual(25, tc.call_count)
+
+    def test_copy(self):
+        tc = AdvCounter(call_every_seconds=5, call_every_func=lambda c: None)
+        self.assertEqual(5, copy(tc).call_every_seconds)
+        self.assertEqual(5, AdvCounter.combine(tc, tc).call_every_seconds)
+        self.assertIsNone(AdvCounter().call_every_seconds)
 
 na1 = 'name1'
 na2 = 'name2'
@@ -746,6 +1216,38 @@ class TestNamedCounter(TestCase):
                                             counters=['t3', 't2', 't4'],
                                             footer='footer-test {num_counters}', line_indent=4))
 
+    def test_compile_report(self):
+        tc = NamedCounter('test 1', 't2', min_counter=1, max_counter=50)
+        report_kwargs = dict(header='header-test {t2.value} {sum}', footer='footer-test {num_counters}',
+                             justify_name='<')
+        compiled = tc.compile_report(**report_kwargs)
+        self.assertEqual(tc.report(**report_kwargs), compiled())
+        tc.test_1 += 10
+        tc.t2 += 20
+        exp_out = 'header-test 21 32\n' \
+                  '    test 1 : 11 (20%)\n' \
+                  '    t2     : 21 (41%)\n' \
+                  'footer-test 2'
+        self.assertEqual(exp_out, compiled())
+        self.assertEqual(exp_out, compiled.render())
+        self.assertEqual(tc.report(**report_kwargs), compiled())
+
+        tc.locked = False
+        tc.add('a much longer name', 5)
+        self.assertEqual(tc.report(**report_kwargs), compiled())
+        self.assertEqual(4, len(tc.compile_report(header='counters', sep=None)()))
+
+    def test_compile_report_fields(self):
+        tc = NamedCounter('t1', 't2')
+        tc.t1.add(3)
+        tc.t1.add(4)
+        compiled = tc.compile_report(line_format='{name}: {value} in {call_count} calls{suffix}', suffix='!')
+        self.assertEqual('t1: 7 in 2 calls!\nt2: 0 in 0 calls!', compiled())
+        with self.assertRaises(KeyError):
+            tc.compile_report(line_format='{name}: {foobar}')()
+        with self.assertRaises(TypeError):
+            tc.compile_report(value=1)
+
     def print_list_comp(self, expected, actual):
         tmp_ret = ['\n\nExpected:',
                    '---------']
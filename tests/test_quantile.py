@@ -0,0 +1,125 @@
+from array import array
+from bisect import bisect_left
+import random
+from unittest import TestCase
+from src.advanced_counter.adv_counter import NamedCounter
+from src.advanced_counter.quantile import QuantileCounter
+
+
+def rank_error(sorted_values, value, q):
+    return abs(bisect_left(sorted_values, value) / float(len(sorted_values)) - q)
+
+
+class TestQuantileCounter(TestCase):
+
+    def test_small(self):
+        qc = QuantileCounter()
+        self.assertIsNone(qc.quantile(0.5))
+        for value in (5, 1, 4, 2, 3):
+            qc.add(value)
+        self.assertEqual(qc.value, 5)
+        self.assertEqual(qc.call_count, 5)
+        self.assertEqual(qc.quantiles(0, 0.5, 1), [1, 3, 5])
+        self.assertEqual(qc.mean, 3)
+        self.assertEqual((qc.min_value, qc.max_value), (1, 5))
+        with self.assertRaises(AttributeError):
+            qc.quantile(1.5)
+
+    def test_accuracy(self):
+        rand = random.Random(7)
+        values = [rand.lognormvariate(0, 1) for i in range(100000)]
+        sorted_values = sorted(values)
+        qc = QuantileCounter(compression=100)
+        for value in values:
+            qc.add(value)
+        for q in (0.001, 0.01, 0.1, 0.5, 0.9, 0.99, 0.999):
+            self.assertLess(rank_error(sorted_values, qc.quantile(q), q), 0.002)
+        self.assertEqual(qc.quantile(0), sorted_values[0])
+        self.assertEqual(qc.quantile(1), sorted_values[-1])
+        self.assertAlmostEqual(qc.p50, sorted_values[50000], delta=0.01)
+
+    def test_bounded_memory(self):
+        qc = QuantileCounter(compression=50)
+        rand = random.Random(3)
+        for i in range(100):
+            qc.add_many(rand.random() for i in range(10000))
+            self.assertLessEqual(len(qc.means), 50)
+            self.assertLessEqual(len(qc._buffer), 250)
+        self.assertEqual(qc.count, 1000000)
+        # the tail centroids still merge values (instead of one centroid per value)
+        self.assertGreater(qc.weights[-2], 1)
+
+    def test_add_many(self):
+        rand = random.Random(5)
+        values = [rand.random() for i in range(5000)]
+        calls = []
+        qc1 = QuantileCounter(call_every=1000, call_every_func=lambda c: calls.append(c.count))
+        qc1.add_many(array('d', values))
+        qc2 = QuantileCounter()
+        for value in values:
+            qc2.add(value)
+        self.assertEqual(calls, [1000, 2000, 3000, 4000, 5000])
+        self.assertEqual(qc1.call_count, 5000)
+        self.assertEqual(qc1.means, qc2.means)
+        self.assertEqual(qc1.weights, qc2.weights)
+        self.assertEqual(qc1.quantile(0.9), qc2.quantile(0.9))
+        with self.assertRaises(AttributeError):
+            qc1.add_many([1, None])
+
+    def test_unsupported(self):
+        qc = QuantileCounter()
+        with self.assertRaises(AttributeError):
+            qc.sub(1)
+        with self.assertRaises(AttributeError):
+            qc.add()
+        with self.assertRaises(AttributeError):
+            QuantileCounter(compression=5)
+
+    def test_merge(self):
+        rand = random.Random(11)
+        shards = []
+        values = []
+        for i in range(8):
+            qc = QuantileCounter()
+            shard_values = [rand.gauss(i, 1) for n in range(5000)]
+            qc.add_many(shard_values)
+            values.extend(shard_values)
+            shards.append(qc)
+        merged = QuantileCounter.combine(shards)
+        sorted_values = sorted(values)
+        self.assertEqual(merged.count, 40000)
+        self.assertEqual(merged.call_count, 40000)
+        self.assertEqual(merged.min_value, sorted_values[0])
+        self.assertLessEqual(len(merged.means), 100)
+        for q in (0.01, 0.5, 0.99):
+            self.assertLess(rank_error(sorted_values, merged.quantile(q), q), 0.005)
+        self.assertEqual(shards[0].count, 5000)
+
+    def test_copy_and_clear(self):
+        qc = QuantileCounter()
+        qc.add_many(range(1000))
+        qc2 = qc.copy()
+        qc2.add(5000)
+        self.assertEqual(qc.count, 1000)
+        self.assertEqual(qc2.max_value, 5000)
+        qc.clear()
+        self.assertEqual(qc.count, 0)
+        self.assertEqual(qc.centroids, 0)
+        self.assertIsNone(qc.p99)
+
+    def test_named_counter(self):
+        nc = NamedCounter()
+        nc.new('duration', value=QuantileCounter())
+        nc.new('size', value=QuantileCounter())
+        for i in range(1, 101):
+            nc.add('duration', i)
+            nc.add('size', i * 10)
+        self.assertEqual(nc['duration'].count, 100)
+        self.assertEqual(nc.report(line_format='{name} : {count} max={max_value}'),
+                         'duration : 100 max=100\n    size : 100 max=1000')
+
+        nc2 = NamedCounter(counter_class=QuantileCounter)
+        nc2.add('duration', 1000)
+        merged = nc.merge(nc2)
+        self.assertEqual(merged['duration'].count, 101)
+        self.assertEqual(merged['duration'].max_value, 1000)
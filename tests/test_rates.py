@@ -0,0 +1,175 @@
+import math
+from unittest import TestCase
+from src.advanced_counter.adv_counter import AdvCounter, NamedCounter, SlottedCounter
+from src.advanced_counter.rates import RateTracker, Progress, format_duration
+from tests.helpers import FakeClock
+
+
+class TestRateTracker(TestCase):
+
+    def make_counter(self, counter_class=AdvCounter, **kwargs):
+        clock = FakeClock()
+        tc = counter_class()
+        tc.track_rates(clock=clock, **kwargs)
+        return tc, clock
+
+    def run_rate(self, tc, clock, per_second, seconds, reads_per_second=4):
+        for i in range(seconds * reads_per_second):
+            tc.add(per_second / reads_per_second)
+            clock.now += 1.0 / reads_per_second
+            tc.rate_tracker.update()
+
+    def test_steady_rate(self):
+        tc, clock = self.make_counter()
+        self.run_rate(tc, clock, 100, 120)
+        rates = tc.rates()
+        self.assertEqual(['1s', '5s', '15s', '1m', 'mean'], list(rates))
+        for label, rate in rates.items():
+            self.assertAlmostEqual(100, rate, 3, msg=label)
+        self.assertAlmostEqual(100, tc.rate, 3)
+        self.assertEqual(60, len(tc.rate_tracker.per_second()))
+        for rate in tc.rate_tracker.per_second():
+            self.assertAlmostEqual(100, rate, 3)
+
+    def test_rate_change(self):
+        tc, clock = self.make_counter()
+        self.run_rate(tc, clock, 100, 120)
+        self.run_rate(tc, clock, 10, 10)
+        rates = tc.rates()
+        self.assertAlmostEqual(10, rates['1s'], 1)
+        self.assertAlmostEqual(10 + 90 * math.exp(-2), rates['5s'], 3)
+        self.assertGreater(rates['15s'], rates['5s'])
+        self.assertGreater(rates['1m'], rates['15s'])
+        self.assertAlmostEqual(1210 / 13.0, rates['mean'], 3)
+        self.assertEqual([100] * 50 + [10] * 10, [round(r) for r in tc.rate_tracker.per_second()])
+
+    def test_sparse_reads(self):
+        tc, clock = self.make_counter(history=5)
+        tc.add(50)
+        clock.now += 10.5
+        # spread evenly over the 10.5 seconds.
+        self.assertAlmostEqual(50 / 10.5, tc.rate, 6)
+        self.assertEqual(5, len(tc.rate_tracker.per_second()))
+        tc.add(50)
+        clock.now += 0.5
+        tc.rate_tracker.update()
+        self.assertAlmostEqual(100 / 11.0, tc.rates()['mean'], 6)
+
+    def test_first_second(self):
+        tc, clock = self.make_counter()
+        self.assertEqual(0, tc.rate)
+        tc.add(10)
+        clock.now += 0.5
+        self.assertEqual(20, tc.rate)
+        self.assertEqual([], tc.rate_tracker.per_second())
+
+    def test_call_count(self):
+        tc, clock = self.make_counter(counter_class=SlottedCounter, source='call_count', rate_window=5)
+        for i in range(10):
+            tc.add(1000)
+            clock.now += 0.1
+        self.assertAlmostEqual(10, tc.rate, 3)
+
+    def test_lazy_start(self):
+        tc = AdvCounter()
+        self.assertIsNone(tc._rate_tracker)
+        tc.add(10)
+        self.assertEqual(0, tc.rate)
+        self.assertIsInstance(tc._rate_tracker, RateTracker)
+
+    def test_invalid(self):
+        with self.assertRaises(AttributeError):
+            AdvCounter().track_rates(windows=())
+        with self.assertRaises(AttributeError):
+            AdvCounter().track_rates(rate_window=30)
+
+    def test_report(self):
+        clock = FakeClock()
+        nc = NamedCounter('c1', 'c2')
+        nc.c1.track_rates(clock=clock)
+        nc.c2.track_rates(clock=clock)
+        nc.add('c1', 30)
+        nc.add('c2', 5)
+        clock.now += 10
+        self.assertEqual('c1 : 30 (3.0/s, 1m: 3.0/s)\nc2 : 5 (0.5/s, 1m: 0.5/s)',
+                         nc.report(line_format='{name} : {value} ({rate:.1f}/s, 1m: {rate_1m:.1f}/s)'))
+
+
+class TestProgress(TestCase):
+
+    def make_counter(self, **kwargs):
+        clock = FakeClock()
+        tc = AdvCounter(min_counter=0, max_counter=100000, **kwargs)
+        tc.track_rates(clock=clock)
+        return tc, clock
+
+    def test_progress(self):
+        tc, clock = self.make_counter()
+        for i in range(100):
+            tc.add(100)
+            clock.now += 1
+        progress = tc.progress()
+        self.assertIsInstance(progress, Progress)
+        self.assertEqual(10000, progress.value)
+        self.assertAlmostEqual(0.1, float(progress.perc))
+        self.assertAlmostEqual(100, progress.rate, 3)
+        self.assertEqual(100, progress.elapsed)
+        self.assertAlmostEqual(900, progress.remaining, 1)
+        self.assertEqual('0:01:40', progress.elapsed_str)
+        self.assertEqual('0:15:00', progress.remaining_str)
+        self.assertEqual('10% (100.0/s, elapsed 0:01:40, remaining 0:15:00)', str(progress))
+        self.assertIsNotNone(progress.eta)
+
+    def test_smoothed(self):
+        tc, clock = self.make_counter()
+        for i in range(100):
+            tc.add(100)
+            clock.now += 1
+        # a short stall only slows the estimate a little.
+        clock.now += 5
+        self.assertLess(tc.progress().remaining, 1000)
+
+    def test_unknown(self):
+        tc, clock = self.make_counter()
+        progress = tc.progress()
+        self.assertIsNone(progress.remaining)
+        self.assertIsNone(progress.eta)
+        self.assertEqual('--:--:--', progress.remaining_str)
+        tc.set(100000)
+        self.assertEqual(0, tc.progress().remaining)
+        with self.assertRaises(AttributeError):
+            AdvCounter().progress()
+
+    def test_call_every_func(self):
+        clock = FakeClock()
+        vals = []
+        tc = AdvCounter(min_counter=0, max_counter=1000, call_every=250,
+                        call_every_func=lambda c: vals.append(c.progress().remaining))
+        tc.track_rates(clock=clock)
+        for i in range(1000):
+            tc.add()
+            clock.now += 0.01
+        for expected, remaining in zip([7.5, 5, 2.5, 0], vals):
+            self.assertAlmostEqual(expected, remaining, delta=0.1)
+
+    def test_format_duration(self):
+        self.assertEqual('0:00:00', format_duration(0))
+        self.assertEqual('0:01:01', format_duration(60.6))
+        self.assertEqual('27:46:40', format_duration(100000))
+        self.assertEqual('--:--:--', format_duration(None))
+
+    def test_report(self):
+        clock = FakeClock()
+        nc = NamedCounter(c1={'max_counter': 1000, 'min_counter': 0}, c2={})
+        nc.c1.track_rates(clock=clock)
+        nc.c2.track_rates(clock=clock)
+        for i in range(60):
+            nc.add('c1', 5)
+            nc.add('c2')
+            clock.now += 1
+        self.assertEqual('c1 : 300 (elapsed 0:01:00, eta 0:02:20)\nc2 : 60 (elapsed 0:01:00, eta )',
+                         nc.report(line_format='{name} : {value} (elapsed {elapsed}, eta {eta})'))
+        # passed kwargs are not replaced by the rate fields.
+        self.assertEqual('c1 : 300 (eta soon, rate 5.0)\nc2 : 60 (eta soon, rate 1.0)',
+                         nc.report(line_format='{name} : {value} (eta {eta}, rate {rate})', eta='soon'))
+        self.assertEqual('c1 : fast\nc2 : fast', nc.report(line_format='{name} : {rate}', rate='fast'))
@@ -0,0 +1,89 @@
+import multiprocessing
+import pickle
+import subprocess
+import sys
+from unittest import TestCase
+from concurrent.futures import ProcessPoolExecutor
+from src.advanced_counter.shared_counter import SharedNamedCounter, BufferCounter
+from src.advanced_counter.adv_counter import AdvCounter
+
+WORKER_COUNTERS = None
+
+
+def init_worker(counters):
+    global WORKER_COUNTERS
+    WORKER_COUNTERS = counters
+
+
+def work(count):
+    for i in range(count):
+        WORKER_COUNTERS.add('records')
+        WORKER_COUNTERS.t2 += 2
+    return count
+
+
+class TestSharedNamedCounter(TestCase):
+
+    def test_local(self):
+        with SharedNamedCounter('records', 't2', t3=5, t4={'max_counter': 10}, name='my counters') as tc:
+            self.assertIsInstance(tc.records, BufferCounter)
+            tc.records += 3
+            tc.add('t3', 2)
+            tc.t4 += 20
+            self.assertEqual([3, 0, 7, 10], list(tc.values()))
+            self.assertEqual(1, tc.records.call_count)
+            tc.t3.clear()
+            self.assertEqual(0, tc.t3.value)
+            copied = tc.records + 1
+            self.assertIsInstance(copied, AdvCounter)
+            self.assertEqual(4, copied.value)
+            self.assertEqual(3, tc.records.value)
+            self.assertEqual('my counters\n    records : 3\n         t2 : 0\n         t3 : 0\n         t4 : 10',
+                             tc.report())
+
+    def test_fixed_keys(self):
+        with SharedNamedCounter('t1') as tc:
+            with self.assertRaises(AttributeError):
+                tc.new('t2')
+            with self.assertRaises(KeyError):
+                tc['t2']
+
+    def test_float(self):
+        with SharedNamedCounter('t1', typecode='d') as tc:
+            tc.t1 += 1.5
+            self.assertEqual(1.5, tc.t1.value)
+
+    def test_merge(self):
+        with SharedNamedCounter('t1', 't2') as tc:
+            tc.t1 += 2
+            merged = tc.merge(tc)
+            self.assertIsInstance(merged.t1, AdvCounter)
+            self.assertNotIsInstance(merged.t1, BufferCounter)
+            self.assertEqual([4, 0], list(merged.values()))
+            self.assertEqual(2, merged.t1.call_count)
+            self.assertEqual(2, tc.t1.value)
+
+    def run_workers(self, mp_context):
+        with SharedNamedCounter('records', 't2', mp_context=mp_context) as tc:
+            with ProcessPoolExecutor(4, mp_context=mp_context, initializer=init_worker, initargs=(tc,)) as pool:
+                self.assertEqual(4000, sum(pool.map(work, [500] * 8)))
+            self.assertEqual(4000, tc.records.value)
+            self.assertEqual(8000, tc.t2.value)
+            self.assertEqual(4000, tc.t2.call_count)
+
+    def test_fork_workers(self):
+        self.run_workers(multiprocessing.get_context('fork'))
+
+    def test_spawn_workers(self):
+        self.run_workers(multiprocessing.get_context('spawn'))
+
+    def test_pickle_outside_of_spawn(self):
+        with SharedNamedCounter('t1') as tc:
+            with self.assertRaises(RuntimeError):
+                pickle.dumps(tc)
+
+    def test_import_without_shared_memory(self):
+        # multiprocessing.shared_memory is not there before Python 3.8, the rest of the package still imports.
+        code = ("import sys; sys.modules['multiprocessing.shared_memory'] = None; "
+                "import src.advanced_counter as ac; print(ac.AdvCounter(value=3).value)")
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', code]).strip(), b'3')
@@ -0,0 +1,131 @@
+import random
+from collections import Counter
+from unittest import TestCase
+from src.advanced_counter.sketch import CountMinSketch, ApproxNamedCounter
+
+
+def zipf_stream(count, keys, seed=1):
+    rnd = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(keys)]
+    return rnd.choices(['key_%s' % i for i in range(keys)], weights=weights, k=count)
+
+
+class TestCountMinSketch(TestCase):
+
+    def test_size(self):
+        cms = CountMinSketch(epsilon=0.01, delta=0.01)
+        self.assertEqual(cms.width, 272)
+        self.assertEqual(cms.depth, 5)
+        self.assertEqual(len(cms), 272 * 5)
+        cms = CountMinSketch(width=100, depth=3)
+        self.assertEqual(len(cms), 300)
+        with self.assertRaises(AttributeError):
+            CountMinSketch(epsilon=0)
+
+    def test_bounds(self):
+        stream = zipf_stream(20000, 2000)
+        real = Counter(stream)
+        for conservative in (False, True):
+            with self.subTest(conservative=conservative):
+                cms = CountMinSketch(epsilon=0.005, delta=0.01, conservative=conservative)
+                for key in stream:
+                    cms.add(key)
+                self.assertEqual(cms.total, 20000)
+                over = 0
+                for key, count in real.items():
+                    estimate = cms.estimate(key)
+                    self.assertGreaterEqual(estimate, count)
+                    if estimate - count > cms.error_bound:
+                        over += 1
+                self.assertLessEqual(over, len(real) * 0.01)
+                self.assertEqual(cms['missing'], cms.estimate('missing'))
+
+    def test_conservative(self):
+        stream = zipf_stream(20000, 2000)
+        plain = CountMinSketch(width=200, depth=4)
+        cons = CountMinSketch(width=200, depth=4, conservative=True)
+        for key in stream:
+            plain.add(key)
+            cons.add(key)
+        real = Counter(stream)
+        plain_err = sum(plain.estimate(k) - c for k, c in real.items())
+        cons_err = sum(cons.estimate(k) - c for k, c in real.items())
+        self.assertLess(cons_err, plain_err)
+        with self.assertRaises(ValueError):
+            cons.add('a', -1)
+        self.assertEqual(cons.total, 20000)
+
+    def test_merge(self):
+        a = CountMinSketch(width=50, depth=3)
+        b = CountMinSketch(width=50, depth=3)
+        a.add('x', 3)
+        b.add('x', 4)
+        b.add('y')
+        a.merge(b)
+        self.assertEqual(a.estimate('x'), 7)
+        self.assertEqual(a.total, 8)
+        with self.assertRaises(AttributeError):
+            a.merge(CountMinSketch(width=10, depth=3))
+        a.clear()
+        self.assertEqual(a.estimate('x'), 0)
+
+
+class TestApproxNamedCounter(TestCase):
+
+    def test_basic(self):
+        anc = ApproxNamedCounter(track=3, name='urls')
+        self.assertEqual(anc.add('a'), 1)
+        anc.add('a', 4)
+        anc.add(['b', 'c'])
+        self.assertEqual(anc.add(['b', 'c'], 2, force_dict=False), {'b': 3, 'c': 3})
+        self.assertEqual(anc['a'], 5)
+        self.assertIn('a', anc)
+        self.assertEqual(len(anc), 3)
+        anc.add('d')
+        self.assertNotIn('d', anc)
+        self.assertEqual(anc.get('d'), 1)
+        anc.add('d', 5)
+        self.assertIn('d', anc)
+        self.assertEqual(len(anc), 3)
+        self.assertEqual(anc.top(2), ['d', 'a'])
+        self.assertEqual(anc.total, 17)
+        self.assertEqual(anc.report(), 'urls\n    a : 5\n    c : 3\n    d : 6')
+        self.assertEqual(anc.report(counters=anc.top(1)), 'urls\n    d : 6')
+        anc.sub('d')
+        self.assertEqual(anc['d'], 5)
+        anc.clear()
+        self.assertEqual(len(anc), 0)
+        self.assertEqual(anc['a'], 0)
+
+    def test_heavy_hitters(self):
+        stream = zipf_stream(50000, 20000, seed=3)
+        real = Counter(stream)
+        anc = ApproxNamedCounter(epsilon=0.001, track=50, conservative=True)
+        for key in stream:
+            anc.add(key)
+        expected = [key for key, count in real.most_common(10)]
+        self.assertEqual(set(anc.top(10)), set(expected))
+        for key in expected:
+            self.assertGreaterEqual(anc[key], real[key])
+            self.assertLessEqual(anc[key] - real[key], anc.error_bound)
+
+    def test_key_names(self):
+        anc = ApproxNamedCounter(track=2)
+        anc.add('k1', 2)
+        anc.add('k0')
+        anc.add('k2', 5)
+        self.assertEqual(sorted(anc.keys()), ['k1', 'k2'])
+        anc.add(1, 10)
+        self.assertEqual(anc.top(2), [1, 'k2'])
+
+    def test_single_keys(self):
+        anc = ApproxNamedCounter(track=10)
+        self.assertEqual(anc.add(b'1.2.3.4'), 1)
+        anc.add(b'1.2.3.4', 2)
+        anc.add(('10.0.0.1', 443))
+        self.assertEqual(sorted(anc.top(10), key=str), [('10.0.0.1', 443), b'1.2.3.4'])
+        self.assertEqual(anc[b'1.2.3.4'], 3)
+        self.assertEqual(anc.add([b'a', b'b']), {b'a': 1, b'b': 1})
+        self.assertEqual(anc.add(b'a', force_dict=True), {b'a': 2})
+        self.assertEqual(anc.add(key for key in (b'a', b'c')), {b'a': 3, b'c': 1})
+        self.assertIn('1.2.3.4', anc.report(counters=b'1.2.3.4'))
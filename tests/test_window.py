@@ -0,0 +1,109 @@
+from unittest import TestCase
+from src.advanced_counter.adv_counter import NamedCounter
+from src.advanced_counter.window import WindowCounter
+from tests.helpers import FakeClock
+
+
+class TestWindowCounter(TestCase):
+
+    def test_time_window(self):
+        clock = FakeClock()
+        wc = WindowCounter(window_seconds=10, buckets=10, clock=clock)
+        for i in range(20):
+            wc.add()
+            clock.now += 1
+        self.assertEqual(wc.value, 9)
+        self.assertEqual(wc.call_count, 20)
+        clock.now += 5.5
+        self.assertEqual(wc.value, 4)
+        self.assertEqual(wc.window(), [1] * 4 + [0] * 6)
+        clock.now += 100
+        self.assertEqual(wc.value, 0)
+        wc.add(5)
+        self.assertEqual(wc.value, 5)
+
+    def test_float_window(self):
+        clock = FakeClock()
+        wc = WindowCounter(window_seconds=10, buckets=10, clock=clock)
+        for value in (0.1, 0.2, 0.3):
+            wc.add(value)
+            clock.now += 1
+        clock.now += 8
+        self.assertEqual(wc.value, 0.3)
+        clock.now += 1
+        self.assertEqual(wc.value, 0)
+
+    def test_call_window(self):
+        wc = WindowCounter(window_calls=5)
+        for i in range(1, 11):
+            wc.add(i)
+        self.assertEqual(wc.value, 6 + 7 + 8 + 9 + 10)
+        self.assertEqual(wc.window(), [6, 7, 8, 9, 10])
+        wc.sub(10)
+        self.assertEqual(wc.value, 7 + 8 + 9 + 10 - 10)
+
+        wc = WindowCounter(window_calls=100, buckets=10)
+        for i in range(250):
+            wc.add()
+        # the partly full bucket, and the 9 before it.
+        self.assertEqual(wc.value, 100)
+        wc.add()
+        self.assertEqual(wc.value, 91)
+
+    def test_min_max(self):
+        wc = WindowCounter(window_calls=10, min_counter=0, max_counter=20, increment_by=3)
+        for i in range(5):
+            wc.add()
+        self.assertEqual(wc.value, 15)
+        self.assertEqual(wc.perc_str, '75%')
+        wc.add('50%')
+        self.assertEqual(wc.value, 20)
+        for i in range(20):
+            wc.sub(4)
+        self.assertEqual(wc.value, 0)
+
+    def test_errors(self):
+        with self.assertRaises(AttributeError):
+            WindowCounter()
+        with self.assertRaises(AttributeError):
+            WindowCounter(window_seconds=1, window_calls=1)
+        with self.assertRaises(AttributeError):
+            WindowCounter(window_calls=10, buckets=3)
+        with self.assertRaises(AttributeError):
+            WindowCounter(window_calls=10, min_counter=0, max_counter=10, rollover=True)
+        wc = WindowCounter(window_calls=10)
+        for meth in ('mult', 'div', 'set'):
+            with self.subTest(meth=meth):
+                with self.assertRaises(AttributeError):
+                    getattr(wc, meth)(2)
+
+    def test_call_every(self):
+        calls = []
+        wc = WindowCounter(window_calls=3, call_every=4, call_every_func=lambda c: calls.append(c.value))
+        for i in range(1, 10):
+            wc.add(i)
+        self.assertEqual(calls, [2 + 3 + 4, 6 + 7 + 8])
+
+    def test_copy_clear(self):
+        clock = FakeClock()
+        wc = WindowCounter(window_seconds=60, clock=clock)
+        wc.add(3)
+        tc = wc.copy()
+        tc.add(2)
+        self.assertEqual((wc.value, tc.value), (3, 5))
+        self.assertEqual(wc.add(1, ), 4)
+        self.assertEqual((wc + 10).value, 14)
+        self.assertEqual(wc.value, 4)
+        wc.clear()
+        self.assertEqual(wc.value, 0)
+        self.assertEqual(wc.call_count, 0)
+
+    def test_named(self):
+        clock = FakeClock()
+        nc = NamedCounter(errors=WindowCounter(window_seconds=60, clock=clock),
+                          last_100=WindowCounter(window_calls=100), name='Errors', aggregates=True)
+        for i in range(150):
+            nc.add('last_100', i % 2)
+            nc.add('errors')
+        self.assertEqual(nc.report(), 'Errors\n      errors : 150\n    last_100 : 50')
+        self.assertEqual(nc.total, 200)